@@ -0,0 +1,77 @@
+"""
+文件名: benchmarks/bench_animation_formats.py
+功能: 动画输出格式对比。使用标准合成录屏画面（文字滚动加移动窗口），
+     分别以GIF（流式/全局调色板）、WebP（有损/无损）和APNG编码，
+     统计编码耗时与文件大小。
+
+用法:
+    python benchmarks/bench_animation_formats.py [--pattern text] [--width 800] [--height 600] [--frames 90]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.ffmpeg_writer import FFmpegWriter, ANIMATION_FORMATS
+from core.frame_source import create_frame_source
+from core.gif_writer import GifWriter, quantize_frame
+from core.gif_palette import to_rgb565, encode_gif
+
+
+def encode_animation(frames, path, fmt, width, height, fps):
+    """通过ffmpeg编码为WebP/APNG"""
+    writer = FFmpegWriter(path, width, height, fps, pix_fmt="bgra", output_args=ANIMATION_FORMATS[fmt][1])
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def encode_gif_stream(frames, path, width, height, fps):
+    """流式GIF（每帧独立调色板）"""
+    writer = GifWriter(path, width, height, fps)
+    for frame in frames:
+        writer.write(quantize_frame(frame))
+    writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="动画输出格式体积与耗时对比")
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--frames", type=int, default=90)
+    parser.add_argument("--fps", type=int, default=15)
+    args = parser.parse_args()
+
+    source = create_frame_source("synthetic", (0, 0, args.width, args.height), pattern=args.pattern)
+    with source:
+        frames = [source.grab() for _ in range(args.frames)]
+    size = (args.width, args.height)
+
+    cases = [
+        ("GIF(流式)", ".gif", lambda path: encode_gif_stream(frames, path, *size, args.fps)),
+        ("GIF(全局调色板)", ".gif", lambda path: encode_gif([to_rgb565(f) for f in frames], path, args.fps)),
+    ]
+    for fmt in ANIMATION_FORMATS:
+        cases.append((fmt, ANIMATION_FORMATS[fmt][0],
+                      lambda path, fmt=fmt: encode_animation(frames, path, fmt, *size, args.fps)))
+
+    duration = args.frames / args.fps
+    print(f"画面 {args.pattern} {args.width}x{args.height}，{args.frames} 帧（{duration:.1f} 秒）")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, extension, encode in cases:
+            path = os.path.join(workdir, "bench" + extension)
+            start = time.perf_counter()
+            encode(path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<16} 耗时 {elapsed:>6.2f} 秒（{duration / elapsed:>5.1f}x 实时）  "
+                  f"文件 {os.path.getsize(path) / 1024:>9.1f} KiB")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
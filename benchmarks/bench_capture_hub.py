@@ -0,0 +1,79 @@
+"""
+文件名: benchmarks/bench_capture_hub.py
+功能: 共享捕获中心基准。一个捕获线程按帧率抓取合成画面，分发给一个
+     快速订阅者（模拟MP4编码）和若干处理较慢的订阅者（模拟GIF量化、
+     预览），统计各订阅者实际收到和丢弃的帧数、抓屏次数以及同时存在的
+     共享帧数，验证慢的使用方不会拖慢快的使用方。
+
+用法:
+    python benchmarks/bench_capture_hub.py [--width 1920] [--height 1080] [--fps 30] [--seconds 5] [--slow-ms 100 250]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.capture_hub import CaptureHub
+from core.frame_source import create_frame_source
+
+
+def consume(subscription, cost, counts):
+    """按固定处理耗时消费订阅者的帧"""
+    while True:
+        shared = subscription.get(1.0)
+        if shared is None:
+            break
+        time.sleep(cost)
+        shared.release()
+        counts[subscription.name] = counts.get(subscription.name, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享捕获中心多订阅者基准测试")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--pattern", default="moving", help="合成画面类型：moving、static、text")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fast-ms", type=float, default=5.0, help="快速订阅者每帧处理耗时（毫秒）")
+    parser.add_argument("--slow-ms", type=float, nargs="+", default=[100.0, 250.0],
+                        help="各慢速订阅者每帧处理耗时（毫秒）")
+    parser.add_argument("--divider", type=int, default=2, help="慢速订阅者的分频系数")
+    args = parser.parse_args()
+
+    region = (0, 0, args.width, args.height)
+    hub = CaptureHub(create_frame_source("synthetic", region, pattern=args.pattern), args.fps)
+    consumers = [(hub.subscribe("fast"), args.fast_ms / 1000)]
+    for i, cost in enumerate(args.slow_ms):
+        consumers.append((hub.subscribe(f"slow{i + 1}", divider=args.divider), cost / 1000))
+
+    counts = {}
+    threads = [threading.Thread(target=consume, args=(subscription, cost, counts))
+               for subscription, cost in consumers]
+    hub.start()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stats = hub.get_stats()
+    for subscription, _ in consumers:
+        subscription.close()
+    hub.stop()
+    for thread in threads:
+        thread.join()
+
+    print(f"画面 {args.width}x{args.height}，{args.fps} FPS，{args.seconds:g} 秒")
+    print(f"抓屏 {stats['grabs']} 次，平均 {stats['grab_time'] * 1000:.2f} ms/次，"
+          f"同时存在的共享帧最多 {stats['max_live_frames']} 个")
+    for item in stats["subscribers"]:
+        received = counts.get(item["name"], 0)
+        dropped = item["dropped_oldest"] + item["dropped_newest"]
+        print(f"  {item['name']:<6} 分频 {item['divider']}  收到 {received:>4} 帧"
+              f"（{received / args.seconds:>5.1f} FPS）  丢弃 {dropped:>4} 帧")
+
+
+if __name__ == "__main__":
+    main()
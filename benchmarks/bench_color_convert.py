@@ -0,0 +1,99 @@
+"""
+文件名: benchmarks/bench_color_convert.py
+功能: 颜色转换基准。在720p/1080p/4K下比较BGRA→BGR（原路径，编码器内部
+     还要再转换一次YUV）与BGRA→I420/NV12（BT.601/BT.709）直接转换的
+     每帧耗时和送入编码器的数据量；加 --encode 时再测量转换加ffmpeg
+     编码的端到端吞吐。
+
+用法:
+    python benchmarks/bench_color_convert.py [--sizes 720p 1080p 4k] [--repeat 30] [--encode]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+
+from core.color_convert import (COLOR_BGR, COLOR_I420, COLOR_NV12, MATRIX_BT601, MATRIX_BT709,
+                                ColorConverter, frame_shape, color_tag_args)
+from core.ffmpeg_writer import FFmpegWriter
+from core.frame_source import create_frame_source
+
+SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+CASES = [
+    (COLOR_BGR, MATRIX_BT601),
+    (COLOR_I420, MATRIX_BT601),
+    (COLOR_NV12, MATRIX_BT601),
+    (COLOR_I420, MATRIX_BT709),
+    (COLOR_NV12, MATRIX_BT709),
+]
+
+
+def time_convert(converter, frames, out, repeat):
+    """测量每帧转换耗时（毫秒）"""
+    converter(frames[0], out)
+    start = time.perf_counter()
+    for i in range(repeat):
+        converter(frames[i % len(frames)], out)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def time_encode(converter, color_format, matrix, frames, width, height, fps, count, path):
+    """测量转换加编码的端到端吞吐（帧/秒）"""
+    args = {"pix_fmt": converter.pix_fmt}
+    if color_format != COLOR_BGR:
+        args["color_args"] = color_tag_args(matrix)
+    out = np.empty(frame_shape(color_format, width, height), np.uint8)
+    start = time.perf_counter()
+    writer = FFmpegWriter(path, width, height, fps, **args)
+    for i in range(count):
+        writer.write(converter(frames[i % len(frames)], out))
+    writer.release()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BGRA到BGR/YUV颜色转换基准测试")
+    parser.add_argument("--sizes", nargs="+", default=["720p", "1080p", "4k"], choices=list(SIZES))
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--repeat", type=int, default=30, help="每种转换的重复次数")
+    parser.add_argument("--encode", action="store_true", help="同时测量转换加ffmpeg编码的吞吐")
+    parser.add_argument("--encode-frames", type=int, default=60)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"CPU核心数 {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.sizes:
+            width, height = SIZES[name]
+            source = create_frame_source("synthetic", (0, 0, width, height), pattern=args.pattern)
+            with source:
+                frames = [source.grab().copy() for _ in range(4)]
+
+            print(f"\n{name} ({width}x{height})")
+            for color_format, matrix in CASES:
+                converter = ColorConverter(color_format, matrix)
+                out = np.empty(frame_shape(color_format, width, height), np.uint8)
+                elapsed = time_convert(converter, frames, out, args.repeat)
+                label = color_format if color_format == COLOR_BGR else f"{color_format}/{matrix}"
+                line = f"  {label:<12} 转换 {elapsed:>7.2f} ms/帧  数据 {out.nbytes / 1024 / 1024:>6.2f} MiB/帧"
+                if args.encode:
+                    fps = time_encode(converter, color_format, matrix, frames, width, height, args.fps,
+                                      args.encode_frames, os.path.join(workdir, "bench.mp4"))
+                    line += f"  转换+编码 {fps:>6.1f} 帧/秒"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+文件名: benchmarks/bench_frame_alloc.py
+功能: 使用tracemalloc测量捕获循环每帧的内存分配量，
+     对比原实现（np.array复制 + cvtColor新分配）与缓冲池零拷贝实现。
+
+用法:
+    python benchmarks/bench_frame_alloc.py [--width 1920] [--height 1080] [--frames 300]
+"""
+
+import os
+import sys
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.frame_pool import FramePool, bgra_view
+
+
+class FakeScreenshot:
+    """模拟mss截图对象：原始BGRA数据保存在bytearray中"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.raw = bytearray(os.urandom(width * height * 4))
+
+
+def measure(step, frames, warmup=10):
+    """测量step每次调用的平均瞬时分配字节数（稳态，不含预热）"""
+    for _ in range(warmup):
+        step()
+
+    tracemalloc.start()
+    total = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - base
+    tracemalloc.stop()
+    return total / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="捕获循环每帧内存分配基准测试")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+
+    shot = FakeScreenshot(args.width, args.height)
+    pool = FramePool((args.height, args.width, 3), size=2)
+
+    def legacy_step():
+        frame = np.array(np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4))
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+
+    def pooled_step():
+        frame = bgra_view(shot)
+        out = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=pool.acquire())
+        pool.release(out)
+
+    print(f"分辨率 {args.width}x{args.height}，{args.frames} 帧，按 {args.fps} FPS 折算")
+    for name, step in (("原实现", legacy_step), ("缓冲池", pooled_step)):
+        per_frame = measure(step, args.frames)
+        print(f"{name:<6} 每帧分配 {per_frame / 1024:>10.1f} KiB  约 {per_frame * args.fps / 1024 ** 2:>8.1f} MiB/s")
+    print(f"缓冲池统计: {pool.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+文件名: benchmarks/bench_gif_export.py
+功能: GIF导出基准。对比原实现（imageio.mimsave，逐帧量化 + optimize）与
+     全局/按场景调色板查表量化的导出耗时和文件大小。
+
+用法:
+    python benchmarks/bench_gif_export.py [--pattern text] [--width 800] [--height 600] [--frames 90]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import cv2
+import imageio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.frame_source import create_frame_source
+from core.gif_palette import to_rgb565, encode_gif
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GIF导出耗时与文件大小基准测试")
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--frames", type=int, default=90)
+    parser.add_argument("--fps", type=int, default=15)
+    args = parser.parse_args()
+
+    source = create_frame_source("synthetic", (0, 0, args.width, args.height), pattern=args.pattern)
+    with source:
+        captured = [source.grab() for _ in range(args.frames)]
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB) for frame in captured]
+    rgb565_frames = [to_rgb565(frame) for frame in captured]
+
+    def export_imageio(path):
+        imageio.mimsave(path, rgb_frames, fps=args.fps, optimize=True, subrectangles=True)
+
+    cases = [("imageio(原实现)", export_imageio)]
+    for mode in ("global", "scene"):
+        for dither in (False, True):
+            name = f"{mode}{'+抖动' if dither else ''}"
+            cases.append((name, lambda path, mode=mode, dither=dither:
+                          encode_gif(rgb565_frames, path, args.fps, mode, dither)))
+
+    print(f"画面 {args.pattern} {args.width}x{args.height}，{args.frames} 帧")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, export in cases:
+            path = os.path.join(workdir, "bench.gif")
+            start = time.perf_counter()
+            export(path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            print(f"{name:<16} 耗时 {elapsed:>7.2f} 秒  每帧 {elapsed / args.frames * 1000:>6.1f} 毫秒  "
+                  f"文件 {size / 1024:>9.1f} KiB")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
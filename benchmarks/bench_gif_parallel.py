@@ -0,0 +1,57 @@
+"""
+文件名: benchmarks/bench_gif_parallel.py
+功能: 多进程GIF编码扩展性基准。用合成画面填充帧存储，分别以
+     1/2/4/8个工作进程完成全局调色板量化与LZW压缩，统计耗时与加速比。
+
+用法:
+    python benchmarks/bench_gif_parallel.py [--pattern text] [--width 1280] [--height 720]
+        [--frames 240] [--workers 1 2 4 8] [--dither]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.frame_source import create_frame_source
+from core.frame_store import FrameStore
+from core.gif_palette import to_rgb565
+from core.gif_parallel import encode_gif_parallel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程GIF编码扩展性基准测试")
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--dither", action="store_true")
+    args = parser.parse_args()
+
+    print(f"画面 {args.pattern} {args.width}x{args.height}，{args.frames} 帧，CPU核心数 {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as workdir:
+        store = FrameStore((args.height, args.width), "uint16", os.path.join(workdir, "frames.tmp"))
+        source = create_frame_source("synthetic", (0, 0, args.width, args.height), pattern=args.pattern)
+        with source:
+            for _ in range(args.frames):
+                store.append(to_rgb565(source.grab()))
+
+        baseline = None
+        for workers in args.workers:
+            path = os.path.join(workdir, f"bench_{workers}.gif")
+            start = time.perf_counter()
+            encode_gif_parallel(store, path, args.fps, dither=args.dither, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>2} 个进程  耗时 {elapsed:>7.2f} 秒  加速比 {baseline / elapsed:>5.2f}x  "
+                  f"文件 {os.path.getsize(path) / 1024:>9.1f} KiB")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
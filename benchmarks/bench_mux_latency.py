@@ -0,0 +1,79 @@
+"""
+文件名: benchmarks/bench_mux_latency.py
+功能: 测量停止录制到输出文件生成的耗时（封装阶段）随录制时长的变化。
+     对比仅封装路径（H.264视频流复制）与moviepy重新编码路径。
+
+用法:
+    python benchmarks/bench_mux_latency.py [--durations 10 30 60 120] [--reencode]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.ffmpeg_writer import run_ffmpeg, mux_audio_video
+
+
+def make_inputs(workdir, duration, size="1280x720", fps=30):
+    """用ffmpeg生成指定时长的H.264临时视频与WAV音频"""
+    video_path = os.path.join(workdir, f"video_{duration}.mp4")
+    audio_path = os.path.join(workdir, f"audio_{duration}.wav")
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}",
+        "-t", str(duration), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        video_path
+    ])
+    run_ffmpeg([
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration), "-ac", "2", "-c:a", "pcm_s16le",
+        audio_path
+    ])
+    return video_path, audio_path
+
+
+def bench_mux(video_path, audio_path, output_path):
+    """仅封装路径耗时"""
+    start = time.perf_counter()
+    mux_audio_video(video_path, audio_path, output_path)
+    return time.perf_counter() - start
+
+
+def bench_reencode(video_path, audio_path, output_path):
+    """moviepy重新编码路径耗时（原实现）"""
+    from moviepy.editor import VideoFileClip, AudioFileClip
+
+    start = time.perf_counter()
+    video = VideoFileClip(video_path)
+    audio = AudioFileClip(audio_path)
+    video = video.set_audio(audio.subclip(0, min(audio.duration, video.duration)))
+    video.write_videofile(output_path, codec='libx264', audio_codec='aac',
+                          preset='ultrafast', threads=4, logger=None)
+    video.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="停止到出文件耗时基准测试")
+    parser.add_argument("--durations", type=int, nargs="+", default=[10, 30, 60, 120])
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--reencode", action="store_true", help="同时测量moviepy重新编码路径")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'时长(s)':>8} {'仅封装(s)':>10} {'重新编码(s)':>12}")
+        for duration in args.durations:
+            video_path, audio_path = make_inputs(workdir, duration, args.size)
+            mux_time = bench_mux(video_path, audio_path, os.path.join(workdir, "out_mux.mp4"))
+            reencode_time = "-"
+            if args.reencode:
+                elapsed = bench_reencode(video_path, audio_path, os.path.join(workdir, "out_reencode.mp4"))
+                reencode_time = f"{elapsed:.2f}"
+            print(f"{duration:>8} {mux_time:>10.3f} {reencode_time:>12}")
+
+
+if __name__ == "__main__":
+    main()
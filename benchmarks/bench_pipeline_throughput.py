@@ -0,0 +1,94 @@
+"""
+文件名: benchmarks/bench_pipeline_throughput.py
+功能: 无显示器环境下的流水线吞吐基准。使用合成画面或回放素材作为帧来源，
+     经过捕获/转换/编码流水线写入ffmpeg编码器，统计实际吞吐与队列状态。
+
+用法:
+    python benchmarks/bench_pipeline_throughput.py [--source synthetic] [--pattern moving]
+        [--width 1920] [--height 1080] [--frames 300] [--workers 1] [--null]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.ffmpeg_writer import FFmpegWriter
+from core.frame_pool import FramePool
+from core.frame_source import create_frame_source
+from core.pipeline import EncodePipeline, POLICIES
+
+
+class NullWriter:
+    """丢弃所有帧的写入器，用于单独测量捕获与转换开销"""
+
+    def write(self, frame):
+        pass
+
+    def release(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="捕获/编码流水线吞吐基准测试")
+    parser.add_argument("--source", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--pattern", default="moving", help="合成画面类型：moving、static、text")
+    parser.add_argument("--path", help="回放素材路径（--source replay 时使用）")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--policy", choices=POLICIES, default="block")
+    parser.add_argument("--null", action="store_true", help="不编码，只测捕获与转换")
+    args = parser.parse_args()
+
+    region = (0, 0, args.width, args.height)
+    if args.source == "synthetic":
+        source = create_frame_source("synthetic", region, pattern=args.pattern)
+    else:
+        source = create_frame_source("replay", region, path=args.path)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.null:
+            writer = NullWriter()
+        else:
+            writer = FFmpegWriter(os.path.join(workdir, "bench.mp4"), source.width, source.height, args.fps)
+        pool = FramePool((source.height, source.width, 3), size=args.queue_size + args.workers + 1)
+        pipeline = EncodePipeline(
+            writer,
+            convert=lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=pool.acquire()),
+            queue_size=args.queue_size,
+            policy=args.policy,
+            workers=args.workers,
+            release=pool.release
+        )
+
+        grab_time = 0.0
+        start = time.perf_counter()
+        with source:
+            for _ in range(args.frames):
+                t = time.perf_counter()
+                frame = source.grab()
+                grab_time += time.perf_counter() - t
+                pipeline.submit(frame)
+        submit_elapsed = time.perf_counter() - start
+        pipeline.close()
+        writer.release()
+        total_elapsed = time.perf_counter() - start
+
+    stats = pipeline.get_stats()
+    print(f"来源: {args.source}/{args.pattern}  {source.width}x{source.height}  转换线程: {args.workers}")
+    print(f"平均取帧耗时: {grab_time / args.frames * 1000:.2f} ms")
+    print(f"投递吞吐: {args.frames / submit_elapsed:.1f} FPS  端到端吞吐: {stats['written'] / total_elapsed:.1f} FPS")
+    print(f"队列统计: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+文件名: benchmarks/bench_scaler.py
+功能: 输出分辨率缩放基准。对大区域合成画面，比较1/2、1/4等整数倍均值
+     池化快速路径与OpenCV各插值方式的每帧耗时，并统计“缩放+I420转换”
+     与原分辨率直接转换的总耗时和送入编码器的数据量。
+
+用法:
+    python benchmarks/bench_scaler.py [--width 3840] [--height 2160] [--scales 0.5 0.25 0.75] [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+
+from core.color_convert import COLOR_I420, ColorConverter, frame_shape
+from core.frame_source import create_frame_source
+from core.scaler import INTERPOLATIONS, FrameScaler, scaled_size
+from core.stripes import StripePool, default_stripe_workers
+
+
+def time_call(func, frame, repeat):
+    """测量每帧耗时（毫秒）"""
+    func(frame)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(frame)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输出分辨率缩放基准测试")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5, 0.25, 0.75])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    source = create_frame_source("synthetic", (0, 0, args.width, args.height), pattern=args.pattern)
+    with source:
+        frame = source.grab().copy()
+
+    stripes = StripePool(default_stripe_workers(args.width, args.height))
+    converter = ColorConverter(COLOR_I420, stripes=stripes)
+    full = np.empty(frame_shape(COLOR_I420, args.width, args.height), np.uint8)
+    baseline = time_call(lambda f: converter(f, full), frame, args.repeat)
+    print(f"画面 {args.width}x{args.height}，条带线程 {stripes.workers}")
+    print(f"原分辨率 I420转换 {baseline:>7.2f} ms/帧  数据 {full.nbytes / 1024 / 1024:>6.2f} MiB/帧")
+
+    for scale in args.scales:
+        width, height = scaled_size(args.width, args.height, scale)
+        print(f"\n缩放 {scale:g} -> {width}x{height}")
+        for name in INTERPOLATIONS:
+            scaler = FrameScaler((args.width, args.height), (width, height), name, stripes)
+            label = f"{name}（均值池化）" if scaler.factor else name
+            elapsed = time_call(scaler, frame, args.repeat)
+            out = np.empty(frame_shape(COLOR_I420, width, height), np.uint8)
+            total = time_call(lambda f: converter(scaler(f), out), frame, args.repeat)
+            print(f"  {label:<16} 缩放 {elapsed:>7.2f} ms/帧  缩放+转换 {total:>7.2f} ms/帧  "
+                  f"数据 {out.nbytes / 1024 / 1024:>6.2f} MiB/帧")
+    stripes.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+文件名: benchmarks/bench_stripes.py
+功能: 条带并行扩展性基准。对大区域合成画面，分别以1/2/4/8个条带线程
+     完成BGRA→BGR/I420/NV12转换，统计每帧耗时、加速比和可达到的帧率，
+     并校验条带结果与整帧转换逐位一致。
+
+用法:
+    python benchmarks/bench_stripes.py [--width 3840] [--height 2160] [--workers 1 2 4 8] [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+
+from core.color_convert import COLOR_FORMATS, MATRIX_BT601, MATRIX_BT709, ColorConverter, frame_shape
+from core.frame_source import create_frame_source
+from core.stripes import StripePool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="条带并行颜色转换扩展性基准测试")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--pattern", default="text", help="合成画面类型：moving、static、text")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--matrix", default=MATRIX_BT709, choices=[MATRIX_BT601, MATRIX_BT709])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    source = create_frame_source("synthetic", (0, 0, args.width, args.height), pattern=args.pattern)
+    with source:
+        frame = source.grab().copy()
+
+    print(f"画面 {args.width}x{args.height}，矩阵 {args.matrix}，CPU核心数 {os.cpu_count()}")
+    for color_format in COLOR_FORMATS:
+        shape = frame_shape(color_format, args.width, args.height)
+        reference = ColorConverter(color_format, args.matrix)(frame, np.empty(shape, np.uint8))
+        baseline = None
+        for workers in args.workers:
+            pool = StripePool(workers)
+            converter = ColorConverter(color_format, args.matrix, pool)
+            out = np.empty(shape, np.uint8)
+            converter(frame, out)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                converter(frame, out)
+            elapsed = (time.perf_counter() - start) / args.repeat * 1000
+            pool.close()
+            baseline = baseline or elapsed
+            status = "一致" if np.array_equal(out, reference) else "不一致"
+            print(f"{color_format:<5} {workers:>2} 线程  {elapsed:>7.2f} ms/帧  加速比 {baseline / elapsed:>5.2f}x  "
+                  f"上限 {1000 / elapsed:>6.1f} FPS  结果{status}")
+
+
+if __name__ == "__main__":
+    main()
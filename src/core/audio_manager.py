@@ -7,18 +7,21 @@ import os
 import wave
 import threading
 import numpy as np
-import soundcard as sc
+
+from .audio_source import sc, find_speaker_loopbacks, SoundcardLoopbackSource
 
 class AudioManager:
     """音频管理器，负责系统音频的检测和录制"""
     
-    def __init__(self, output_file=None):
+    def __init__(self, output_file=None, source=None):
         """初始化音频管理器
         
         Args:
             output_file (str, optional): 音频输出文件路径
+            source (AudioSource, optional): 音频来源，默认使用soundcard系统声音回路
         """
         self.output_file = output_file
+        self.source = source or SoundcardLoopbackSource()
         self.running = False
         self.audio_thread = None
         self.error_message = None
@@ -32,28 +35,12 @@ class AudioManager:
         try:
             print(f"[调试] 开始测试系统音频录制功能")
             
-            # 获取带有回路(loopback)功能的录音设备
-            loopback_devices = sc.all_microphones(include_loopback=True)
-            print(f"[调试] 检测到的回路设备: {loopback_devices}")
-            
-            # 过滤出真正的回路设备（通常是扬声器设备的回路）
-            speaker_loopbacks = [device for device in loopback_devices if 'Speaker' in str(device) or '扬声器' in str(device)]
-            print(f"[调试] 扬声器回路设备: {speaker_loopbacks}")
-            
-            if not speaker_loopbacks:
-                print(f"[错误] 未找到系统声音回路设备")
-                return False, "未找到系统声音回路设备，无法录制系统声音"
-            
-            # 使用第一个回路设备
-            loopback_device = speaker_loopbacks[0]
-            print(f"[调试] 使用系统声音回路设备: {loopback_device}")
-            
-            # 尝试创建录音机
-            print(f"[调试] 尝试创建录音机实例...")
-            with loopback_device.recorder(samplerate=44100, channels=2, blocksize=1024) as recorder:
-                print(f"[调试] 录音机实例创建成功，尝试录制测试数据...")
+            # 打开音频来源并尝试录制一小段
+            print(f"[调试] 尝试打开音频来源: {type(self.source).__name__}")
+            with self.source as source:
+                print(f"[调试] 音频来源已打开，尝试录制测试数据...")
                 # 尝试录制一小段
-                data = recorder.record(100)  # 只录制100帧进行测试
+                data = source.read(100)  # 只录制100帧进行测试
                 print(f"[调试] 测试数据录制完成，数据形状: {data.shape if data is not None else 'None'}")
                 
                 if data is None or len(data) == 0:
@@ -116,49 +103,31 @@ class AudioManager:
     def _record_system_audio(self):
         """系统音频录制线程函数"""
         try:
-            # 初始化系统音频捕获
-            sample_rate = 44100  # Hz
-            block_size = 1024
+            # 录制参数取自音频来源
+            sample_rate = self.source.sample_rate  # Hz
+            channels = self.source.channels
+            block_size = self.source.block_size
             
             print(f"[调试] 开始尝试录制系统音频")
             
-            # 获取回路录音设备
             try:
-                # 获取带有回路功能的录音设备
-                loopback_devices = sc.all_microphones(include_loopback=True)
-                print(f"[调试] 检测到的回路设备: {loopback_devices}")
-                
-                # 过滤出真正的回路设备（通常是扬声器设备的回路）
-                speaker_loopbacks = [device for device in loopback_devices if 'Speaker' in str(device) or '扬声器' in str(device)]
-                print(f"[调试] 扬声器回路设备: {speaker_loopbacks}")
-                
-                if not speaker_loopbacks:
-                    error_msg = "未找到系统声音回路设备，无法录制系统声音"
-                    self.error_message = error_msg
-                    print(f"[错误] {error_msg}")
-                    return
-                    
-                # 使用第一个回路设备
-                loopback_device = speaker_loopbacks[0]
-                print(f"[调试] 使用系统声音回路设备: {loopback_device}")
-                
                 # 开始录制
                 print(f"[调试] 开始录制系统音频...")
                 
-                # 打开WAV文件准备写入
-                with wave.open(self.output_file, 'wb') as wf:
-                    wf.setnchannels(2)  # 立体声
-                    wf.setsampwidth(2)  # 16位采样宽度
-                    wf.setframerate(sample_rate)
+                # 先打开音频来源，设备不可用时不生成空的WAV文件
+                with self.source as source:
+                    print(f"[调试] 音频来源已打开，开始录制...")
                     
-                    # 创建录音机并开始录制
-                    with loopback_device.recorder(samplerate=sample_rate, channels=2, blocksize=block_size) as recorder:
-                        print(f"[调试] 录音机已创建，开始录制...")
+                    # 打开WAV文件准备写入
+                    with wave.open(self.output_file, 'wb') as wf:
+                        wf.setnchannels(channels)
+                        wf.setsampwidth(2)  # 16位采样宽度
+                        wf.setframerate(sample_rate)
                         
                         # 持续录制直到停止信号
                         while self.running:
                             # 录制一块音频数据
-                            data = recorder.record(block_size)
+                            data = source.read(block_size)
                             
                             # 检查数据
                             if data is None or len(data) == 0:
@@ -167,7 +136,7 @@ class AudioManager:
                                 
                             # 转换为16位整数并写入WAV文件
                             # 首先规范化到[-1, 1]范围，然后缩放到16位整数范围
-                            int_data = (data * 32767).astype(np.int16)
+                            int_data = (np.clip(data, -1.0, 1.0) * 32767).astype(np.int16)
                             wf.writeframes(int_data.tobytes())
             
             except Exception as e:
@@ -188,13 +157,15 @@ class AudioManager:
         Returns:
             tuple: (扬声器列表, 回路设备列表, 默认扬声器)
         """
+        if sc is None:
+            return [], [], None
+            
         try:
             # 扬声器
             speakers = sc.all_speakers()
             
             # 回路设备
-            loopback_devices = sc.all_microphones(include_loopback=True)
-            speaker_loopbacks = [device for device in loopback_devices if 'Speaker' in str(device) or '扬声器' in str(device)]
+            speaker_loopbacks = find_speaker_loopbacks()
             
             # 默认设备
             try:
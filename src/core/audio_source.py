@@ -0,0 +1,215 @@
+"""
+文件名: core/audio_source.py
+功能: 音频来源抽象。AudioManager通过统一的AudioSource接口读取音频块，
+     soundcard系统声音回路只是其中一种实现；另外提供确定性的合成音频
+     与WAV回放来源，使音视频同步、延迟和吞吐测试可以在普通Linux上运行。
+"""
+
+import time
+import wave
+
+import numpy as np
+
+# soundcard依赖平台音频库，缺失时（如无PulseAudio的Linux）导入会抛出OSError
+try:
+    import soundcard as sc
+except Exception:
+    sc = None
+
+
+def find_speaker_loopbacks():
+    """查找扬声器回路录音设备
+
+    Returns:
+        list: 回路设备列表（soundcard不可用时为空）
+    """
+    if sc is None:
+        return []
+    loopback_devices = sc.all_microphones(include_loopback=True)
+    print(f"[调试] 检测到的回路设备: {loopback_devices}")
+    # 过滤出真正的回路设备（通常是扬声器设备的回路）
+    return [device for device in loopback_devices if 'Speaker' in str(device) or '扬声器' in str(device)]
+
+
+class AudioSource:
+    """音频来源基类，read() 返回形状为 (frames, channels)、取值[-1, 1]的float32数组"""
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=1024):
+        """初始化音频来源
+
+        Args:
+            sample_rate (int): 采样率
+            channels (int): 声道数
+            block_size (int): 每次读取的建议帧数
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_size = block_size
+
+    def open(self):
+        """打开来源，获取所需资源"""
+
+    def read(self, frames):
+        """读取音频块
+
+        Args:
+            frames (int): 帧数
+
+        Returns:
+            numpy.ndarray: 音频数据
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """关闭来源，释放资源"""
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SoundcardLoopbackSource(AudioSource):
+    """基于soundcard的系统声音回路录制（Windows扬声器回路）"""
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=1024):
+        super().__init__(sample_rate, channels, block_size)
+        self.device = None
+        self._recorder = None
+
+    def open(self):
+        if sc is None:
+            raise RuntimeError("soundcard不可用，无法录制系统声音")
+
+        speaker_loopbacks = find_speaker_loopbacks()
+        print(f"[调试] 扬声器回路设备: {speaker_loopbacks}")
+        if not speaker_loopbacks:
+            raise RuntimeError("未找到系统声音回路设备，无法录制系统声音")
+
+        # 使用第一个回路设备
+        self.device = speaker_loopbacks[0]
+        print(f"[调试] 使用系统声音回路设备: {self.device}")
+
+        self._recorder = self.device.recorder(
+            samplerate=self.sample_rate, channels=self.channels, blocksize=self.block_size
+        )
+        self._recorder.__enter__()
+
+    def read(self, frames):
+        return self._recorder.record(frames)
+
+    def close(self):
+        if self._recorder is not None:
+            self._recorder.__exit__(None, None, None)
+            self._recorder = None
+
+
+class _PacedSource(AudioSource):
+    """按实时节奏输出数据的来源基类，模拟真实设备的阻塞读取"""
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=1024, realtime=True):
+        super().__init__(sample_rate, channels, block_size)
+        self.realtime = realtime
+        self.position = 0  # 已输出的帧数
+        self._start = None
+
+    def open(self):
+        self.position = 0
+        self._start = time.perf_counter()
+
+    def _pace(self, frames):
+        """等待到这块数据在真实设备上可用的时刻"""
+        if not self.realtime:
+            return
+        due = self._start + (self.position + frames) / self.sample_rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SyntheticAudioSource(_PacedSource):
+    """确定性合成音频：正弦音叠加周期性的点击声，点击时刻可用于音画同步测量"""
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=1024, realtime=True,
+                 frequency=440.0, amplitude=0.2, click_interval=1.0):
+        """初始化合成音频来源
+
+        Args:
+            frequency (float): 正弦音频率（Hz），为0时只输出点击声
+            amplitude (float): 正弦音幅度
+            click_interval (float): 点击声间隔（秒），为0时不输出点击声
+        """
+        super().__init__(sample_rate, channels, block_size, realtime)
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.click_interval = click_interval
+
+    def read(self, frames):
+        self._pace(frames)
+        t = (self.position + np.arange(frames)) / self.sample_rate
+        signal = self.amplitude * np.sin(2 * np.pi * self.frequency * t) if self.frequency else np.zeros(frames)
+        if self.click_interval:
+            # 每个间隔开始的前2毫秒为满幅点击
+            phase = np.mod(t, self.click_interval)
+            signal = np.where(phase < 0.002, 1.0, signal)
+        self.position += frames
+        return np.repeat(signal.astype(np.float32)[:, None], self.channels, axis=1)
+
+
+class WavReplaySource(_PacedSource):
+    """回放16位PCM WAV文件，声道数和采样率取自文件"""
+
+    def __init__(self, path, block_size=1024, realtime=True, loop=True):
+        """初始化WAV回放来源
+
+        Args:
+            path (str): WAV文件路径
+            loop (bool): 到达末尾后是否从头循环（否则补静音）
+        """
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"仅支持16位PCM WAV: {path}")
+            sample_rate, channels = wf.getframerate(), wf.getnchannels()
+            pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        super().__init__(sample_rate, channels, block_size, realtime)
+        self.path = path
+        self.loop = loop
+        self.samples = (pcm.reshape(-1, channels) / 32768.0).astype(np.float32)
+
+    def read(self, frames):
+        self._pace(frames)
+        total = len(self.samples)
+        if total == 0:
+            self.position += frames
+            return np.zeros((frames, self.channels), np.float32)
+
+        if self.loop:
+            indices = (self.position + np.arange(frames)) % total
+            data = self.samples[indices]
+        else:
+            data = np.zeros((frames, self.channels), np.float32)
+            chunk = self.samples[self.position:self.position + frames]
+            data[:len(chunk)] = chunk
+        self.position += frames
+        return data
+
+
+def create_audio_source(kind="loopback", **kwargs):
+    """按类型创建音频来源
+
+    Args:
+        kind (str): loopback、synthetic 或 wav
+        **kwargs: 传给具体来源的参数
+
+    Returns:
+        AudioSource: 音频来源实例
+    """
+    if kind == "loopback":
+        return SoundcardLoopbackSource(**kwargs)
+    elif kind == "synthetic":
+        return SyntheticAudioSource(**kwargs)
+    elif kind == "wav":
+        return WavReplaySource(**kwargs)
+    raise ValueError(f"不支持的音频来源类型: {kind}")
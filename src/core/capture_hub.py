@@ -0,0 +1,264 @@
+"""
+文件名: core/capture_hub.py
+功能: 共享屏幕捕获中心。预览、录制、即时回放等多个使用方同时需要画面时，
+     不再各自打开mss抓屏，而是由一个捕获线程按节拍抓取，把带引用计数的
+     帧分发给所有订阅者。每个订阅者有自己的分频系数（每N帧取一帧）和
+     丢帧策略，投递从不阻塞捕获线程，慢的使用方（如GIF量化）只会丢掉
+     自己的帧，不会拖慢其他使用方（如MP4编码）。
+"""
+
+import threading
+import time
+
+from .frame_source import FrameSource
+from .pipeline import FrameQueue, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST
+from .scheduler import FrameScheduler, POLICY_DROP
+
+# 订阅者以帧来源方式使用时，等待新帧的超时时间（秒），超时说明捕获中心已停止或出错
+GRAB_TIMEOUT = 2.0
+
+
+class SharedFrame:
+    """带引用计数的共享帧：每个收到该帧的订阅者持有一个引用，用完后调用 release()"""
+
+    __slots__ = ("data", "seq", "timestamp", "_refs", "_hub")
+
+    def __init__(self, hub, data, seq, timestamp, refs):
+        self.data = data  # BGRA帧（所有订阅者共用，只读）
+        self.seq = seq  # 捕获序号
+        self.timestamp = timestamp  # 抓取时刻（perf_counter秒）
+        self._refs = refs
+        self._hub = hub
+
+    def release(self):
+        """释放一个引用，最后一个引用释放时帧离开捕获中心"""
+        hub = self._hub
+        with hub._lock:
+            self._refs -= 1
+            if self._refs:
+                return
+            hub._live -= 1
+        self.data = None
+
+
+class Subscription(FrameSource):
+    """捕获中心的订阅者
+
+    可以直接用 get() 按顺序取出共享帧（用完后 release()），也可以作为FrameSource
+    交给Recorder、InstantReplay等，grab() 返回最新一帧（可只取其中一个区域）。
+    """
+
+    def __init__(self, hub, name, divider, queue_size, policy, region):
+        """初始化订阅者（由 CaptureHub.subscribe() 创建）"""
+        super().__init__(region)
+        self.hub = hub
+        self.name = name
+        self.divider = divider
+        self.x = int(region[0]) - hub.region[0]
+        self.y = int(region[1]) - hub.region[1]
+        self.queue = FrameQueue(queue_size, policy, on_drop=SharedFrame.release)
+        self.skipped = 0  # grab() 取最新帧时跳过的旧帧数
+        self._held = None  # grab() 返回的数组所属的共享帧
+
+    def get(self, timeout=None):
+        """按顺序取出下一帧
+
+        Args:
+            timeout (float, optional): 等待超时时间（秒）
+
+        Returns:
+            SharedFrame: 共享帧，用完后必须调用 release()；已退订或等待超时时返回None
+        """
+        return self.queue.get(timeout)
+
+    def grab(self):
+        """FrameSource接口：等待并返回最新一帧（订阅区域的零拷贝切片）
+
+        返回的数组不会被捕获中心复用，调用方可以继续持有；对应的共享帧在下一次
+        grab() 或 close() 时释放。
+
+        Raises:
+            RuntimeError: 捕获中心已停止或出错
+        """
+        shared = self.queue.get(GRAB_TIMEOUT)
+        if shared is None:
+            raise RuntimeError(self.hub.error or "共享捕获已停止")
+        # 使用方比捕获节拍慢时只取最新的一帧
+        while self.queue.depth():
+            newer = self.queue.get(0)
+            if newer is None:
+                break
+            shared.release()
+            shared = newer
+            self.skipped += 1
+        self._release_held()
+        self._held = shared
+        return shared.data[self.y:self.y + self.height, self.x:self.x + self.width]
+
+    def _release_held(self):
+        if self._held is not None:
+            self._held.release()
+            self._held = None
+
+    def close(self):
+        """退订并释放持有的帧"""
+        self.hub.unsubscribe(self)
+        self._release_held()
+
+    def get_stats(self):
+        """获取订阅统计信息
+
+        Returns:
+            dict: 队列统计与分频系数
+        """
+        stats = self.queue.get_stats()
+        stats.update(name=self.name, divider=self.divider, skipped=self.skipped)
+        return stats
+
+
+class CaptureHub:
+    """共享捕获中心：单个线程按帧率抓取，分发给所有订阅者"""
+
+    def __init__(self, source, fps, auto_stop=False):
+        """初始化捕获中心
+
+        Args:
+            source (FrameSource): 帧来源（仅在捕获线程中打开和使用）
+            fps (int): 抓取帧率（各订阅者按分频系数取其中的一部分）
+            auto_stop (bool): 最后一个订阅者退订时是否自动停止
+        """
+        self.source = source
+        self.region = tuple(int(v) for v in source.region)
+        self.fps = fps
+        self.auto_stop = auto_stop
+        self.error = None
+        self.running = False
+        self.grabs = 0
+        self.grab_time = 0.0
+        self.max_live = 0  # 同时存在的共享帧数峰值
+        self._live = 0
+        self._subscriptions = []
+        self._finished = []  # 已退订订阅者的最终统计
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def subscribe(self, name, divider=1, queue_size=2, policy=POLICY_DROP_OLDEST, region=None):
+        """添加订阅者
+
+        Args:
+            name (str): 订阅者名称（用于统计）
+            divider (int): 分频系数，每 divider 个捕获节拍取一帧
+            queue_size (int): 订阅者的帧队列容量
+            policy (str): 队列满时的丢帧策略：drop_oldest 或 drop_newest（不允许阻塞捕获线程）
+            region (tuple, optional): 只取其中的一个区域 (left, top, width, height)，屏幕坐标
+
+        Returns:
+            Subscription: 订阅者
+
+        Raises:
+            ValueError: 策略或区域无效
+            RuntimeError: 捕获中心已停止
+        """
+        if policy not in (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST):
+            raise ValueError(f"共享捕获的订阅者不能使用阻塞策略: {policy}")
+        subscription = Subscription(self, name, max(1, int(divider)), queue_size, policy, region or self.region)
+        if subscription.x < 0 or subscription.y < 0 or subscription.x + subscription.width > self.region[2] \
+                or subscription.y + subscription.height > self.region[3]:
+            raise ValueError(f"区域 {region} 不在捕获范围 {self.region} 内")
+        with self._lock:
+            if self._stop_event.is_set():
+                raise RuntimeError("共享捕获已停止")
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """移除订阅者，丢弃其队列中尚未取出的帧"""
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.remove(subscription)
+            if self.auto_stop and not self._subscriptions:
+                self._stop_event.set()
+        subscription.queue.close()
+        while True:
+            shared = subscription.queue.get(0)
+            if shared is None:
+                break
+            shared.release()
+        with self._lock:
+            self._finished.append(subscription.get_stats())
+
+    def start(self):
+        """启动捕获线程"""
+        self._stop_event.clear()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="capture-hub")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止捕获线程，订阅者随后的 grab() 将抛出异常"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """捕获线程函数：每个节拍只在有订阅者需要时抓取一次"""
+        try:
+            # mss的句柄与线程绑定，来源只在本线程中打开和使用
+            with self.source:
+                scheduler = FrameScheduler(self.fps, POLICY_DROP)
+                scheduler.start()
+                tick = 0
+                while not self._stop_event.is_set():
+                    scheduler.wait(self._stop_event)
+                    if not scheduler.tick():
+                        continue
+                    with self._lock:
+                        targets = [s for s in self._subscriptions if tick % s.divider == 0]
+                    tick += 1
+                    if not targets:
+                        continue
+
+                    start = time.perf_counter()
+                    data = self.source.grab()
+                    self.grab_time += time.perf_counter() - start
+                    self.grabs += 1
+
+                    shared = SharedFrame(self, data, self.grabs, start, len(targets))
+                    with self._lock:
+                        self._live += 1
+                        self.max_live = max(self.max_live, self._live)
+                    # 各订阅者的队列都不阻塞：满了按各自的策略丢帧并释放引用
+                    for subscription in targets:
+                        subscription.queue.put(shared)
+        except Exception as e:
+            self.error = f"共享捕获出错: {str(e)}"
+            print(f"[错误] {self.error}")
+        finally:
+            self.running = False
+            with self._lock:
+                self._stop_event.set()
+                subscriptions = list(self._subscriptions)
+            for subscription in subscriptions:
+                subscription.queue.close()
+
+    def get_stats(self):
+        """获取捕获统计信息
+
+        Returns:
+            dict: 抓取次数、平均抓取耗时、共享帧数和各订阅者（含已退订的）的统计
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            finished = list(self._finished)
+            live = self._live
+        return {
+            "grabs": self.grabs,
+            "grab_time": self.grab_time / self.grabs if self.grabs else 0.0,
+            "live_frames": live,
+            "max_live_frames": self.max_live,
+            "subscribers": finished + [subscription.get_stats() for subscription in subscriptions]
+        }
@@ -0,0 +1,86 @@
+"""
+文件名: core/change_detector.py
+功能: 静止画面检测。在原始BGRA缓冲上做跨步采样比较，画面未变化时
+     捕获循环跳过颜色转换与编码，改为重复上一帧（CFR）或延长上一帧
+     的显示时间（VFR），并统计去重比例与节省的处理时间。
+"""
+
+import numpy as np
+
+
+class ChangeDetector:
+    """基于跨步采样的画面变化检测器"""
+
+    def __init__(self, stride=4, full_check_interval=30):
+        """初始化检测器
+
+        Args:
+            stride (int): 采样步长（行列方向相同），越大越快但越容易漏掉细小变化
+            full_check_interval (int): 连续判定为未变化多少帧后做一次全帧比较，
+                保证采样漏掉的细小变化（如光标、单个字符）最迟在该间隔内被发现
+        """
+        self.stride = max(1, int(stride))
+        self.full_check_interval = max(1, int(full_check_interval))
+        self._previous = None
+        self._previous_sample = None
+        self._unchanged_run = 0
+
+        # 统计
+        self.checked = 0
+        self.unchanged = 0
+
+    def changed(self, frame):
+        """判断帧相对上一帧是否变化
+
+        Args:
+            frame (numpy.ndarray): BGRA帧
+
+        Returns:
+            bool: 画面是否变化（首帧总是视为变化）
+        """
+        self.checked += 1
+        sample = frame[::self.stride, ::self.stride]
+
+        if self._previous is None or self._previous.shape != frame.shape:
+            is_changed = True
+        elif not np.array_equal(sample, self._previous_sample):
+            is_changed = True
+        elif self._unchanged_run + 1 >= self.full_check_interval:
+            # 定期全帧比较，兜底采样漏检
+            is_changed = not np.array_equal(frame, self._previous)
+        else:
+            is_changed = False
+
+        if is_changed:
+            # 保存引用即可：帧来源保证不会复用返回的数组
+            self._previous = frame
+            self._previous_sample = sample
+            self._unchanged_run = 0
+        else:
+            self.unchanged += 1
+            self._unchanged_run += 1
+            if self._unchanged_run >= self.full_check_interval:
+                self._unchanged_run = 0
+        return is_changed
+
+    def reset(self):
+        """丢弃参照帧，下一帧总是视为变化
+
+        参照帧未能进入编码流水线（被队列丢弃）时调用，否则之后相同的画面
+        会被当作重复帧，重复的却是更早写入的旧画面。
+        """
+        self._previous = None
+        self._previous_sample = None
+        self._unchanged_run = 0
+
+    def get_stats(self):
+        """获取检测统计信息
+
+        Returns:
+            dict: 检测帧数、未变化帧数与去重比例
+        """
+        return {
+            "checked": self.checked,
+            "unchanged": self.unchanged,
+            "dedup_ratio": self.unchanged / self.checked if self.checked else 0.0
+        }
@@ -0,0 +1,204 @@
+"""
+文件名: core/color_convert.py
+功能: 捕获帧的颜色转换。屏幕捕获得到的是BGRA，H.264编码需要YUV 4:2:0；
+     此前先转换为BGR、再由编码器内部转换为YUV，每帧两次全尺寸颜色
+     转换并多一份缓冲。这里直接从BGRA生成平面I420或半平面NV12（有限
+     范围，BT.601/BT.709可选），送入编码器的数据量也减为一半。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+# 转换后的帧格式
+COLOR_BGR = "bgr"
+COLOR_I420 = "i420"
+COLOR_NV12 = "nv12"
+COLOR_FORMATS = (COLOR_BGR, COLOR_I420, COLOR_NV12)
+
+# YUV转换矩阵
+MATRIX_BT601 = "bt601"
+MATRIX_BT709 = "bt709"
+
+# 各帧格式对应的ffmpeg原始输入像素格式
+FFMPEG_PIX_FMTS = {
+    COLOR_BGR: "bgr24",
+    COLOR_I420: "yuv420p",
+    COLOR_NV12: "nv12",
+}
+
+# 转换矩阵 -> (Kr, Kb, ffmpeg色彩空间标记)
+_MATRICES = {
+    MATRIX_BT601: (0.299, 0.114, ["-colorspace", "smpte170m", "-color_primaries", "smpte170m",
+                                  "-color_trc", "smpte170m"]),
+    MATRIX_BT709: (0.2126, 0.0722, ["-colorspace", "bt709", "-color_primaries", "bt709",
+                                    "-color_trc", "bt709"]),
+}
+
+
+def frame_shape(color_format, width, height):
+    """获取转换后帧数组的形状
+
+    Args:
+        color_format (str): bgr、i420 或 nv12
+        width (int): 帧宽度
+        height (int): 帧高度
+
+    Returns:
+        tuple: 数组形状（YUV格式为 (height * 3 / 2, width) 的连续平面）
+    """
+    if color_format == COLOR_BGR:
+        return (height, width, 3)
+    return (height * 3 // 2, width)
+
+
+def supports_yuv(width, height):
+    """4:2:0格式要求宽高均为偶数
+
+    Returns:
+        bool: 该尺寸能否直接转换为YUV 4:2:0
+    """
+    return width % 2 == 0 and height % 2 == 0
+
+
+def color_tag_args(matrix):
+    """获取在编码输出中标记色彩空间的ffmpeg参数
+
+    Args:
+        matrix (str): bt601 或 bt709
+
+    Returns:
+        list: ffmpeg输出参数
+    """
+    return _MATRICES[matrix][2] + ["-color_range", "tv"]
+
+
+def _limited_range_weights(matrix):
+    """计算有限范围（Y 16-235，UV 16-240）的BGR系数
+
+    Returns:
+        tuple: (Y系数, Cb系数, Cr系数)，每个为 (B, G, R) 权重
+    """
+    kr, kb, _ = _MATRICES[matrix]
+    kg = 1.0 - kr - kb
+    y = np.array([kb, kg, kr]) * (219 / 255)
+    cb = (np.array([1.0, 0.0, 0.0]) - np.array([kb, kg, kr])) / (2 * (1 - kb)) * (224 / 255)
+    cr = (np.array([0.0, 0.0, 1.0]) - np.array([kb, kg, kr])) / (2 * (1 - kr)) * (224 / 255)
+    return y, cb, cr
+
+
+class ColorConverter:
+    """BGRA帧到BGR/I420/NV12的转换器，输出写入调用方提供的缓冲，可被多个线程同时调用"""
+
+    def __init__(self, color_format=COLOR_I420, matrix=MATRIX_BT601, stripes=None):
+        """初始化转换器
+
+        Args:
+            color_format (str): bgr、i420 或 nv12
+            matrix (str): YUV转换矩阵，bt601 或 bt709
+            stripes (StripePool, optional): 条带线程池，指定时每帧按水平条带并行转换
+        """
+        if color_format not in COLOR_FORMATS:
+            raise ValueError(f"不支持的帧格式: {color_format}")
+        if matrix not in _MATRICES:
+            raise ValueError(f"不支持的转换矩阵: {matrix}")
+        self.color_format = color_format
+        self.matrix = matrix
+        self.pix_fmt = FFMPEG_PIX_FMTS[color_format]
+        self.stripes = stripes
+        self._y, self._cb, self._cr = _limited_range_weights(matrix)
+        # 每个线程各自复用的中间缓冲（每帧新分配大数组的缺页开销超过计算本身）
+        self._local = threading.local()
+
+    def _scratch(self, name, shape):
+        """获取当前线程的中间缓冲（不同大小的条带各用一份）"""
+        buffers = self._local.__dict__.setdefault("buffers", {})
+        buffer = buffers.get((name, shape))
+        if buffer is None:
+            buffer = np.empty(shape, np.uint8)
+            buffers[(name, shape)] = buffer
+        return buffer
+
+    def _split(self, name, frame):
+        """把BGRA帧拆分到复用的通道平面中"""
+        shape = frame.shape[:2]
+        planes = [self._scratch(f"{name}{i}", shape) for i in range(4)]
+        cv2.split(frame, planes)
+        return planes[:3]
+
+    def __call__(self, frame, out):
+        """转换一帧
+
+        Args:
+            frame (numpy.ndarray): BGRA帧，形状 (height, width, 4)
+            out (numpy.ndarray): frame_shape() 形状的输出缓冲
+
+        Returns:
+            numpy.ndarray: out
+        """
+        height = frame.shape[0]
+        if self.stripes is None:
+            self._convert_rows(frame, out, 0, height)
+        else:
+            # YUV 4:2:0的色度按2x2块计算，条带边界对齐到偶数行，结果与整帧转换逐位一致
+            align = 1 if self.color_format == COLOR_BGR else 2
+            self.stripes.run(lambda start, end: self._convert_rows(frame, out, start, end), height, align)
+        return out
+
+    def _convert_rows(self, frame, out, start, end):
+        """转换帧的 [start, end) 行，写入out中对应的区域"""
+        if self.color_format == COLOR_BGR:
+            cv2.cvtColor(frame[start:end], cv2.COLOR_BGRA2BGR, dst=out[start:end])
+            return
+
+        height, width = frame.shape[:2]
+        rows = frame[start:end]
+        y_plane = out[start:end]
+        chroma = out.reshape(-1)[height * width:]
+
+        if self.matrix == MATRIX_BT601:
+            # OpenCV内置I420转换即为BT.601有限范围，单次遍历得到亮度；
+            # 它的色度只取每个2x2块左上角的像素，随后由下面的平均色度覆盖
+            if start == 0 and end == height:
+                cv2.cvtColor(frame, cv2.COLOR_BGRA2YUV_I420, dst=out)
+            else:
+                yuv = cv2.cvtColor(rows, cv2.COLOR_BGRA2YUV_I420,
+                                   dst=self._scratch("i420", ((end - start) * 3 // 2, width)))
+                y_plane[...] = yuv[:end - start]
+        else:
+            # 亮度：逐通道加权（OpenCV按SIMD处理uint8，两次舍入误差不超过1）
+            b, g, r = self._split("full", rows)
+            self._weighted(b, g, r, self._y, 16, y_plane, self._scratch("partial", y_plane.shape))
+
+        # 色度：先2x2平均再加权，与先加权再平均等价（线性），只需处理四分之一的像素
+        chroma_shape = (height // 2, width // 2)
+        first, last = start // 2, end // 2
+        stripe_shape = (last - first, width // 2)
+        half = cv2.resize(rows, stripe_shape[::-1], dst=self._scratch("half", stripe_shape + (4,)),
+                          interpolation=cv2.INTER_AREA)
+        hb, hg, hr = self._split("half", half)
+        partial = self._scratch("chroma_partial", stripe_shape)
+        quarter = chroma_shape[0] * chroma_shape[1]
+        if self.color_format == COLOR_I420:
+            u_plane = chroma[:quarter].reshape(chroma_shape)[first:last]
+            v_plane = chroma[quarter:].reshape(chroma_shape)[first:last]
+        else:
+            u_plane = self._scratch("u", stripe_shape)
+            v_plane = self._scratch("v", stripe_shape)
+        self._weighted(hb, hg, hr, self._cb, 128, u_plane, partial)
+        self._weighted(hb, hg, hr, self._cr, 128, v_plane, partial)
+        if self.color_format == COLOR_NV12:
+            cv2.merge([u_plane, v_plane], dst=chroma.reshape(chroma_shape + (2,))[first:last])
+
+    @staticmethod
+    def _weighted(b, g, r, weights, offset, dst, partial):
+        """计算 offset + wb*B + wg*G + wr*R（uint8，饱和）写入dst
+
+        先合并系数最大（正）与最小（负）的两个通道，保证中间结果不会在0或255处截断。
+        """
+        wb, wg, wr = weights
+        planes = sorted(((wb, b), (wg, g), (wr, r)), key=lambda item: -item[0])
+        (w1, p1), (w2, p2), (w3, p3) = planes
+        cv2.addWeighted(p1, w1, p3, w3, offset, dst=partial)
+        return cv2.addWeighted(partial, 1.0, p2, w2, 0, dst=dst)
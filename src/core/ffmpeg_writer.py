@@ -0,0 +1,212 @@
+"""
+文件名: core/ffmpeg_writer.py
+功能: 基于ffmpeg进程的流式视频编码器。捕获的原始帧通过管道直接
+     送入一个常驻的libx264编码进程，录制结束时视频已编码完成，
+     只需与音频做容器级封装即可得到最终MP4文件。同一编码器也用于
+     直接输出动画WebP（有损/无损）和APNG。
+"""
+
+import os
+import subprocess
+
+import imageio_ffmpeg
+
+# Windows下打包为窗口程序时，避免ffmpeg子进程弹出控制台窗口
+_CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+
+# 动画图片输出格式：格式名 -> (文件扩展名, ffmpeg输出参数)
+# WebP压缩级别按实时编码的速度选取：有损2级、无损1级与默认4级体积相近但明显更快
+ANIMATION_FORMATS = {
+    "webp": (".webp", [
+        "-f", "webp", "-c:v", "libwebp_anim", "-lossless", "0", "-quality", "75",
+        "-compression_level", "2", "-pix_fmt", "yuv420p", "-loop", "0"
+    ]),
+    "webp_lossless": (".webp", [
+        "-f", "webp", "-c:v", "libwebp_anim", "-lossless", "1",
+        "-compression_level", "1", "-pix_fmt", "bgra", "-loop", "0"
+    ]),
+    "apng": (".png", [
+        "-f", "apng", "-c:v", "apng", "-plays", "0", "-pix_fmt", "rgb24"
+    ]),
+}
+
+
+def get_ffmpeg_exe():
+    """获取ffmpeg可执行文件路径（随moviepy依赖的imageio-ffmpeg一起分发）
+
+    Returns:
+        str: ffmpeg可执行文件路径
+    """
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def run_ffmpeg(args):
+    """同步执行一条ffmpeg命令
+
+    Args:
+        args (list): ffmpeg命令行参数（不含可执行文件本身）
+
+    Raises:
+        RuntimeError: ffmpeg执行失败时抛出，包含错误输出
+    """
+    cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostats", "-loglevel", "error", "-y"] + list(args)
+    result = subprocess.run(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        creationflags=_CREATION_FLAGS
+    )
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg执行失败 (返回码 {result.returncode}): {message}")
+
+
+def probe_video_codec(video_path):
+    """探测视频文件中第一条视频流的编码格式
+
+    Args:
+        video_path (str): 视频文件路径
+
+    Returns:
+        str: 编码名称（如 h264、mpeg4），无法识别时返回None
+    """
+    result = subprocess.run(
+        [get_ffmpeg_exe(), "-hide_banner", "-i", video_path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        creationflags=_CREATION_FLAGS
+    )
+    # ffmpeg没有指定输出时返回非0，流信息位于错误输出中，形如 "Stream #0:0...: Video: h264 (High) ..."
+    for line in result.stderr.decode("utf-8", errors="replace").splitlines():
+        if "Stream #" in line and "Video:" in line:
+            return line.split("Video:", 1)[1].split()[0].strip(",")
+    return None
+
+
+def mux_audio_video(video_path, audio_path, output_path):
+    """将已编码的视频与WAV音频封装为MP4（视频流直接复制，仅编码音频）
+
+    Args:
+        video_path (str): 已编码的H.264视频文件路径
+        audio_path (str): WAV音频文件路径
+        output_path (str): 输出文件路径
+    """
+    run_ffmpeg([
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-shortest",
+        output_path
+    ])
+
+
+class FFmpegWriter:
+    """ffmpeg流式编码器，接口与cv2.VideoWriter保持一致（write/release）"""
+
+    def __init__(self, output_path, width, height, fps=30, pix_fmt="bgr24",
+                 codec="libx264", preset="ultrafast", crf=23, output_args=None, muxer_args=None,
+                 color_args=None):
+        """初始化并启动编码进程
+
+        Args:
+            output_path (str): 输出视频文件路径
+            width (int): 帧宽度
+            height (int): 帧高度
+            fps (int): 帧率
+            pix_fmt (str): 输入原始帧的像素格式
+            codec (str): 视频编码器
+            preset (str): 编码预设
+            crf (int): 质量参数，越小质量越高
+            output_args (list, optional): 自定义输出参数（如 ANIMATION_FORMATS 中的参数），
+                指定时忽略codec、preset和crf
+            muxer_args (list, optional): 追加在编码参数之后的封装参数（如分段输出参数），
+                此时 output_path 可以是分段文件名模式
+            color_args (list, optional): 输入已是YUV时在输出中标记色彩空间的参数
+                （见 color_convert.color_tag_args）
+        """
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.frame_count = 0
+
+        if output_args is None:
+            output_args = [
+                # H.264，yuv420p要求宽高为偶数，奇数尺寸时补边
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v", codec,
+                "-preset", preset,
+                "-crf", str(crf),
+                # 不使用B帧：解码顺序即显示顺序，结束后可直接按捕获时间戳改写帧时长
+                "-bf", "0",
+                "-pix_fmt", "yuv420p"
+            ] + list(color_args or [])
+
+        cmd = [
+            get_ffmpeg_exe(), "-hide_banner", "-nostats", "-loglevel", "error", "-y",
+            # 输入：来自标准输入的原始帧
+            "-f", "rawvideo",
+            "-pix_fmt", pix_fmt,
+            "-s", f"{width}x{height}",
+            "-r", str(fps),
+            "-i", "-",
+            "-an"
+        ] + list(output_args) + list(muxer_args or []) + [output_path]
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            creationflags=_CREATION_FLAGS
+        )
+
+    def write(self, frame):
+        """写入一帧
+
+        Args:
+            frame (numpy.ndarray): 与pix_fmt匹配的原始帧数据
+
+        Raises:
+            RuntimeError: 编码进程意外退出时抛出
+        """
+        try:
+            self.process.stdin.write(memoryview(frame).cast("B") if frame.flags.c_contiguous else frame.tobytes())
+        except (BrokenPipeError, OSError):
+            raise RuntimeError(f"ffmpeg编码进程已退出: {self._read_error()}")
+        self.frame_count += 1
+
+    def release(self):
+        """结束输入并等待编码进程完成
+
+        Raises:
+            RuntimeError: 编码失败时抛出
+        """
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        returncode = self.process.wait()
+        error = self._read_error()
+        self.process = None
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg编码失败 (返回码 {returncode}): {error}")
+
+    def _read_error(self):
+        """读取编码进程的错误输出
+
+        Returns:
+            str: 错误输出文本
+        """
+        try:
+            return self.process.stderr.read().decode("utf-8", errors="replace").strip()
+        except Exception:
+            return ""
@@ -0,0 +1,76 @@
+"""
+文件名: core/finalizer.py
+功能: 录制后期处理队列。停止录制时只结束捕获，封装MP4、编码GIF等
+     耗时的后期处理交给后台线程按提交顺序依次完成，界面和热键不会
+     因此卡住，上一段录制仍在处理时即可开始新的录制。
+"""
+
+import queue
+import threading
+
+
+class FinalizeQueue:
+    """后期处理队列：单个后台线程按顺序处理已停止捕获的录制"""
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._pending = []  # 已提交尚未完成的录制器
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="finalizer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, recorder, on_progress=None, on_done=None):
+        """提交一个已停止捕获的录制
+
+        回调在后台线程中执行，更新界面时需要自行切换回主线程。
+
+        Args:
+            recorder (Recorder): 已调用 stop_capture() 的录制器
+            on_progress (callable, optional): 进度回调，参数为 (录制器, 阶段描述, 完成比例或None)
+            on_done (callable, optional): 完成回调，参数为 (录制器, 输出文件路径或None, 错误信息字典)
+        """
+        with self._lock:
+            self._pending.append(recorder)
+        self._jobs.put((recorder, on_progress, on_done))
+
+    def _run(self):
+        """后台处理线程函数"""
+        while True:
+            recorder, on_progress, on_done = self._jobs.get()
+            try:
+                progress = None
+                if on_progress is not None:
+                    def progress(stage, fraction, recorder=recorder):
+                        on_progress(recorder, stage, fraction)
+                try:
+                    output_path, errors = recorder.finalize(progress)
+                except Exception as e:
+                    output_path, errors = None, {"video": f"处理录制文件时出错: {str(e)}"}
+                    print(f"[错误] {errors['video']}")
+                if on_done is not None:
+                    on_done(recorder, output_path, errors)
+            except Exception as e:
+                print(f"[错误] 后期处理回调出错: {str(e)}")
+            finally:
+                # 完成回调返回后才移出待处理列表，轮询 pending() 等待退出时不会错过回调
+                with self._lock:
+                    self._pending.remove(recorder)
+                self._jobs.task_done()
+
+    def pending(self):
+        """获取尚未处理完成的录制
+
+        Returns:
+            list: 录制器列表（按提交顺序）
+        """
+        with self._lock:
+            return list(self._pending)
+
+    def join(self):
+        """等待所有已提交的录制处理完成
+
+        回调通过 root.after 回到界面线程时，不能在界面线程中调用（会互相等待），
+        应在主循环中轮询 pending()。
+        """
+        self._jobs.join()
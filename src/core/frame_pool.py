@@ -0,0 +1,83 @@
+"""
+文件名: core/frame_pool.py
+功能: 帧缓冲池与零拷贝帧包装。捕获循环中复用预分配的NumPy缓冲，
+     颜色转换直接写入池中缓冲（dst=输出），mss返回的原始BGRA数据
+     通过np.frombuffer包装而不复制，稳态下每帧几乎不产生新分配。
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+
+def bgra_view(screenshot):
+    """将mss截图的原始BGRA缓冲包装为NumPy数组（不复制数据）
+
+    Args:
+        screenshot: mss.grab() 返回的截图对象
+
+    Returns:
+        numpy.ndarray: 形状为 (height, width, 4) 的uint8数组视图
+    """
+    return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+        screenshot.height, screenshot.width, 4
+    )
+
+
+class FramePool:
+    """固定形状的帧缓冲池，线程安全"""
+
+    def __init__(self, shape, dtype=np.uint8, size=8):
+        """初始化缓冲池并预分配缓冲
+
+        Args:
+            shape (tuple): 缓冲形状，例如 (height, width, 3)
+            dtype: 数据类型
+            size (int): 预分配的缓冲数量
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._free = deque(np.empty(self.shape, self.dtype) for _ in range(max(1, int(size))))
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.allocated = len(self._free)
+        self.reused = 0
+
+    def acquire(self):
+        """取出一块缓冲，池已空时临时新分配一块
+
+        Returns:
+            numpy.ndarray: 可写缓冲（内容未初始化）
+        """
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                return self._free.popleft()
+            self.allocated += 1
+        return np.empty(self.shape, self.dtype)
+
+    def release(self, buffer):
+        """归还缓冲
+
+        Args:
+            buffer (numpy.ndarray): 之前通过acquire取出的缓冲
+        """
+        if buffer.shape != self.shape or buffer.dtype != self.dtype:
+            return
+        with self._lock:
+            self._free.append(buffer)
+
+    def get_stats(self):
+        """获取缓冲池统计信息
+
+        Returns:
+            dict: 已分配缓冲数、复用次数与空闲缓冲数
+        """
+        with self._lock:
+            return {
+                "allocated": self.allocated,
+                "reused": self.reused,
+                "free": len(self._free)
+            }
@@ -0,0 +1,249 @@
+"""
+文件名: core/frame_source.py
+功能: 帧来源抽象。录制流水线通过统一的FrameSource接口获取BGRA帧，
+     屏幕捕获（mss）只是其中一种实现；另外提供合成画面与视频/图片
+     序列回放两种来源，便于在无显示器的环境下进行测试和性能基准。
+"""
+
+import os
+import glob
+
+import cv2
+import numpy as np
+
+from .frame_pool import bgra_view
+
+# mss仅屏幕捕获需要，无显示环境下允许缺失
+try:
+    import mss
+except ImportError:
+    mss = None
+
+
+class FrameSource:
+    """帧来源基类，grab() 返回形状为 (height, width, 4) 的BGRA uint8数组"""
+
+    def __init__(self, region):
+        """初始化帧来源
+
+        Args:
+            region (tuple): 区域 (left, top, width, height)
+        """
+        self.region = tuple(region)
+        self.width = int(region[2])
+        self.height = int(region[3])
+
+    def open(self):
+        """打开来源，获取所需资源"""
+
+    def grab(self):
+        """获取一帧
+
+        Returns:
+            numpy.ndarray: BGRA帧。调用方可以持有返回的数组，来源不会复用它
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """关闭来源，释放资源"""
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MssFrameSource(FrameSource):
+    """基于mss的屏幕区域捕获"""
+
+    def __init__(self, region):
+        super().__init__(region)
+        self.monitor = {"left": int(region[0]), "top": int(region[1]),
+                        "width": self.width, "height": self.height}
+        self.sct = None
+
+    def open(self):
+        if mss is None:
+            raise RuntimeError("未安装mss库，无法进行屏幕捕获")
+        self.sct = mss.mss()
+
+    def grab(self):
+        # 零拷贝包装mss返回的原始BGRA数据
+        return bgra_view(self.sct.grab(self.monitor))
+
+    def close(self):
+        if self.sct is not None:
+            self.sct.close()
+            self.sct = None
+
+
+class SyntheticFrameSource(FrameSource):
+    """合成画面来源，模拟典型的录屏内容"""
+
+    PATTERNS = ("moving", "static", "text")
+
+    def __init__(self, region, pattern="moving", seed=0):
+        """初始化合成画面来源
+
+        Args:
+            region (tuple): 区域 (left, top, width, height)，仅使用宽高
+            pattern (str): 画面类型：moving（移动方块）、static（静止桌面）、text（文字滚动）
+            seed (int): 随机种子，保证结果可复现
+        """
+        super().__init__(region)
+        if pattern not in self.PATTERNS:
+            raise ValueError(f"不支持的合成画面类型: {pattern}")
+        self.pattern = pattern
+        self.frame_index = 0
+        self._background = self._make_desktop(np.random.default_rng(seed))
+        self._text_page = self._make_text_page() if pattern == "text" else None
+
+    def _make_desktop(self, rng):
+        """生成模拟桌面：渐变背景加若干窗口色块"""
+        frame = np.empty((self.height, self.width, 4), np.uint8)
+        frame[..., 0] = np.linspace(180, 120, self.height, dtype=np.uint8)[:, None]
+        frame[..., 1] = np.linspace(120, 80, self.width, dtype=np.uint8)[None, :]
+        frame[..., 2] = 60
+        frame[..., 3] = 255
+        for _ in range(6):
+            x, y = rng.integers(0, max(1, self.width // 2)), rng.integers(0, max(1, self.height // 2))
+            w, h = rng.integers(self.width // 8 + 1, self.width // 2 + 2), rng.integers(self.height // 8 + 1, self.height // 2 + 2)
+            color = [int(c) for c in rng.integers(0, 256, 3)] + [255]
+            cv2.rectangle(frame, (int(x), int(y)), (int(x + w), int(y + h)), color, -1)
+        return frame
+
+    def _make_text_page(self):
+        """生成两倍高度的文字页面，滚动时从中截取窗口"""
+        page = np.full((self.height * 2, self.width, 4), 255, np.uint8)
+        line_height = 24
+        for i, y in enumerate(range(line_height, page.shape[0], line_height)):
+            text = f"{i:04d}  def render_frame(self, buffer, offset): return buffer[offset:]"
+            cv2.putText(page, text, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30, 255), 1, cv2.LINE_AA)
+        return page
+
+    def grab(self):
+        index = self.frame_index
+        self.frame_index += 1
+
+        if self.pattern == "text":
+            offset = (index * 2) % self.height
+            return self._text_page[offset:offset + self.height].copy()
+
+        frame = self._background.copy()
+        if self.pattern == "moving":
+            size = max(8, min(self.width, self.height) // 6)
+            x = (index * 7) % max(1, self.width - size)
+            y = (index * 3) % max(1, self.height - size)
+            frame[y:y + size, x:x + size, :3] = (40, 200, 240)
+        return frame
+
+
+class ReplayFrameSource(FrameSource):
+    """回放已有视频文件或图片序列，播放到末尾后循环"""
+
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, path, region=None, loop=True):
+        """初始化回放来源
+
+        Args:
+            path (str): 视频文件、图片目录或图片通配符（如 frames/*.png）
+            region (tuple, optional): 输出区域，宽高与素材不同时缩放；为空时使用素材尺寸
+            loop (bool): 到达末尾后是否从头循环
+        """
+        self.path = path
+        self.loop = loop
+        self.capture = None
+        self.images = self._list_images(path)
+        self.image_index = 0
+
+        if region is None:
+            width, height = self._probe_size()
+            region = (0, 0, width, height)
+        super().__init__(region)
+
+    def _list_images(self, path):
+        """列出图片序列，path为视频文件时返回None"""
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in os.listdir(path)]
+        elif any(ch in path for ch in "*?["):
+            files = glob.glob(path)
+        else:
+            return None
+        files = sorted(f for f in files if f.lower().endswith(self.IMAGE_EXTENSIONS))
+        if not files:
+            raise ValueError(f"未找到图片序列: {path}")
+        return files
+
+    def _probe_size(self):
+        """读取素材尺寸"""
+        if self.images is not None:
+            image = cv2.imread(self.images[0])
+            if image is None:
+                raise ValueError(f"无法读取图片: {self.images[0]}")
+            return image.shape[1], image.shape[0]
+        capture = cv2.VideoCapture(self.path)
+        try:
+            if not capture.isOpened():
+                raise ValueError(f"无法打开视频文件: {self.path}")
+            return int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        finally:
+            capture.release()
+
+    def open(self):
+        if self.images is None:
+            self.capture = cv2.VideoCapture(self.path)
+            if not self.capture.isOpened():
+                raise ValueError(f"无法打开视频文件: {self.path}")
+
+    def _read_next(self):
+        """读取下一帧BGR图像，不循环时到达末尾返回None"""
+        if self.images is not None:
+            if self.image_index >= len(self.images):
+                if not self.loop:
+                    return None
+                self.image_index = 0
+            image = cv2.imread(self.images[self.image_index])
+            self.image_index += 1
+            return image
+
+        ok, image = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self.capture.read()
+        return image if ok else None
+
+    def grab(self):
+        image = self._read_next()
+        if image is None:
+            raise EOFError(f"回放素材已结束: {self.path}")
+        if image.shape[1] != self.width or image.shape[0] != self.height:
+            image = cv2.resize(image, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+def create_frame_source(kind="screen", region=None, **kwargs):
+    """按类型创建帧来源
+
+    Args:
+        kind (str): screen、synthetic 或 replay
+        region (tuple): 区域 (left, top, width, height)
+        **kwargs: 传给具体来源的参数（synthetic: pattern, seed；replay: path, loop）
+
+    Returns:
+        FrameSource: 帧来源实例
+    """
+    if kind == "screen":
+        return MssFrameSource(region)
+    elif kind == "synthetic":
+        return SyntheticFrameSource(region, **kwargs)
+    elif kind == "replay":
+        return ReplayFrameSource(region=region, **kwargs)
+    raise ValueError(f"不支持的帧来源类型: {kind}")
@@ -0,0 +1,175 @@
+"""
+文件名: core/frame_store.py
+功能: 可溢出到磁盘的帧存储。最近的帧保存在内存中，超出内存预算的
+     较旧帧写入输出目录下预分配的内存映射文件（np.memmap），长时间
+     GIF录制的内存占用因此有上限；结束编码时按顺序读回，以顺序I/O
+     代替系统换页。重复帧只记录引用，不重复存储。
+"""
+
+import os
+from collections import deque
+
+import numpy as np
+
+# 默认内存预算（字节）
+DEFAULT_RAM_BUDGET = 256 * 1024 * 1024
+
+# 溢出文件每次扩展的帧数
+_GROW_FRAMES = 64
+
+
+class FrameStore:
+    """按时间顺序追加帧的存储，接口与列表相似（len/下标/迭代）
+
+    连续读取时同一存储帧返回同一数组对象，编码器据此识别重复帧。
+    """
+
+    def __init__(self, shape, dtype, path, ram_budget=DEFAULT_RAM_BUDGET):
+        """初始化帧存储
+
+        Args:
+            shape (tuple): 单帧形状
+            dtype: 单帧数据类型
+            path (str): 溢出文件路径（只在需要溢出时创建）
+            ram_budget (int): 内存中保存帧的最大字节数
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.ram_frames = max(1, ram_budget // self.frame_bytes)
+
+        self._ticks = []  # 每个时间槽对应的存储帧编号
+        self._ram = deque()  # 内存中的 (编号, 帧)，按编号递增
+        self._count = 0  # 已存储的不同帧数
+        self._map = None
+        self._capacity = 0  # 溢出文件可容纳的帧数
+        self._last = (None, None)  # 最近一次读取的 (编号, 帧)
+
+        self.spilled = 0  # 写入溢出文件的帧数
+
+    def append(self, frame, repeat=1):
+        """追加一帧
+
+        Args:
+            frame (numpy.ndarray): 帧数据，存储直接持有该数组，调用方之后不应再修改它
+            repeat (int): 该帧占用的时间槽数
+        """
+        index = self._count
+        self._count += 1
+        self._ram.append((index, np.ascontiguousarray(frame, dtype=self.dtype)))
+        self._ticks.extend([index] * repeat)
+        while len(self._ram) > self.ram_frames:
+            self._spill(*self._ram.popleft())
+
+    def repeat(self, count=1):
+        """重复上一帧
+
+        Args:
+            count (int): 重复的时间槽数
+        """
+        if not self._ticks:
+            raise IndexError("帧存储为空，无法重复上一帧")
+        self._ticks.extend([self._ticks[-1]] * count)
+
+    def _spill(self, index, frame):
+        """把帧写入溢出文件"""
+        if index >= self._capacity:
+            self._grow(index + 1)
+        self._map[index] = frame
+        self.spilled += 1
+
+    def _grow(self, required):
+        """扩展溢出文件并重新映射"""
+        capacity = max(required, self._capacity + _GROW_FRAMES, self._capacity * 2)
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * self.frame_bytes)
+        self._map = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity,) + self.shape)
+        self._capacity = capacity
+
+    def _load(self, index):
+        """按存储编号读取帧"""
+        if self._last[0] == index:
+            return self._last[1]
+        if self._ram and index >= self._ram[0][0]:
+            frame = self._ram[index - self._ram[0][0]][1]
+        else:
+            frame = self._map[index]
+        self._last = (index, frame)
+        return frame
+
+    def runs(self, start=0, end=None):
+        """按时间槽区间遍历连续相同的帧
+
+        Args:
+            start (int): 起始时间槽
+            end (int, optional): 结束时间槽（不含），默认到末尾
+
+        Yields:
+            tuple: (存储帧编号, 连续的时间槽数)
+        """
+        end = len(self._ticks) if end is None else end
+        index, count = None, 0
+        for tick in range(start, end):
+            current = self._ticks[tick]
+            if current == index:
+                count += 1
+                continue
+            if index is not None:
+                yield index, count
+            index, count = current, 1
+        if index is not None:
+            yield index, count
+
+    def spill_all(self):
+        """把内存中的帧全部写入溢出文件，之后其他进程可通过 mapping() 共享读取"""
+        while self._ram:
+            self._spill(*self._ram.popleft())
+        if self._map is not None:
+            self._map.flush()
+        self._last = (None, None)
+
+    def mapping(self):
+        """获取溢出文件的映射参数（供其他进程以np.memmap只读打开）
+
+        Returns:
+            tuple: (文件路径, 数据类型字符串, 单帧形状, 帧容量)
+        """
+        return self.path, self.dtype.str, self.shape, self._capacity
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def __getitem__(self, tick):
+        return self._load(self._ticks[tick])
+
+    def __iter__(self):
+        for index in self._ticks:
+            yield self._load(index)
+
+    def get_stats(self):
+        """获取存储统计
+
+        Returns:
+            dict: 时间槽数、不同帧数、内存帧数、溢出帧数、溢出文件大小
+        """
+        return {
+            "ticks": len(self._ticks),
+            "frames": self._count,
+            "ram_frames": len(self._ram),
+            "spilled": self.spilled,
+            "spill_bytes": self._capacity * self.frame_bytes
+        }
+
+    def close(self):
+        """释放内存并删除溢出文件"""
+        self._ram.clear()
+        self._ticks.clear()
+        self._last = (None, None)
+        self._map = None
+        self._capacity = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
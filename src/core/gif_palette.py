@@ -0,0 +1,281 @@
+"""
+文件名: core/gif_palette.py
+功能: 全局调色板GIF量化。录制时帧以RGB565（每像素2字节）保存，
+     结束时从按步长抽样的帧中统计颜色生成一个全局调色板（或按场景
+     切换生成多个调色板），再通过65536项查找表把每个像素直接映射为
+     调色板索引，可选8x8有序（Bayer）抖动。
+"""
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .gif_writer import GifWriter, IndexedFrame
+
+# 调色板模式
+PALETTE_LOCAL = "local"    # 每帧独立量化（流式写入）
+PALETTE_GLOBAL = "global"  # 整段录制共用一个调色板
+PALETTE_SCENE = "scene"    # 画面大幅变化时切换调色板
+PALETTE_MODES = (PALETTE_LOCAL, PALETTE_GLOBAL, PALETTE_SCENE)
+
+# 参与调色板统计的最大像素数
+MAX_SAMPLE_PIXELS = 1 << 20
+
+# 8x8 Bayer阈值矩阵（0-63）
+_BAYER8 = np.array([
+    [0, 32, 8, 40, 2, 34, 10, 42],
+    [48, 16, 56, 24, 50, 18, 58, 26],
+    [12, 44, 4, 36, 14, 46, 6, 38],
+    [60, 28, 52, 20, 62, 30, 54, 22],
+    [3, 35, 11, 43, 1, 33, 9, 41],
+    [51, 19, 59, 27, 49, 17, 57, 25],
+    [15, 47, 7, 39, 13, 45, 5, 37],
+    [63, 31, 55, 23, 61, 29, 53, 21],
+], dtype=np.int16)
+
+
+def to_rgb565(frame):
+    """把BGRA帧压缩为RGB565编码
+
+    Args:
+        frame (numpy.ndarray): BGRA帧
+
+    Returns:
+        numpy.ndarray: 形状为 (height, width) 的uint16数组，位布局为 R5 G6 B5
+    """
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR565).view(np.uint16)[..., 0]
+
+
+def rgb565_to_rgb(codes):
+    """把RGB565编码展开为RGB888（低位用高位补齐，保证白色仍为255）
+
+    Args:
+        codes (numpy.ndarray): uint16编码数组
+
+    Returns:
+        numpy.ndarray: 形状为 codes.shape + (3,) 的uint8数组
+    """
+    codes = codes.astype(np.uint32)
+    r = (codes >> 11) & 0x1F
+    g = (codes >> 5) & 0x3F
+    b = codes & 0x1F
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.uint8)
+
+
+def _sample_pixels(frames):
+    """从若干帧中按空间步长抽取像素，总数不超过 MAX_SAMPLE_PIXELS"""
+    height, width = frames[0].shape
+    stride = 1
+    while len(frames) * ((height + stride - 1) // stride) * ((width + stride - 1) // stride) > MAX_SAMPLE_PIXELS:
+        stride += 1
+    return np.concatenate([frame[::stride, ::stride].ravel() for frame in frames])
+
+
+def build_palette(frames, max_colors=255):
+    """根据抽样帧生成调色板
+
+    Args:
+        frames (list): RGB565帧列表（已抽样）
+        max_colors (int): 最大颜色数，默认留出一个索引作为透明色
+
+    Returns:
+        bytes: RGB调色板数据
+    """
+    codes = _sample_pixels(frames)
+    unique = np.unique(codes)
+    if len(unique) <= max_colors:
+        # 颜色数不超过上限（界面录屏的常见情况）时直接使用原色
+        return rgb565_to_rgb(unique).tobytes()
+
+    # 中位切分：抽样像素的出现次数即颜色权重
+    image = Image.fromarray(rgb565_to_rgb(codes)[None, :, :])
+    quantized = image.quantize(colors=max_colors, method=Image.Quantize.MEDIANCUT)
+    used = len(quantized.getcolors(max_colors) or []) or max_colors
+    return bytes(quantized.getpalette()[:used * 3])
+
+
+def build_lookup(palette):
+    """为全部65536个RGB565编码预先计算最近的调色板索引
+
+    Args:
+        palette (bytes): RGB调色板数据
+
+    Returns:
+        numpy.ndarray: 长度为65536的uint8查找表
+    """
+    colors = rgb565_to_rgb(np.arange(65536, dtype=np.uint16)).reshape(256, 256, 3)
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(palette + palette[-3:] * (256 - len(palette) // 3))
+    mapped = Image.fromarray(colors).quantize(palette=palette_image, dither=Image.Dither.NONE)
+    return np.asarray(mapped).ravel().copy()
+
+
+def _encode_rgb565(rgb):
+    """把RGB888数组编码为RGB565"""
+    rgb = rgb.astype(np.uint16)
+    return ((rgb[..., 0] >> 3) << 11) | ((rgb[..., 1] >> 2) << 5) | (rgb[..., 2] >> 3)
+
+
+class PaletteMapper:
+    """把RGB565帧映射为调色板索引"""
+
+    def __init__(self, palette, dither=False):
+        """初始化映射器
+
+        Args:
+            palette (bytes): RGB调色板数据
+            dither (bool): 是否使用8x8有序抖动
+        """
+        self.palette = palette
+        self.lookup = build_lookup(palette)
+        self.dither = dither
+        self._cells = None
+        if dither:
+            self.lookup = self._build_dither_lookup()
+
+    def _build_dither_lookup(self):
+        """为Bayer矩阵的64个位置分别预先计算抖动后的查找表
+
+        抖动偏移在查找表中完成，逐帧映射仍只需一次查表。
+        """
+        # 抖动幅度取调色板颜色间距的估计值（颜色越少间距越大）
+        colors = max(2, len(self.palette) // 3)
+        strength = 256 / colors ** (1 / 3)
+        offsets = ((np.arange(64, dtype=np.float32) * 2 + 1) / 128.0 - 0.5) * strength
+
+        base = rgb565_to_rgb(np.arange(65536, dtype=np.uint16)).astype(np.int16)
+        tables = np.empty((64, 65536), np.uint8)
+        for level, offset in enumerate(offsets.astype(np.int16)):
+            shifted = np.clip(base + offset, 0, 255)
+            tables[level] = self.lookup[_encode_rgb565(shifted)]
+        return tables.ravel()
+
+    def _cell_offsets(self, height, width):
+        """按画面尺寸平铺Bayer矩阵，得到每个像素所用查找表的起始偏移"""
+        if self._cells is None or self._cells.shape != (height, width):
+            cells = _BAYER8.astype(np.uint32) << 16
+            tiled = np.tile(cells, ((height + 7) // 8, (width + 7) // 8))
+            self._cells = np.ascontiguousarray(tiled[:height, :width])
+        return self._cells
+
+    def map(self, frame):
+        """映射一帧
+
+        Args:
+            frame (numpy.ndarray): RGB565帧
+
+        Returns:
+            numpy.ndarray: 形状为 (height, width) 的uint8调色板索引
+        """
+        if self.dither:
+            return np.take(self.lookup, self._cell_offsets(*frame.shape) + frame)
+        return np.take(self.lookup, frame)
+
+
+def _coarse_histogram(frame):
+    """计算稀疏抽样像素的4-4-4位颜色直方图（归一化），用于场景切换判断"""
+    codes = frame[::16, ::16].ravel()
+    bins = ((codes >> 12) << 8) | (((codes >> 7) & 0x0F) << 4) | ((codes >> 1) & 0x0F)
+    histogram = np.bincount(bins, minlength=4096).astype(np.float32)
+    return histogram / max(1, len(codes))
+
+
+def split_scenes(frames, threshold=0.5):
+    """按颜色分布的变化把帧序列划分为场景
+
+    Args:
+        frames (list): RGB565帧列表，重复帧为同一对象
+        threshold (float): 直方图L1距离（0-2）超过该值视为新场景
+
+    Returns:
+        list: 每个场景的起始帧下标
+    """
+    starts = [0]
+    reference = None
+    previous = None
+    for index, frame in enumerate(frames):
+        if frame is previous:
+            continue
+        previous = frame
+        histogram = _coarse_histogram(frame)
+        if reference is None:
+            reference = histogram
+        elif np.abs(histogram - reference).sum() > threshold:
+            starts.append(index)
+            reference = histogram
+    return starts
+
+
+def _distinct_sample(frames, start, end, sample_frames):
+    """从帧序列的 [start, end) 区间中按步长抽取不重复的帧"""
+    distinct = []
+    previous = None
+    for index in range(start, end):
+        frame = frames[index]
+        if frame is not previous:
+            distinct.append(index)
+            previous = frame
+    step = max(1, len(distinct) // sample_frames)
+    return [frames[index] for index in distinct[::step][:sample_frames]]
+
+
+def scene_palettes(frames, mode=PALETTE_GLOBAL, max_colors=255, sample_frames=32):
+    """划分场景并为每个场景生成调色板
+
+    Args:
+        frames (list): RGB565帧序列（列表或FrameStore）
+        mode (str): global 或 scene
+        max_colors (int): 每个调色板的最大颜色数，默认留出一个索引作为透明色
+        sample_frames (int): 每个调色板最多抽样的帧数
+
+    Returns:
+        list: 每个场景的 (起始下标, 结束下标, 调色板)
+    """
+    if not len(frames):
+        raise ValueError("没有可编码的帧")
+    if mode not in (PALETTE_GLOBAL, PALETTE_SCENE):
+        raise ValueError(f"不支持的调色板模式: {mode}")
+
+    starts = split_scenes(frames) if mode == PALETTE_SCENE else [0]
+    return [
+        (start, end, build_palette(_distinct_sample(frames, start, end, sample_frames), max_colors))
+        for start, end in zip(starts, starts[1:] + [len(frames)])
+    ]
+
+
+def encode_gif(frames, output_path, fps=30, mode=PALETTE_GLOBAL, dither=False,
+               max_colors=255, sample_frames=32):
+    """使用全局（或按场景）调色板把RGB565帧序列编码为GIF
+
+    Args:
+        frames (list): RGB565帧序列（列表或FrameStore），每项对应 1/fps 秒，
+            按顺序读取时重复帧应为同一对象
+        output_path (str): 输出文件路径
+        fps (int): 帧率
+        mode (str): global 或 scene
+        dither (bool): 是否使用有序抖动
+        max_colors (int): 每个调色板的最大颜色数
+        sample_frames (int): 每个调色板最多抽样的帧数
+
+    Returns:
+        int: 写入文件的帧数
+    """
+    scenes = scene_palettes(frames, mode, max_colors, sample_frames)
+
+    height, width = frames[0].shape
+    writer = GifWriter(output_path, width, height, fps)
+    try:
+        for start, end, palette in scenes:
+            mapper = PaletteMapper(palette, dither)
+            previous, indexed = None, None
+            # 按顺序读取，帧存储溢出到磁盘时为顺序I/O
+            for index in range(start, end):
+                frame = frames[index]
+                if frame is not previous:
+                    indexed = IndexedFrame(mapper.map(frame), mapper.palette)
+                    previous = frame
+                # 重复帧传入同一对象，写入器只延长显示时间
+                writer.write(indexed)
+    finally:
+        writer.release()
+    return writer.frame_count
@@ -0,0 +1,148 @@
+"""
+文件名: core/gif_parallel.py
+功能: 多进程GIF编码。调色板确定后，各帧的调色板映射、差分和LZW压缩
+     互相独立：主进程先按帧时间排好写出顺序并切分为若干块，工作进程
+     通过内存映射的帧存储文件共享读取帧数据，各自完成量化和压缩，
+     主进程再按顺序拼接图像块写入文件。
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .gif_writer import GifWriter, IndexedFrame, MIN_DELAY_CS, encode_delta, encode_image_data, render_rgb32
+from .gif_palette import PALETTE_GLOBAL, PaletteMapper, scene_palettes, encode_gif
+
+# 每个工作进程平均分到的任务块数（块越多负载越均衡，但每块都要额外映射一次前一帧）
+_CHUNKS_PER_WORKER = 4
+
+# 工作进程内的状态（由初始化函数设置）
+_worker = {}
+
+
+def build_schedule(store, scenes, fps):
+    """按帧时间计算写出顺序与每帧延迟，规则与GifWriter一致
+
+    延迟不设上限，超过GIF延迟字段上限的部分在写出时由 GifWriter.write_image() 拆分。
+
+    Args:
+        store (FrameStore): 帧存储
+        scenes (list): scene_palettes() 的结果
+        fps (int): 帧率
+
+    Returns:
+        list: 每个写出帧的 (存储帧编号, 场景编号, 延迟厘秒)
+    """
+    entries = []
+    pending = None
+    ticks = 0
+    written_cs = 0
+    for scene, (start, end, _) in enumerate(scenes):
+        for index, count in store.runs(start, end):
+            if pending is not None:
+                delay = round(ticks * 100 / fps) - written_cs
+                # 显示时间不足最小延迟的帧由下一帧替换
+                if delay >= MIN_DELAY_CS:
+                    entries.append(pending + (delay,))
+                    written_cs += delay
+            pending = (index, scene)
+            ticks += count
+    entries.append(pending + (max(MIN_DELAY_CS, round(ticks * 100 / fps) - written_cs),))
+    return entries
+
+
+def _init_worker(mapping, palettes, dither):
+    """工作进程初始化：只读映射帧存储文件"""
+    path, dtype, shape, capacity = mapping
+    _worker["frames"] = np.memmap(path, dtype=np.dtype(dtype), mode="r", shape=(capacity,) + tuple(shape))
+    _worker["palettes"] = palettes
+    _worker["dither"] = dither
+    _worker["mappers"] = {}
+
+
+def _indexed(index, scene):
+    """在工作进程中映射一帧"""
+    mapper = _worker["mappers"].get(scene)
+    if mapper is None:
+        mapper = PaletteMapper(_worker["palettes"][scene], _worker["dither"])
+        _worker["mappers"][scene] = mapper
+    return IndexedFrame(mapper.map(_worker["frames"][index]), mapper.palette)
+
+
+def _encode_chunk(task):
+    """编码一块连续的写出帧
+
+    Args:
+        task (tuple): (块前一帧的 (编号, 场景) 或None, 本块各帧的 (编号, 场景) 列表)
+
+    Returns:
+        list: 每帧 encode_delta() 格式的结果
+    """
+    previous, items = task
+    canvas = render_rgb32(_indexed(*previous)) if previous is not None else None
+    results = []
+    for index, scene in items:
+        frame = _indexed(index, scene)
+        rgb = render_rgb32(frame)
+        if canvas is None:
+            height, width = frame.indices.shape
+            results.append(((0, 0), (width, height), frame.palette, encode_image_data(frame.indices), None))
+        else:
+            results.append(encode_delta(frame, rgb, canvas))
+        canvas = rgb
+    return results
+
+
+def encode_gif_parallel(store, output_path, fps=30, mode=PALETTE_GLOBAL, dither=False,
+                        max_colors=255, sample_frames=32, workers=4, progress=None):
+    """使用进程池把帧存储中的RGB565帧编码为GIF
+
+    Args:
+        store (FrameStore): 帧存储，编码前会把内存中的帧全部写入溢出文件供工作进程共享
+        output_path (str): 输出文件路径
+        fps (int): 帧率
+        mode (str): global 或 scene
+        dither (bool): 是否使用有序抖动
+        max_colors (int): 每个调色板的最大颜色数
+        sample_frames (int): 每个调色板最多抽样的帧数
+        workers (int): 工作进程数，为1时在当前进程中编码
+        progress (callable, optional): 进度回调，参数为已写入帧数占比；每拼接完一块调用一次
+
+    Returns:
+        int: 写入文件的帧数
+    """
+    if workers <= 1:
+        return encode_gif(store, output_path, fps, mode, dither, max_colors, sample_frames)
+
+    scenes = scene_palettes(store, mode, max_colors, sample_frames)
+    entries = build_schedule(store, scenes, fps)
+    store.spill_all()
+
+    chunk_size = max(1, math.ceil(len(entries) / (workers * _CHUNKS_PER_WORKER)))
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    tasks = [
+        (entries[i * chunk_size - 1][:2] if i else None, [entry[:2] for entry in chunk])
+        for i, chunk in enumerate(chunks)
+    ]
+
+    height, width = store.shape
+    writer = GifWriter(output_path, width, height, fps)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            initializer=_init_worker,
+            initargs=(store.mapping(), [palette for _, _, palette in scenes], dither)
+        ) as executor:
+            # map按提交顺序返回结果，按顺序拼接各图像块
+            done = 0
+            for chunk, results in zip(chunks, executor.map(_encode_chunk, tasks)):
+                for (_, _, delay), (offset, size, palette, data, transparency) in zip(chunk, results):
+                    writer.write_image(delay, offset, size, palette, data, transparency)
+                done += len(chunk)
+                if progress is not None:
+                    # 超长延迟拆分出的占位帧不计入进度
+                    progress(done / len(entries))
+    finally:
+        writer.release()
+    return writer.frame_count
@@ -0,0 +1,350 @@
+"""
+文件名: core/gif_writer.py
+功能: 流式GIF编码器。帧在到达时即完成量化并写入文件，内存中只保留
+     最近的一帧，录制时长不再受内存限制。连续的相同帧合并为一帧并
+     延长显示时间；与上一帧比较后只写出变化区域的最小外接矩形，
+     矩形内未变化的像素标记为透明。LZW压缩借助Pillow的C实现完成。
+"""
+
+import io
+import struct
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# GIF最小可靠帧延迟（厘秒）：浏览器会把更小的延迟当作10厘秒处理
+MIN_DELAY_CS = 2
+
+# GIF单帧延迟上限（厘秒）：图形控制扩展中的延迟字段为16位
+MAX_DELAY_CS = 0xFFFF
+
+
+class IndexedFrame:
+    """已量化的帧：调色板索引图及对应调色板"""
+
+    __slots__ = ("indices", "palette")
+
+    def __init__(self, indices, palette):
+        """初始化量化帧
+
+        Args:
+            indices (numpy.ndarray): 形状为 (height, width) 的uint8调色板索引
+            palette (bytes): RGB调色板数据，长度为3的倍数
+        """
+        self.indices = indices
+        self.palette = palette
+
+
+def quantize_frame(frame, colors=255):
+    """将BGRA帧量化为调色板索引图（每帧独立调色板）
+
+    Args:
+        frame (numpy.ndarray): BGRA帧
+        colors (int): 最大颜色数，默认留出一个索引作为透明色
+
+    Returns:
+        IndexedFrame: 量化结果
+    """
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
+    image = Image.fromarray(rgb).quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    used = len(image.getcolors(colors) or []) or colors
+    palette = bytes(image.getpalette()[:used * 3])
+    return IndexedFrame(np.asarray(image), palette)
+
+
+def encode_image_data(indices):
+    """LZW压缩一幅调色板索引图
+
+    借助Pillow保存单帧GIF，再从中截取图像数据部分（LZW最小码长加数据子块）。
+
+    Args:
+        indices (numpy.ndarray): 形状为 (height, width) 的uint8调色板索引
+
+    Returns:
+        bytes: 图像数据，含结尾的0长度子块
+    """
+    indices = np.ascontiguousarray(indices)
+    image = Image.frombuffer("P", (indices.shape[1], indices.shape[0]), indices, "raw", "P", 0, 1)
+    image.putpalette(bytes(range(256)) * 3)
+    buffer = io.BytesIO()
+    image.save(buffer, format="GIF", optimize=False, interlace=False)
+    return _extract_image_data(buffer.getvalue())
+
+
+def _skip_sub_blocks(data, pos):
+    """跳过一串数据子块，返回结束符之后的位置"""
+    while True:
+        length = data[pos]
+        pos += 1
+        if length == 0:
+            return pos
+        pos += length
+
+
+def _extract_image_data(gif):
+    """从单帧GIF字节串中截取第一幅图像的数据部分"""
+    pos = 13
+    flags = gif[10]
+    if flags & 0x80:
+        pos += 3 << ((flags & 0x07) + 1)
+
+    while pos < len(gif):
+        block = gif[pos]
+        if block == 0x21:  # 扩展块
+            pos = _skip_sub_blocks(gif, pos + 2)
+        elif block == 0x2C:  # 图像描述符
+            flags = gif[pos + 9]
+            pos += 10
+            if flags & 0x80:
+                pos += 3 << ((flags & 0x07) + 1)
+            start = pos
+            end = _skip_sub_blocks(gif, pos + 1)
+            return gif[start:end]
+        else:
+            break
+    raise ValueError("GIF数据中未找到图像块")
+
+
+# 延迟超出上限时使用的1像素透明占位帧的压缩数据
+_PLACEHOLDER_DATA = encode_image_data(np.zeros((1, 1), np.uint8))
+
+
+def _color_table(palette):
+    """把调色板补齐到2的幂大小
+
+    Returns:
+        tuple: (颜色表字节串, 颜色表大小字段值)
+    """
+    count = max(2, len(palette) // 3)
+    size_bits = max(1, (count - 1).bit_length())
+    table = palette + b"\x00" * (3 * (1 << size_bits) - len(palette))
+    return table, size_bits - 1
+
+
+def _palette_rgb32(palette):
+    """把调色板转换为256项的24位RGB整数表，用于按颜色比较不同调色板的帧"""
+    colors = np.frombuffer(palette, np.uint8).reshape(-1, 3).astype(np.uint32)
+    table = np.zeros(256, np.uint32)
+    table[:len(colors)] = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+    return table
+
+
+def changed_bbox(mask):
+    """计算变化像素的最小外接矩形
+
+    Args:
+        mask (numpy.ndarray): 形状为 (height, width) 的布尔数组，True表示变化
+
+    Returns:
+        tuple: (x, y, width, height)，没有变化时返回None
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask[rows[0]:rows[-1] + 1].any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1)
+
+
+def render_rgb32(frame):
+    """把调色板索引图转换为24位颜色图，用于按颜色比较帧"""
+    return np.take(_palette_rgb32(frame.palette), frame.indices)
+
+
+def encode_delta(frame, rgb, canvas):
+    """压缩一帧相对于画布的变化部分
+
+    只保留变化像素的最小外接矩形，矩形内未变化的像素在压缩后更小时设为透明。
+
+    Args:
+        frame (IndexedFrame): 量化后的完整帧
+        rgb (numpy.ndarray): 该帧的24位颜色图
+        canvas (numpy.ndarray): 当前画布的24位颜色图
+
+    Returns:
+        tuple: (位置 (x, y), 尺寸 (width, height), 调色板, 压缩数据, 透明色索引或None)
+    """
+    mask = rgb != canvas
+    bbox = changed_bbox(mask)
+    if bbox is None:
+        # 画面没有变化（如经过了最小延迟合并），写出1像素透明帧占位
+        bbox = (0, 0, 1, 1)
+        mask = np.zeros((1, 1), bool)
+    x, y, width, height = bbox
+    indices = frame.indices[y:y + height, x:x + width]
+    mask = mask[y:y + height, x:x + width]
+
+    transparency = None
+    palette = frame.palette
+    colors = len(palette) // 3
+    data = encode_image_data(indices)
+    if colors < 256 and not mask.all():
+        # 调色板未满时追加一个透明色索引；滚动等整体位移的画面中
+        # 透明像素反而会打断原有的颜色连续段，因此只在压缩后更小时采用
+        masked_data = encode_image_data(np.where(mask, indices, np.uint8(colors)))
+        if len(masked_data) < len(data):
+            transparency = colors
+            palette = palette + b"\x00\x00\x00"
+            data = masked_data
+    return (x, y), (width, height), palette, data, transparency
+
+
+class GifWriter:
+    """流式GIF写入器，接口与其他编码器一致（write/release）
+
+    write() 接收 IndexedFrame；连续传入同一对象或画面内容相同的帧时视为重复帧，
+    只延长显示时间。帧之间按实际颜色比较，因此每帧调色板不同也能正确差分。
+    """
+
+    def __init__(self, output_path, width, height, fps=30, loop=0, diff=True):
+        """初始化写入器并写入文件头
+
+        Args:
+            output_path (str): 输出文件路径
+            width (int): 画面宽度
+            height (int): 画面高度
+            fps (int): 帧率，每次write对应 1/fps 秒
+            loop (int): 循环次数，0表示无限循环
+            diff (bool): 是否只写出与上一帧相比变化的区域
+        """
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.diff = diff
+        self.frame_count = 0  # 实际写入文件的帧数
+        self.written_pixels = 0  # 实际写出的像素数（差分后）
+
+        self._pending = None  # 尚未写出的帧（显示时长需等下一帧到达才能确定）
+        self._pending_rgb = None  # 待写帧的24位颜色图
+        self._canvas = None  # 当前画布的24位颜色图（已写出帧叠加的结果）
+        self._palette = None  # 最近一次转换颜色表所用的调色板及其颜色表
+        self._palette_rgb32 = None
+        self._ticks = 0  # 已接收的帧间隔总数
+        self._written_cs = 0  # 已写出帧的累计延迟（厘秒）
+
+        self._file = open(output_path, "wb")
+        self._file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0x70, 0, 0))
+        # NETSCAPE2.0 循环扩展
+        self._file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def write(self, frame):
+        """写入一帧
+
+        Args:
+            frame (IndexedFrame): 量化后的帧
+        """
+        if frame is self._pending:
+            self._ticks += 1
+            return
+
+        rgb = self._render(frame) if self.diff else None
+        if self._pending is not None:
+            if rgb is not None and np.array_equal(rgb, self._pending_rgb):
+                # 内容与待写帧相同，只延长显示时间
+                self._ticks += 1
+                return
+            delay = self._delay_until(self._ticks)
+            if delay >= MIN_DELAY_CS:
+                self._write_pending(delay)
+            # 否则上一帧显示时间不足最小延迟，直接由新帧替换（帧率上限约50FPS）
+
+        self._pending = frame
+        self._pending_rgb = rgb
+        self._ticks += 1
+
+    def _render(self, frame):
+        """把调色板索引图转换为24位颜色图"""
+        if frame.palette is not self._palette:
+            self._palette = frame.palette
+            self._palette_rgb32 = _palette_rgb32(frame.palette)
+        return np.take(self._palette_rgb32, frame.indices)
+
+    def _delay_until(self, ticks):
+        """按累计时间计算待写帧到指定时刻的延迟（厘秒），避免逐帧取整误差积累"""
+        return round(ticks * 100 / self.fps) - self._written_cs
+
+    def _write_pending(self, delay):
+        """写出待写帧，与画布比较后只写出变化区域"""
+        frame = self._pending
+        if self._canvas is None:
+            self.write_frame(frame, delay)
+        else:
+            self._write_diff(frame, delay)
+        self._canvas = self._pending_rgb
+        self._written_cs += delay
+        self._pending = None
+        self._pending_rgb = None
+
+    def _write_diff(self, frame, delay):
+        """写出变化区域的子图，区域内未变化的像素设为透明"""
+        self.write_image(delay, *encode_delta(frame, self._pending_rgb, self._canvas))
+
+    def write_frame(self, frame, delay_cs, offset=(0, 0), transparency=None, disposal=1):
+        """直接写出一帧到文件
+
+        Args:
+            frame (IndexedFrame): 量化后的帧（可以是子区域）
+            delay_cs (int): 显示时长（厘秒）
+            offset (tuple): 帧在画布上的位置 (x, y)
+            transparency (int, optional): 透明色索引
+            disposal (int): 处置方式：1保留、2恢复背景
+        """
+        height, width = frame.indices.shape
+        self.write_image(delay_cs, offset, (width, height), frame.palette,
+                         encode_image_data(frame.indices), transparency, disposal)
+
+    def write_image(self, delay_cs, offset, size, palette, data, transparency=None, disposal=1):
+        """写出已压缩的图像块
+
+        静止画面合并后的显示时长可能超过GIF的延迟上限（约655秒），
+        超出部分由其后的1像素透明占位帧依次承接，画面不变。
+
+        Args:
+            delay_cs (int): 显示时长（厘秒）
+            offset (tuple): 图像在画布上的位置 (x, y)
+            size (tuple): 图像尺寸 (width, height)
+            palette (bytes): 局部调色板
+            data (bytes): encode_image_data() 的输出
+            transparency (int, optional): 透明色索引
+            disposal (int): 处置方式：1保留、2恢复背景
+        """
+        remaining = delay_cs
+        while True:
+            delay = remaining
+            if delay > MAX_DELAY_CS:
+                # 留给占位帧的时长不少于最小延迟
+                delay = MAX_DELAY_CS if remaining - MAX_DELAY_CS >= MIN_DELAY_CS else MAX_DELAY_CS - MIN_DELAY_CS
+            self._write_block(delay, offset, size, palette, data, transparency, disposal)
+            remaining -= delay
+            if not remaining:
+                break
+            # 占位帧：左上角1像素，唯一的颜色为透明色
+            offset, size, palette, data, transparency, disposal = \
+                (0, 0), (1, 1), b"\x00\x00\x00", _PLACEHOLDER_DATA, 0, 1
+
+    def _write_block(self, delay_cs, offset, size, palette, data, transparency, disposal):
+        """写出图形控制扩展和图像块（延迟不超过上限）"""
+        packed = (disposal << 2) | (1 if transparency is not None else 0)
+        self._file.write(b"!\xf9\x04" + struct.pack("<BHBB", packed, delay_cs, transparency or 0, 0))
+
+        width, height = size
+        table, size_field = _color_table(palette)
+        self._file.write(b"," + struct.pack("<HHHHB", offset[0], offset[1], width, height, 0x80 | size_field))
+        self._file.write(table)
+        self._file.write(data)
+        self.frame_count += 1
+        self.written_pixels += width * height
+
+    def release(self):
+        """写出最后一帧并结束文件"""
+        if self._file is None:
+            return
+        try:
+            if self._pending is not None:
+                # 最后一帧之后没有新帧，剩余时间都属于它
+                self._write_pending(max(MIN_DELAY_CS, self._delay_until(self._ticks)))
+            self._file.write(b";")
+        finally:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,207 @@
+"""
+文件名: core/instant_replay.py
+功能: 即时回放控制器。后台持续捕获屏幕与系统声音并编码到内存中的
+     回放缓冲区，只保留最近N秒；按下保存热键时把缓冲内容直接封装为
+     MP4文件，缓冲继续运行，可以多次保存。
+"""
+
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from .audio_source import SoundcardLoopbackSource
+from .frame_pool import FramePool
+from .frame_source import MssFrameSource
+from .pipeline import EncodePipeline, POLICY_DROP_NEWEST
+from .scheduler import FrameScheduler, POLICY_DUPLICATE
+from .change_detector import ChangeDetector
+from .color_convert import COLOR_BGR, COLOR_I420, ColorConverter, frame_shape, supports_yuv
+from .replay_buffer import ReplayBuffer, ReplayVideoEncoder, ReplayAudioEncoder
+
+
+class InstantReplay:
+    """即时回放：在后台保留最近一段时间的录屏，随时保存"""
+
+    def __init__(self, region=None, output_dir=None, fps=30, duration=60, record_audio=True,
+                 queue_size=8, convert_workers=1, frame_source=None, audio_source=None):
+        """初始化即时回放
+
+        Args:
+            region (tuple): 录制区域 (left, top, width, height)
+            output_dir (str): 保存目录
+            fps (int): 帧率
+            duration (float): 保留的时长（秒）
+            record_audio (bool): 是否同时缓冲系统声音
+            queue_size (int): 捕获与编码之间的队列容量
+            convert_workers (int): 颜色转换工作线程数
+            frame_source (FrameSource, optional): 帧来源，默认抓取屏幕
+            audio_source (AudioSource, optional): 音频来源，默认录制系统声音回路
+        """
+        self.region = region
+        self.output_dir = output_dir or os.path.join(os.path.expanduser("~"), "Videos")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.fps = fps
+        self.record_audio = record_audio
+        self.queue_size = queue_size
+        self.convert_workers = convert_workers
+        self.frame_source = frame_source
+        self.audio_source = audio_source
+        self.buffer = ReplayBuffer(duration)
+
+        self.running = False
+        self._stop_event = threading.Event()
+        self.video_thread = None
+        self.audio_thread = None
+        self.error_messages = {
+            "system_audio": None,
+            "video": None
+        }
+
+    def _record_video(self):
+        """视频缓冲线程函数"""
+        try:
+            left, top, width, height = self.region
+            # 回放缓冲按恒定帧率编码，分片时长固定，淘汰与保存都以分片为单位
+            # 宽高为偶数时直接转换为I420送入编码器
+            color_format = COLOR_I420 if supports_yuv(width, height) else COLOR_BGR
+            converter = ColorConverter(color_format)
+            out = ReplayVideoEncoder(self.buffer, width, height, self.fps, pix_fmt=converter.pix_fmt)
+            pool = FramePool(frame_shape(color_format, width, height),
+                             size=self.queue_size + self.convert_workers + 1)
+
+            def convert(frame):
+                return converter(frame, pool.acquire())
+
+            # 后台缓冲不应拖慢前台程序，编码跟不上时丢帧而不阻塞捕获
+            pipeline = EncodePipeline(
+                out,
+                convert=convert,
+                queue_size=self.queue_size,
+                policy=POLICY_DROP_NEWEST,
+                workers=self.convert_workers,
+                release=pool.release
+            )
+
+            try:
+                source = self.frame_source or MssFrameSource(self.region)
+                with source:
+                    scheduler = FrameScheduler(self.fps, POLICY_DUPLICATE)
+                    scheduler.start()
+                    detector = ChangeDetector()
+
+                    while self.running:
+                        scheduler.wait(self._stop_event)
+                        slots = scheduler.tick()
+                        frame = source.grab()
+                        if not slots:
+                            continue
+                        if not detector.changed(frame):
+                            frame = None
+                        if not pipeline.submit(frame, slots):
+                            scheduler.discard(slots)
+                        # 丢帧策略下完整帧可能被丢弃，之后的画面须重新按完整帧投递
+                        if pipeline.frame_dropped():
+                            detector.reset()
+            finally:
+                try:
+                    pipeline.close()
+                finally:
+                    out.release()
+        except Exception as e:
+            self.error_messages["video"] = f"回放缓冲录制视频时出错: {str(e)}"
+            print(f"[错误] {self.error_messages['video']}")
+        finally:
+            # 编码器创建失败时帧来源还没有进入with，保证共享捕获的订阅者总会退订
+            if self.frame_source is not None:
+                self.frame_source.close()
+
+    def _record_audio(self):
+        """音频缓冲线程函数"""
+        encoder = None
+        try:
+            source = self.audio_source or SoundcardLoopbackSource()
+            with source:
+                encoder = ReplayAudioEncoder(self.buffer, source.sample_rate, source.channels)
+                while self.running:
+                    data = source.read(source.block_size)
+                    if data is None or len(data) == 0:
+                        continue
+                    encoder.write((np.clip(data, -1.0, 1.0) * 32767).astype(np.int16))
+        except Exception as e:
+            self.error_messages["system_audio"] = f"回放缓冲录制系统音频时出错: {str(e)}"
+            print(f"[错误] {self.error_messages['system_audio']}")
+        finally:
+            if encoder is not None:
+                encoder.release()
+
+    def start(self):
+        """开始后台缓冲"""
+        if self.running:
+            print("[警告] 回放缓冲已经在运行")
+            return
+
+        if not self.region:
+            self.error_messages["video"] = "未指定录制区域"
+            print(f"[错误] {self.error_messages['video']}")
+            return
+
+        self.error_messages = {
+            "system_audio": None,
+            "video": None
+        }
+        self.running = True
+        self._stop_event.clear()
+
+        self.video_thread = threading.Thread(target=self._record_video, name="replay-video")
+        self.video_thread.daemon = True
+        self.video_thread.start()
+
+        if self.record_audio:
+            self.audio_thread = threading.Thread(target=self._record_audio, name="replay-audio")
+            self.audio_thread.daemon = True
+            self.audio_thread.start()
+
+        print(f"[调试] 回放缓冲已开始，区域: {self.region}, 保留 {self.buffer.duration} 秒")
+
+    def stop(self):
+        """停止后台缓冲并丢弃缓冲内容"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self.video_thread:
+            self.video_thread.join()
+            self.video_thread = None
+        if self.audio_thread:
+            self.audio_thread.join(timeout=5)
+            self.audio_thread = None
+        print(f"[调试] 回放缓冲已停止: {self.buffer.get_stats()}")
+
+    def save(self):
+        """把当前缓冲的内容保存为MP4文件，缓冲继续运行
+
+        Returns:
+            tuple: (输出文件路径或None, 错误信息)
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join(self.output_dir, f"replay_{timestamp}.mp4")
+        try:
+            self.buffer.save(output_path)
+        except Exception as e:
+            error = f"保存回放失败: {str(e)}"
+            print(f"[错误] {error}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return None, error
+        print(f"[调试] 已保存回放: {output_path} ({os.path.getsize(output_path)} 字节)")
+        return output_path, None
+
+    def is_running(self):
+        """检查回放缓冲是否在运行
+
+        Returns:
+            bool: 是否在运行
+        """
+        return self.running
@@ -0,0 +1,311 @@
+"""
+文件名: core/mp4_timing.py
+功能: 可变帧率（VFR）时间戳支持。录制时为每一帧记录捕获时间戳并写入
+     时间码旁路文件（mkvmerge timecode format v2，毫秒），封装前据此
+     改写MP4中视频轨的stts表，使每帧的显示时长与实际捕获间隔一致，
+     视频流本身不需要重新编码。
+"""
+
+import os
+import struct
+
+# 需要递归解析的容器box
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+
+TIMECODE_HEADER = "# timecode format v2"
+
+
+def write_timecodes(path, pts_seconds, end_seconds=None):
+    """写入时间码旁路文件
+
+    Args:
+        path (str): 旁路文件路径
+        pts_seconds (list): 每帧的显示时间戳（秒）
+        end_seconds (float, optional): 录制结束时刻，决定最后一帧的显示时长
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(TIMECODE_HEADER + "\n")
+        for pts in pts_seconds:
+            f.write(f"{pts * 1000:.3f}\n")
+        if end_seconds is not None:
+            f.write(f"# end {end_seconds * 1000:.3f}\n")
+
+
+class TimecodeJournal:
+    """录制过程中逐步追加的时间码文件，程序中断时已写入的时间戳仍可读取"""
+
+    def __init__(self, path):
+        """创建时间码文件并写入文件头
+
+        Args:
+            path (str): 时间码文件路径
+        """
+        self.path = path
+        self.count = 0  # 已写入的时间戳数
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write(TIMECODE_HEADER + "\n")
+        self._file.flush()
+
+    def update(self, pts_seconds):
+        """追加列表中尚未写入的时间戳
+
+        Args:
+            pts_seconds (list): 截至目前的全部帧时间戳（秒），只会在末尾增长
+        """
+        if len(pts_seconds) <= self.count:
+            return
+        pending = pts_seconds[self.count:]
+        self._file.write("".join(f"{pts * 1000:.3f}\n" for pts in pending))
+        self._file.flush()
+        self.count += len(pending)
+
+    def close(self, end_seconds=None):
+        """写入结束时刻并关闭文件
+
+        Args:
+            end_seconds (float, optional): 录制结束时刻
+        """
+        if self._file is None:
+            return
+        if end_seconds is not None:
+            self._file.write(f"# end {end_seconds * 1000:.3f}\n")
+        self._file.close()
+        self._file = None
+
+
+def read_timecodes(path):
+    """读取时间码旁路文件
+
+    Args:
+        path (str): 旁路文件路径
+
+    Returns:
+        tuple: (每帧时间戳列表（秒）, 结束时刻（秒）或None)
+    """
+    pts_seconds = []
+    end_seconds = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("# end"):
+                end_seconds = float(line.split()[-1]) / 1000
+            elif not line.startswith("#"):
+                pts_seconds.append(float(line) / 1000)
+    return pts_seconds, end_seconds
+
+
+class _Box:
+    """MP4 box：容器box保存子box列表，其余box保存原始负载"""
+
+    def __init__(self, box_type, payload=None, children=None):
+        self.type = box_type
+        self.payload = payload
+        self.children = children
+
+    def find(self, box_type):
+        """查找第一个指定类型的子box"""
+        for child in self.children or []:
+            if child.type == box_type:
+                return child
+        return None
+
+    def serialize(self):
+        if self.children is not None:
+            body = b"".join(child.serialize() for child in self.children)
+        else:
+            body = self.payload
+        return struct.pack(">I", len(body) + 8) + self.type + body
+
+
+def _iter_boxes(data, offset=0, end=None):
+    """遍历字节串中的box
+
+    Yields:
+        tuple: (类型, 负载起始偏移, 负载结束偏移)
+    """
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ValueError(f"MP4 box结构损坏: {box_type!r}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _parse(data, start, end):
+    """递归解析box树"""
+    boxes = []
+    for box_type, body_start, body_end in _iter_boxes(data, start, end):
+        if box_type in _CONTAINER_BOXES:
+            boxes.append(_Box(box_type, children=_parse(data, body_start, body_end)))
+        else:
+            boxes.append(_Box(box_type, payload=data[body_start:body_end]))
+    return boxes
+
+
+def _find_video_track(moov):
+    """查找视频轨"""
+    for trak in moov.children:
+        if trak.type != b"trak":
+            continue
+        hdlr = trak.find(b"mdia").find(b"hdlr")
+        if hdlr is not None and hdlr.payload[8:12] == b"vide":
+            return trak
+    return None
+
+
+def _read_duration_field(payload, version):
+    """读取mvhd/mdhd的时间刻度与时长"""
+    if version == 1:
+        return struct.unpack(">IQ", payload[20:32])
+    return struct.unpack(">II", payload[12:20])
+
+
+def _patch_duration(payload, duration, version, offset_v0, offset_v1):
+    """改写box负载中的时长字段"""
+    payload = bytearray(payload)
+    if version == 1:
+        struct.pack_into(">Q", payload, offset_v1, duration)
+    else:
+        struct.pack_into(">I", payload, offset_v0, min(duration, 0xFFFFFFFF))
+    return bytes(payload)
+
+
+def _build_stts(deltas):
+    """按游程编码构建stts负载"""
+    entries = []
+    for delta in deltas:
+        if entries and entries[-1][1] == delta:
+            entries[-1][0] += 1
+        else:
+            entries.append([1, delta])
+    body = struct.pack(">II", 0, len(entries))
+    return body + b"".join(struct.pack(">II", count, delta) for count, delta in entries)
+
+
+def apply_timecodes(mp4_path, pts_seconds, end_seconds=None, truncate=False):
+    """按每帧时间戳改写MP4视频轨的时间信息（原地修改，视频数据不变）
+
+    要求moov位于文件末尾（ffmpeg默认输出即是如此），改写后的moov
+    直接覆盖原位置，mdat中的样本偏移保持不变。
+
+    Args:
+        mp4_path (str): MP4文件路径
+        pts_seconds (list): 每帧的显示时间戳（秒），数量须与视频样本数一致
+        end_seconds (float, optional): 录制结束时刻，决定最后一帧的显示时长
+        truncate (bool): 时间戳多于视频帧数时是否只使用前面的部分（此时忽略end_seconds）。
+            中断的录制中，已记录时间戳的帧可能还没有写入文件
+
+    Raises:
+        ValueError: 文件结构不支持或帧数不匹配时抛出
+    """
+    # 只读取顶层box头部定位moov，避免把整个mdat读入内存
+    file_size = os.path.getsize(mp4_path)
+    moov_offset = None
+    with open(mp4_path, "rb") as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, box_type = struct.unpack(">I4s", header[:8])
+            header_size = 8
+            if size == 1:
+                size = struct.unpack(">Q", header[8:16])[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                raise ValueError(f"MP4 box结构损坏: {box_type!r}")
+            if box_type == b"moov":
+                moov_offset, moov_header, moov_end = offset, header_size, offset + size
+            offset += size
+
+        if moov_offset is None:
+            raise ValueError("未找到moov box")
+        if moov_end != file_size:
+            raise ValueError("moov不在文件末尾，无法原地改写时间戳")
+
+        f.seek(moov_offset + moov_header)
+        data = f.read(moov_end - moov_offset - moov_header)
+
+    moov = _Box(b"moov", children=_parse(data, 0, len(data)))
+
+    trak = _find_video_track(moov)
+    if trak is None:
+        raise ValueError("未找到视频轨")
+    mdia = trak.find(b"mdia")
+    mdhd = mdia.find(b"mdhd")
+    stbl = mdia.find(b"minf").find(b"stbl")
+    stts = stbl.find(b"stts")
+    if stbl.find(b"ctts") is not None:
+        raise ValueError("视频包含B帧（ctts），不支持改写时间戳")
+
+    # 原样本数
+    entry_count = struct.unpack(">I", stts.payload[4:8])[0]
+    sample_count = sum(
+        struct.unpack(">I", stts.payload[8 + i * 8:12 + i * 8])[0] for i in range(entry_count)
+    )
+    if truncate and len(pts_seconds) > sample_count:
+        pts_seconds = pts_seconds[:sample_count]
+        end_seconds = None
+    if sample_count != len(pts_seconds):
+        raise ValueError(f"时间戳数量({len(pts_seconds)})与视频帧数({sample_count})不一致")
+    if sample_count == 0:
+        return
+
+    # 以媒体时间刻度计算每帧时长，累计取整避免误差积累；首帧从0开始
+    media_version = mdhd.payload[0]
+    media_timescale, _ = _read_duration_field(mdhd.payload, media_version)
+    base = pts_seconds[0]
+    ticks = [round((pts - base) * media_timescale) for pts in pts_seconds]
+    if end_seconds is not None and end_seconds > pts_seconds[-1]:
+        ticks.append(round((end_seconds - base) * media_timescale))
+    else:
+        average = ticks[-1] / (sample_count - 1) if sample_count > 1 else media_timescale / 30
+        ticks.append(ticks[-1] + max(1, round(average)))
+    deltas = [max(1, ticks[i + 1] - ticks[i]) for i in range(sample_count)]
+    media_duration = sum(deltas)
+
+    stts.payload = _build_stts(deltas)
+    mdhd.payload = _patch_duration(mdhd.payload, media_duration, media_version, 16, 24)
+
+    # 同步更新影片级时长（tkhd、mvhd、编辑列表）
+    mvhd = moov.find(b"mvhd")
+    movie_version = mvhd.payload[0]
+    movie_timescale, _ = _read_duration_field(mvhd.payload, movie_version)
+    movie_duration = round(media_duration * movie_timescale / media_timescale)
+    mvhd.payload = _patch_duration(mvhd.payload, movie_duration, movie_version, 16, 24)
+
+    tkhd = trak.find(b"tkhd")
+    tkhd.payload = _patch_duration(tkhd.payload, movie_duration, tkhd.payload[0], 20, 28)
+
+    edts = trak.find(b"edts")
+    elst = edts.find(b"elst") if edts is not None else None
+    if elst is not None and struct.unpack(">I", elst.payload[4:8])[0] == 1:
+        elst.payload = _patch_duration(elst.payload, movie_duration, elst.payload[0], 8, 8)
+
+    new_moov = moov.serialize()
+    with open(mp4_path, "r+b") as f:
+        f.seek(moov_offset)
+        f.write(new_moov)
+        f.truncate()
+
+
+def timecodes_path_for(video_path):
+    """获取视频对应的时间码旁路文件路径
+
+    Args:
+        video_path (str): 视频文件路径
+
+    Returns:
+        str: 旁路文件路径
+    """
+    return os.path.splitext(video_path)[0] + ".timecodes.txt"
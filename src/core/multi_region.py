@@ -0,0 +1,118 @@
+"""
+文件名: core/multi_region.py
+功能: 多区域同时录制。同时录制多个窗口时，若各自运行一个Recorder，
+     每个节拍都要分别抓屏一次。这里由一个捕获线程每个节拍只抓取一次
+     所有区域的外接矩形，再为每个区域切出零拷贝视图，分别送入各自的
+     录制器和编码器，抓屏开销与录制单个区域相同。各区域相距很远时外接
+     矩形会包含大量无用像素，此时分别录制可能更省。系统音频只录制一份，
+     封装进其中一个区域的视频。
+"""
+
+from .capture_hub import CaptureHub
+from .frame_source import MssFrameSource
+from .recorder import Recorder
+
+
+def union_region(regions):
+    """计算多个区域的外接矩形
+
+    Args:
+        regions (list): 区域列表，每项为 (left, top, width, height)
+
+    Returns:
+        tuple: 外接矩形 (left, top, width, height)
+    """
+    if not regions:
+        raise ValueError("至少需要一个录制区域")
+    left = min(int(r[0]) for r in regions)
+    top = min(int(r[1]) for r in regions)
+    right = max(int(r[0]) + int(r[2]) for r in regions)
+    bottom = max(int(r[1]) + int(r[3]) for r in regions)
+    return left, top, right - left, bottom - top
+
+
+class MultiRegionRecorder:
+    """多区域录制会话：共享一次抓屏，每个区域输出独立的文件"""
+
+    def __init__(self, regions, output_dir=None, fps=30, frame_source=None, audio_source=None,
+                 audio_region=0, **recorder_args):
+        """初始化多区域录制
+
+        Args:
+            regions (list): 区域列表，每项为 (left, top, width, height)
+            output_dir (str): 输出目录路径
+            fps (int): 帧率
+            frame_source (FrameSource, optional): 外接矩形的帧来源，默认捕获屏幕
+            audio_source (AudioSource, optional): 音频来源，默认录制系统声音回路；只交给录制音频的区域
+            audio_region (int, optional): 录制系统音频的区域序号，为None时所有区域都不录制音频
+            **recorder_args: 传给每个区域 Recorder 的其他参数（输出格式、编码方式等）
+
+        Raises:
+            ValueError: 区域为空或 audio_region 超出范围
+        """
+        self.regions = [tuple(int(v) for v in region) for region in regions]
+        self.region = union_region(self.regions)
+        if audio_region is not None and not 0 <= audio_region < len(self.regions):
+            raise ValueError(f"录制音频的区域序号超出范围: {audio_region}")
+        self.fps = fps
+        # 每个区域订阅外接矩形中的一块：零拷贝切片，队列只保留最新的帧，慢的区域不会阻塞抓取
+        self.hub = CaptureHub(frame_source or MssFrameSource(self.region), fps)
+        # 音频来源只能由一个录制器读取（多个读取者会各分到一部分采样），
+        # 系统声音回路也只需打开一次，因此只有一个区域录制音频
+        self.recorders = [
+            Recorder(region=region, output_dir=output_dir, fps=fps,
+                     frame_source=self.hub.subscribe(f"region{i + 1}", region=region),
+                     audio_source=audio_source if i == audio_region else None,
+                     record_audio=i == audio_region, **recorder_args)
+            for i, region in enumerate(self.regions)
+        ]
+        self.running = False
+
+    def start(self):
+        """开始录制所有区域"""
+        if self.running:
+            print("[警告] 多区域录制已经在进行中")
+            return
+        self.hub.start()
+        for recorder in self.recorders:
+            recorder.start()
+        self.running = True
+        print(f"[调试] 多区域录制已开始，{len(self.regions)} 个区域，抓取范围: {self.region}")
+
+    def stop_capture(self):
+        """停止所有区域的捕获，不做后期处理
+
+        Returns:
+            bool: 是否停止了正在进行的录制
+        """
+        if not self.running:
+            print("[警告] 多区域录制未在进行中")
+            return False
+        # 先停止各录制器：它们正在等待的下一帧仍会由捕获线程送达
+        for recorder in self.recorders:
+            recorder.stop_capture()
+        self.hub.stop()
+        self.running = False
+        print(f"[调试] 共享捕获统计: {self.hub.get_stats()}")
+        return True
+
+    def finalize(self, progress=None):
+        """依次处理各区域的录制文件
+
+        Args:
+            progress (callable, optional): 进度回调，参数为 (阶段描述, 完成比例或None)
+
+        Returns:
+            list: 每个区域的 (输出文件路径, 错误信息字典)
+        """
+        return [recorder.finalize(progress) for recorder in self.recorders]
+
+    def stop(self):
+        """停止录制并处理所有区域的文件
+
+        Returns:
+            list: 每个区域的 (输出文件路径, 错误信息字典)
+        """
+        if not self.stop_capture():
+            return []
+        return self.finalize()
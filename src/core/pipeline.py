@@ -0,0 +1,347 @@
+"""
+文件名: core/pipeline.py
+功能: 捕获与编码解耦的帧处理流水线。捕获线程只负责抓屏并投递帧，
+     转换工作线程负责颜色转换，独立的写入线程按顺序送入编码器，
+     中间通过有界帧队列连接，并支持可配置的背压策略。
+"""
+
+import time
+import threading
+from collections import deque
+
+# 背压策略
+POLICY_BLOCK = "block"              # 队列满时阻塞捕获线程
+POLICY_DROP_OLDEST = "drop_oldest"  # 队列满时丢弃最旧的帧
+POLICY_DROP_NEWEST = "drop_newest"  # 队列满时丢弃新到的帧
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST)
+
+
+class FrameQueue:
+    """有界帧队列（环形缓冲），支持阻塞/丢弃最旧/丢弃最新三种背压策略"""
+
+    def __init__(self, maxsize=8, policy=POLICY_BLOCK, on_drop=None):
+        """初始化帧队列
+
+        Args:
+            maxsize (int): 队列最大容量（帧数）
+            policy (str): 背压策略：block、drop_oldest 或 drop_newest
+            on_drop (callable, optional): 帧被丢弃（含队列关闭后投递的帧）时的回调，参数为该帧，
+                在投递线程中执行
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不支持的背压策略: {policy}")
+
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # 统计计数
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0
+
+    def put(self, item):
+        """投递一帧
+
+        Args:
+            item: 帧数据
+
+        Returns:
+            bool: 帧是否进入队列（被丢弃或队列已关闭时返回False）
+        """
+        dropped = []
+        with self._cond:
+            accepted = not self._closed
+            if accepted and len(self._items) >= self.maxsize:
+                if self.policy == POLICY_DROP_NEWEST:
+                    self.dropped_newest += 1
+                    accepted = False
+                elif self.policy == POLICY_DROP_OLDEST:
+                    dropped.append(self._items.popleft())
+                    self.dropped_oldest += 1
+                else:
+                    start = time.perf_counter()
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    self.blocked_time += time.perf_counter() - start
+                    accepted = not self._closed
+
+            if accepted:
+                self._items.append(item)
+                self.put_count += 1
+                self.max_depth = max(self.max_depth, len(self._items))
+                self._cond.notify_all()
+            else:
+                dropped.append(item)
+
+        # 回调在锁外执行，避免回调中再次访问队列时死锁
+        if self.on_drop is not None:
+            for frame in dropped:
+                self.on_drop(frame)
+        return accepted
+
+    def get(self, timeout=None):
+        """取出一帧
+
+        Args:
+            timeout (float, optional): 等待超时时间（秒）
+
+        Returns:
+            帧数据；队列已关闭且为空或等待超时时返回None
+        """
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            item = self._items.popleft()
+            self.get_count += 1
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """关闭队列：不再接收新帧，已入队的帧仍可取出"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self):
+        """获取当前队列深度
+
+        Returns:
+            int: 队列中的帧数
+        """
+        with self._cond:
+            return len(self._items)
+
+    def get_stats(self):
+        """获取队列统计信息
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "capacity": self.maxsize,
+                "policy": self.policy,
+                "enqueued": self.put_count,
+                "dequeued": self.get_count,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "blocked_time": self.blocked_time
+            }
+
+
+class EncodePipeline:
+    """捕获/编码流水线：有界队列 + 转换工作线程 + 有序写入线程"""
+
+    def __init__(self, writer, convert=None, queue_size=8, policy=POLICY_BLOCK, workers=1, release=None,
+                 journal=None):
+        """初始化并启动流水线
+
+        Args:
+            writer: 编码器，需提供 write(frame) 方法
+            convert (callable, optional): 帧转换函数，在工作线程中执行
+            queue_size (int): 输入帧队列容量
+            policy (str): 背压策略
+            workers (int): 转换工作线程数
+            release (callable, optional): 转换后的帧不再使用时的回调，用于归还缓冲
+            journal (TimecodeJournal, optional): 时间码日志，每帧写入编码器前追加其时间戳
+        """
+        self.writer = writer
+        self.convert = convert
+        self.release = release
+        self.journal = journal
+        self.queue = FrameQueue(queue_size, policy, on_drop=self._on_drop)
+        self.error = None
+        self.written_count = 0
+        self.written_pts = []  # 实际写入编码器的每一帧的时间戳（投递时提供pts才记录）
+        self.convert_time = 0.0  # 转换累计耗时（秒）
+        self.converted_count = 0
+        self.write_time = 0.0  # 写入编码器累计耗时（秒）
+        self._last_frame = None  # 最近写入的帧，供重复帧复用，替换时才归还缓冲
+        self._frame_dropped = False  # 是否有完整帧被队列丢弃（之后的重复标记不再对应它）
+
+        # 转换完成、等待按序写入的帧 {序号: 帧}
+        self._pending = {}
+        self._pending_cond = threading.Condition()
+        # 限制已转换未写入的帧数（按序号距离计算，保证最早的帧总能放入），
+        # 写入变慢时背压传导到输入队列
+        self._reorder_capacity = max(1, int(queue_size), int(workers))
+        self._next_ticket = 0
+        self._next_write = 0
+        self._ticket_lock = threading.Lock()
+        self._workers_done = 0
+
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            thread = threading.Thread(target=self._convert_loop, name=f"convert-{i}")
+            thread.daemon = True
+            self._workers.append(thread)
+        self._writer_thread = threading.Thread(target=self._write_loop, name="frame-writer")
+        self._writer_thread.daemon = True
+
+        for thread in self._workers:
+            thread.start()
+        self._writer_thread.start()
+
+    def submit(self, frame, repeat=1, pts=None):
+        """由捕获线程调用，投递一帧
+
+        Args:
+            frame: 原始帧数据；为None时表示重复上一帧（画面未变化，跳过转换）
+            repeat (int): 该帧写入编码器的次数（由帧调度器决定）
+            pts (float, optional): 帧的捕获时间戳（秒）
+
+        Returns:
+            bool: 帧是否进入队列
+
+        Raises:
+            RuntimeError: 转换或写入线程已出错时抛出
+        """
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.queue.put((frame, repeat, pts))
+
+    def _on_drop(self, item):
+        """队列丢弃一项时的回调（丢弃新到的帧或挤出最旧的帧），在投递线程中执行"""
+        if item[0] is not None:
+            self._frame_dropped = True
+
+    def frame_dropped(self):
+        """查询并清除完整帧丢失标记
+
+        画面去重时，重复标记指向最近投递的完整帧；该帧被丢弃（新到的被拒绝，
+        或已入队的被挤出）后，调用方应让下一帧按完整帧投递。
+
+        Returns:
+            bool: 上次查询以来是否有完整帧被队列丢弃
+        """
+        dropped = self._frame_dropped
+        self._frame_dropped = False
+        return dropped
+
+    def _convert_loop(self):
+        """转换工作线程函数"""
+        try:
+            while self.error is None:
+                # 出队和领取序号必须是原子的，保证写入顺序与捕获顺序一致
+                with self._ticket_lock:
+                    item = self.queue.get()
+                    if item is None:
+                        break
+                    ticket = self._next_ticket
+                    self._next_ticket += 1
+
+                frame, repeat, pts = item
+                if frame is not None and self.convert is not None:
+                    start = time.perf_counter()
+                    frame = self.convert(frame)
+                    self.convert_time += time.perf_counter() - start
+                    self.converted_count += 1
+
+                with self._pending_cond:
+                    while ticket - self._next_write >= self._reorder_capacity and self.error is None:
+                        self._pending_cond.wait()
+                    self._pending[ticket] = (frame, repeat, pts)
+                    self._pending_cond.notify_all()
+        except Exception as e:
+            self._fail(f"帧转换出错: {str(e)}")
+        finally:
+            with self._pending_cond:
+                self._workers_done += 1
+                self._pending_cond.notify_all()
+
+    def _write_loop(self):
+        """写入线程函数，按捕获顺序写入编码器"""
+        try:
+            while True:
+                with self._pending_cond:
+                    while self._next_write not in self._pending:
+                        if self.error or self._workers_done == len(self._workers):
+                            break
+                        self._pending_cond.wait()
+                    item = self._pending.pop(self._next_write, None)
+                    if item is None:
+                        break
+                    self._next_write += 1
+                    self._pending_cond.notify_all()
+
+                frame, repeat, pts = item
+                if frame is None:
+                    frame = self._last_frame
+                    if frame is None:
+                        continue
+                elif frame is not self._last_frame:
+                    self._release_last()
+                    self._last_frame = frame
+
+                # 先记录时间戳再写入：程序在两者之间中断时，时间码日志只会多于编码器收到的帧
+                if pts is not None:
+                    self.written_pts.extend([pts] * repeat)
+                    if self.journal is not None:
+                        self.journal.update(self.written_pts)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    self.writer.write(frame)
+                self.write_time += time.perf_counter() - start
+                self.written_count += repeat
+        except Exception as e:
+            self._fail(f"写入编码器出错: {str(e)}")
+        finally:
+            self._release_last()
+
+    def _release_last(self):
+        """归还最近写入帧的缓冲"""
+        if self._last_frame is not None and self.release is not None:
+            self.release(self._last_frame)
+        self._last_frame = None
+
+    def _fail(self, message):
+        """记录错误并停止流水线"""
+        if self.error is None:
+            self.error = message
+        self.queue.close()
+        with self._pending_cond:
+            self._pending_cond.notify_all()
+
+    def close(self):
+        """停止接收新帧，等待队列中的帧全部写入
+
+        Raises:
+            RuntimeError: 流水线运行期间出错时抛出
+        """
+        self.queue.close()
+        for thread in self._workers:
+            thread.join()
+        self._writer_thread.join()
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def get_stats(self):
+        """获取流水线统计信息
+
+        Returns:
+            dict: 队列统计与写入帧数
+        """
+        stats = self.queue.get_stats()
+        stats["written"] = self.written_count
+        stats["converted"] = self.converted_count
+        stats["convert_time"] = self.convert_time
+        stats["write_time"] = self.write_time
+        with self._pending_cond:
+            stats["pending"] = len(self._pending)
+        return stats
@@ -2,49 +2,144 @@
 文件名: core/recorder.py
 功能: 实现屏幕录制的核心功能，包括视频捕获和处理，
      以及音视频合并处理。支持指定区域录制，
-     最终将内容合并为MP4文件或GIF动画输出。
+     最终将内容合并为MP4文件，或输出GIF、WebP、APNG动画。
 """
 
 import os
+import glob
 import time
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 import cv2
-import numpy as np
-import mss
 from moviepy.editor import VideoFileClip, AudioFileClip, ImageSequenceClip
-import imageio
 
 from .audio_manager import AudioManager
+from .ffmpeg_writer import FFmpegWriter, ANIMATION_FORMATS, mux_audio_video, probe_video_codec
+from .pipeline import EncodePipeline, POLICY_BLOCK
+from .frame_pool import FramePool
+from .frame_source import MssFrameSource
+from .scheduler import FrameScheduler, POLICY_DUPLICATE, POLICY_DROP
+from .timelapse import FrameAverager
+from .stripes import StripePool, default_stripe_workers
+from .scaler import DEFAULT_INTERPOLATION, FrameScaler, scaled_size
+from .color_convert import (COLOR_BGR, COLOR_I420, MATRIX_BT601, ColorConverter, frame_shape,
+                            supports_yuv, color_tag_args)
+from .change_detector import ChangeDetector
+from .gif_writer import GifWriter, quantize_frame
+from .gif_palette import PALETTE_LOCAL, to_rgb565
+from .gif_parallel import encode_gif_parallel
+from .frame_store import FrameStore, DEFAULT_RAM_BUDGET
+from .segments import (DEFAULT_SEGMENT_SECONDS, TIMECODES_NAME, segment_dir_for, segment_muxer_args,
+                       concat_segments, remove_segments)
+from .mp4_timing import TimecodeJournal, write_timecodes, read_timecodes, apply_timecodes, timecodes_path_for
 
 class Recorder:
     """屏幕录制器核心类"""
     
-    def __init__(self, region=None, output_dir=None, fps=30, output_format="mp4"):
+    # 尚未完成后期处理的录制所用的时间戳（上一段仍在后台处理时可以开始新的录制）
+    _reserved_timestamps = set()
+    _timestamp_lock = threading.Lock()
+    
+    def __init__(self, region=None, output_dir=None, fps=30, output_format="mp4", encoder="ffmpeg",
+                 queue_size=8, backpressure=POLICY_BLOCK, convert_workers=1, frame_source=None,
+                 audio_source=None, frame_timing="vfr", dedup=True, gif_palette=PALETTE_LOCAL,
+                 gif_dither=False, gif_ram_budget=DEFAULT_RAM_BUDGET, gif_workers=None,
+                 timelapse_interval=None, timelapse_average=1, segment_seconds=DEFAULT_SEGMENT_SECONDS,
+                 color_format=COLOR_I420, color_matrix=MATRIX_BT601, stripe_workers=None,
+                 output_scale=None, output_max_dimension=None, scale_interpolation=DEFAULT_INTERPOLATION,
+                 record_audio=True):
         """初始化录制器
         
         Args:
             region (tuple): 录制区域 (left, top, width, height)
             output_dir (str): 输出目录路径
-            fps (int): 帧率
-            output_format (str): 输出格式：mp4 或 gif
+            fps (int): 输出帧率（非延时摄影模式下同时也是捕获帧率）
+            output_format (str): 输出格式：mp4、gif、webp、webp_lossless 或 apng
+            encoder (str): MP4编码方式：ffmpeg（流式单次编码）或 opencv（mp4v后二次编码）
+            queue_size (int): 捕获与编码之间的帧队列容量
+            backpressure (str): 队列满时的策略：block、drop_oldest 或 drop_newest
+            convert_workers (int): 颜色转换工作线程数
+            frame_source (FrameSource, optional): 帧来源，默认捕获屏幕区域
+            audio_source (AudioSource, optional): 音频来源，默认录制系统声音回路
+            frame_timing (str): MP4帧时间：vfr（按每帧捕获时间戳）或 cfr（恒定帧率，延迟时重复帧）
+            dedup (bool): 是否跳过未变化画面的转换与编码
+            gif_palette (str): GIF调色板模式：local（每帧独立量化，流式写入）、
+                global（全局调色板）或 scene（按场景切换调色板）
+            gif_dither (bool): 全局调色板模式下是否使用有序抖动
+            gif_ram_budget (int): 全局调色板模式下内存中保存帧的字节数上限，超出部分溢出到磁盘
+            gif_workers (int, optional): 全局调色板模式下结束编码的进程数，默认为CPU核心数
+            timelapse_interval (float, optional): 延时摄影的捕获间隔（秒），指定时每个间隔输出一帧，
+                按 fps 播放；延时摄影不录制音频
+            timelapse_average (int): 延时摄影每个输出帧在间隔内均匀抓取并平均的帧数，1表示不平均
+            segment_seconds (float, optional): ffmpeg编码MP4时的分段时长（秒），视频按段写入磁盘，
+                中断后可恢复已完成的分段；为None或0时写入单个临时文件
+            color_format (str): ffmpeg编码MP4时送入编码器的帧格式：i420、nv12（由BGRA直接转换为YUV）
+                或 bgr（由编码器内部转换）；opencv编码或宽高为奇数时固定使用bgr
+            color_matrix (str): YUV转换矩阵：bt601 或 bt709
+            stripe_workers (int, optional): 每帧按水平条带并行转换的线程数，默认按区域大小自动选择
+                （1080p以下为1，更大的区域使用全部核心，最多8个）
+            output_scale (float, optional): 输出分辨率缩放系数，取值 (0, 1]
+            output_max_dimension (int, optional): 输出最长边的上限（像素），超出时等比缩小
+            scale_interpolation (str): 缩放插值方式：area、linear、cubic、lanczos 或 nearest
+            record_audio (bool): MP4录制是否同时录制系统音频（GIF等动画格式和延时摄影总是不录制）
         """
+        if region is None and frame_source is not None:
+            region = frame_source.region
         self.region = region  # 录制区域 (left, top, width, height)
         self.output_dir = output_dir or os.getcwd()  # 输出目录
         self.fps = fps  # 帧率
         self.running = False  # 录制状态
         self.output_format = output_format.lower()  # 输出格式：mp4 或 gif
+        self.encoder = encoder.lower()  # MP4编码方式：ffmpeg 或 opencv
+        
+        # 捕获/编码流水线参数
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.convert_workers = convert_workers
+        self.pipeline_stats = None  # 最近一次录制的队列统计
+        self.timing_stats = None  # 最近一次录制的帧调度统计
+        self.frame_timing = frame_timing.lower()  # 帧时间模式：vfr 或 cfr
+        self.dedup = dedup  # 静止画面去重
+        self.dedup_stats = None  # 最近一次录制的去重统计
+        self.gif_palette = gif_palette.lower()  # GIF调色板模式
+        self.gif_dither = gif_dither  # GIF有序抖动
+        self.gif_ram_budget = gif_ram_budget  # GIF帧存储内存预算
+        self.gif_workers = gif_workers or os.cpu_count() or 1  # GIF编码进程数
+        self.timelapse_interval = timelapse_interval  # 延时摄影捕获间隔（秒）
+        self.timelapse_average = max(1, int(timelapse_average))  # 延时摄影平均帧数
+        # 只有实时MP4录制需要音频
+        self.record_audio = record_audio and self.output_format == "mp4" and not timelapse_interval
+        self._stop_event = threading.Event()  # 停止事件，用于中断帧间等待
+        self._progress = None  # 后期处理进度回调
+        
+        # 帧来源（为空时在录制开始时按区域创建屏幕捕获来源）
+        self.frame_source = frame_source
         
         # 输出文件路径
-        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.timestamp = self._reserve_timestamp()
         self.video_path = os.path.join(self.output_dir, f"video_{self.timestamp}.mp4")
         self.system_audio_path = os.path.join(self.output_dir, f"system_audio_{self.timestamp}.wav")
+        self.timecodes_path = timecodes_path_for(self.video_path)
+        # 分段录制（仅ffmpeg编码的MP4）：各分段与日志保存在临时视频对应的分段目录中
+        self.segment_seconds = segment_seconds
+        self.segmented = bool(segment_seconds) and self.output_format == "mp4" and self.encoder == "ffmpeg"
+        self.segment_dir = segment_dir_for(self.video_path)
+        self.color_format = color_format.lower()  # 送入MP4编码器的帧格式
+        self.color_matrix = color_matrix.lower()  # YUV转换矩阵
+        self.stripe_workers = stripe_workers  # 条带并行线程数
+        self.output_scale = output_scale  # 输出分辨率缩放系数
+        self.output_max_dimension = output_max_dimension  # 输出最长边上限
+        self.scale_interpolation = scale_interpolation.lower()  # 缩放插值方式
         
         # 根据输出格式设置最终输出文件路径
         if self.output_format == "gif":
             self.output_path = os.path.join(self.output_dir, f"recording_{self.timestamp}.gif")
-            # GIF录制时，捕获的帧存储在这里
-            self.frames = []
+            # 全局调色板模式需要在结束时统一量化，录制期间以RGB565保存帧（FrameStore）
+            self.frames = None
+        elif self.output_format in ANIMATION_FORMATS:
+            # WebP/APNG动画由ffmpeg直接写入最终文件
+            extension = ANIMATION_FORMATS[self.output_format][0]
+            self.output_path = os.path.join(self.output_dir, f"recording_{self.timestamp}{extension}")
         else:  # 默认为MP4
             self.output_path = os.path.join(self.output_dir, f"recording_{self.timestamp}.mp4")
         
@@ -52,7 +147,7 @@ class Recorder:
         self.video_thread = None
         
         # 音频管理器
-        self.audio_manager = AudioManager(self.system_audio_path) 
+        self.audio_manager = AudioManager(self.system_audio_path, source=audio_source)
         
         # 录制状态错误信息
         self.error_messages = {
@@ -60,6 +155,22 @@ class Recorder:
             "video": None
         }
     
+    def _reserve_timestamp(self):
+        """生成本次录制的时间戳，与仍在处理的录制或已有文件冲突时顺延一秒
+        
+        Returns:
+            str: 时间戳
+        """
+        now = datetime.now()
+        with Recorder._timestamp_lock:
+            while True:
+                timestamp = now.strftime("%Y%m%d_%H%M%S")
+                pattern = os.path.join(glob.escape(self.output_dir), f"*_{timestamp}*")
+                if timestamp not in Recorder._reserved_timestamps and not glob.glob(pattern):
+                    Recorder._reserved_timestamps.add(timestamp)
+                    return timestamp
+                now += timedelta(seconds=1)
+    
     def test_system_audio(self):
         """测试系统音频录制功能是否可用
         
@@ -68,109 +179,488 @@ class Recorder:
         """
         return self.audio_manager.test_system_audio()
     
+    def _create_frame_source(self):
+        """获取本次录制使用的帧来源
+        
+        Returns:
+            FrameSource: 帧来源实例
+        """
+        if self.frame_source is not None:
+            return self.frame_source
+        return MssFrameSource(self.region)
+    
+    def _create_scheduler(self, vfr=False):
+        """创建捕获帧调度器
+        
+        延时摄影模式下按捕获间隔（含平均所需的子采样）调度，每个间隔输出一帧，
+        落后时跳过错过的间隔而不重复帧；其余情况按输出帧率调度。
+        
+        Args:
+            vfr (bool): 是否为可变帧率输出
+        
+        Returns:
+            FrameScheduler: 帧调度器
+        """
+        if self.timelapse_interval:
+            return FrameScheduler(self.timelapse_average / self.timelapse_interval, POLICY_DROP)
+        return FrameScheduler(self.fps, POLICY_DROP if vfr else POLICY_DUPLICATE)
+    
+    def _create_averager(self):
+        """创建延时摄影帧平均器，不需要平均时返回None"""
+        if self.timelapse_interval and self.timelapse_average > 1:
+            return FrameAverager(self.timelapse_average)
+        return None
+
+    def _output_size(self):
+        """获取输出尺寸（按缩放设置计算）
+
+        Returns:
+            tuple: (width, height)
+        """
+        width, height = self.region[2:]
+        return scaled_size(width, height, self.output_scale, self.output_max_dimension)
+
+    def _create_scaler(self, stripes=None):
+        """创建输出分辨率缩放器，不需要缩放时返回None"""
+        size = self._output_size()
+        if size == tuple(self.region[2:]):
+            return None
+        print(f"[调试] 输出分辨率: {self.region[2]}x{self.region[3]} -> {size[0]}x{size[1]} "
+              f"({self.scale_interpolation})")
+        return FrameScaler(self.region[2:], size, self.scale_interpolation, stripes)
+
     def _record_video(self):
         """视频录制线程函数"""
         try:
             left, top, width, height = self.region
             
+            # GIF全局调色板模式：录制期间只保存帧，结束时统一量化
+            if self.output_format == "gif" and self.gif_palette != PALETTE_LOCAL:
+                self._capture_gif_frames()
+            
             # GIF录制模式
-            if self.output_format == "gif":
-                # 初始化屏幕捕获
-                with mss.mss() as sct:
-                    monitor = {"left": left, "top": top, "width": width, "height": height}
-                    
-                    # 记录帧
-                    frame_count = 0
-                    start_time = time.time()
-                    
-                    while self.running:
-                        # 捕获屏幕
-                        screenshot = sct.grab(monitor)
-                        frame = np.array(screenshot)
-                        
-                        # 转换为RGB格式（GIF使用）
-                        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
-                        
-                        # 存储帧用于后续生成GIF
-                        self.frames.append(frame)
+            elif self.output_format == "gif":
+                # 帧在工作线程中量化，写入线程直接追加到最终文件，
+                # 内存中只保留队列中的少量帧，录制时长不受内存限制
+                out = GifWriter(self.output_path, *self._output_size(), self.fps)
+                scaler = self._create_scaler()
+                convert = quantize_frame
+                if scaler is not None:
+                    # 先缩小再量化，量化只处理输出尺寸的像素
+                    def convert(frame):
+                        return quantize_frame(scaler(frame))
+                pipeline = EncodePipeline(
+                    out,
+                    convert=convert,
+                    queue_size=self.queue_size,
+                    policy=self.backpressure,
+                    workers=self.convert_workers
+                )
+                
+                try:
+                    # 初始化帧来源
+                    with self._create_frame_source() as source:
+                        # 单调时钟帧调度，保证输出时长与实际时间一致
+                        scheduler = self._create_scheduler()
+                        scheduler.start()
+                        detector = ChangeDetector() if self.dedup else None
+                        averager = self._create_averager()
                         
-                        frame_count += 1
+                        while self.running:
+                            scheduler.wait(self._stop_event)
+                            slots = scheduler.tick()
+                            
+                            # 捕获屏幕
+                            frame = source.grab()
+                            if not slots:
+                                continue
+                            
+                            # 延时摄影平均：累计满一组后才输出
+                            if averager is not None:
+                                frame = averager.add(frame)
+                                if frame is None:
+                                    continue
+                            
+                            # 画面未变化时投递重复标记，写入器只延长上一帧的显示时间
+                            if detector is not None and not detector.changed(frame):
+                                frame = None
+                            
+                            if not pipeline.submit(frame, slots):
+                                scheduler.discard(slots)
+                            # 被丢弃的完整帧没有写入，不能再作为去重的参照
+                            if detector is not None and pipeline.frame_dropped():
+                                detector.reset()
                         
-                        # 维持帧率
-                        elapsed_time = time.time() - start_time
-                        sleep_time = (frame_count / self.fps) - elapsed_time
-                        if sleep_time > 0:
-                            time.sleep(sleep_time)
+                        self.timing_stats = scheduler.get_stats()
+                        print(f"[调试] 帧调度统计: {self.timing_stats}")
+                finally:
+                    try:
+                        pipeline.close()
+                    finally:
+                        self.pipeline_stats = pipeline.get_stats()
+                        print(f"[调试] 帧队列统计: {self.pipeline_stats}")
+                        out.release()
                 
-                print(f"[调试] GIF录制结束，捕获了 {len(self.frames)} 帧")
+                if detector is not None:
+                    stats = self.pipeline_stats
+                    self._update_dedup_stats(
+                        detector, stats["convert_time"] / stats["converted"] if stats["converted"] else 0.0
+                    )
+                print(f"[调试] GIF录制结束，写入了 {out.frame_count} 帧")
             
-            # MP4录制模式
+            # MP4及WebP/APNG录制模式
             else:
+                animated = self.output_format in ANIMATION_FORMATS
+                # 动画格式没有时间码封装步骤，延时摄影按输出帧率播放，均固定使用CFR
+                vfr = self.frame_timing == "vfr" and not animated and not self.timelapse_interval
+                pool = None
+                convert = None
+                
+                # 大区域按条带并行缩放和转换，单帧耗时随核心数下降
+                stripes = StripePool(self.stripe_workers or default_stripe_workers(width, height))
+                # 按设置缩小输出分辨率，写入器、转换缓冲都按缩放后的尺寸创建
+                scaler = self._create_scaler(stripes)
+                width, height = self._output_size()
+                
+                # ffmpeg编码时直接把BGRA转换为YUV 4:2:0送入编码器，省去中间BGR帧和编码器内部的转换
+                color_format = COLOR_BGR
+                if self.encoder == "ffmpeg" and supports_yuv(width, height):
+                    color_format = self.color_format
+                converter = ColorConverter(color_format, self.color_matrix, stripes)
+                writer_args = {"pix_fmt": converter.pix_fmt}
+                if color_format != COLOR_BGR:
+                    writer_args["color_args"] = color_tag_args(self.color_matrix)
+                
                 # 初始化视频写入器
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(self.video_path, fourcc, self.fps, (width, height))
+                if animated:
+                    # BGRA帧原样送入ffmpeg，由其完成像素格式转换与编码，直接写入最终文件
+                    out = FFmpegWriter(
+                        self.output_path, width, height, self.fps, pix_fmt="bgra",
+                        output_args=ANIMATION_FORMATS[self.output_format][1]
+                    )
+                elif self.segmented:
+                    # 帧通过管道送入常驻的libx264编码进程，按固定时长写成可独立播放的分段
+                    os.makedirs(self.segment_dir, exist_ok=True)
+                    muxer_args, pattern = segment_muxer_args(self.segment_dir, self.segment_seconds)
+                    out = FFmpegWriter(pattern, width, height, self.fps, muxer_args=muxer_args, **writer_args)
+                elif self.encoder == "ffmpeg":
+                    # 帧通过管道直接送入常驻的libx264编码进程
+                    out = FFmpegWriter(self.video_path, width, height, self.fps, **writer_args)
+                else:
+                    # 优先尝试H.264（avc1），使结束时可以走仅封装路径；不可用时回退到mp4v
+                    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+                    out = cv2.VideoWriter(self.video_path, fourcc, self.fps, (width, height))
+                    if not out.isOpened():
+                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                        out = cv2.VideoWriter(self.video_path, fourcc, self.fps, (width, height))
                 
-                # 初始化屏幕捕获
-                with mss.mss() as sct:
-                    monitor = {"left": left, "top": top, "width": width, "height": height}
+                if not animated:
+                    # 转换输出缓冲池：容量覆盖队列中与转换中的全部帧，稳态下不再分配
+                    pool = FramePool(
+                        frame_shape(color_format, width, height),
+                        size=self.queue_size + self.convert_workers + 1
+                    )
                     
-                    # 记录帧
-                    frame_count = 0
-                    start_time = time.time()
+                    def convert(frame):
+                        # 缩放结果是工作线程复用的中间缓冲，转换直接写入池中缓冲，避免每帧分配新数组
+                        if scaler is not None:
+                            frame = scaler(frame)
+                        return converter(frame, pool.acquire())
+                elif scaler is not None:
+                    # 动画格式送入ffmpeg的是BGRA帧，缩放结果直接写入池中缓冲
+                    pool = FramePool((height, width, 4), size=self.queue_size + self.convert_workers + 1)
                     
-                    while self.running:
-                        # 捕获屏幕
-                        frame = np.array(sct.grab(monitor))
-                        
-                        # 转换为BGR格式（OpenCV格式）
-                        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-                        
-                        # 写入视频文件
-                        out.write(frame)
+                    def convert(frame):
+                        return scaler(frame, pool.acquire())
+                
+                # 分段录制时帧时间戳随写入追加到分段目录，中断后恢复的视频仍是可变帧率
+                journal = TimecodeJournal(os.path.join(self.segment_dir, TIMECODES_NAME)) \
+                    if vfr and self.segmented else None
+                end_time = None
+                
+                # 捕获线程只负责抓屏，颜色转换和编码在流水线线程中进行，
+                # 编码器卡顿不会拖慢捕获节奏
+                pipeline = EncodePipeline(
+                    out,
+                    convert=convert,
+                    queue_size=self.queue_size,
+                    policy=self.backpressure,
+                    workers=self.convert_workers,
+                    release=pool.release if pool is not None else None,
+                    journal=journal
+                )
+                
+                try:
+                    # 初始化帧来源
+                    with self._create_frame_source() as source:
+                        # 单调时钟帧调度，保证输出时长与实际时间一致。
+                        # VFR模式下每帧只写一次并记录捕获时间戳，延迟时由时间戳体现停顿；
+                        # CFR模式下重复帧补齐错过的时间槽
+                        scheduler = self._create_scheduler(vfr)
+                        scheduler.start()
+                        detector = ChangeDetector() if self.dedup else None
+                        averager = self._create_averager()
                         
-                        frame_count += 1
+                        while self.running:
+                            scheduler.wait(self._stop_event)
+                            slots = scheduler.tick()
+                            pts = scheduler.last_tick_ns / 1e9 if vfr else None
+                            
+                            # 捕获屏幕
+                            frame = source.grab()
+                            if not slots:
+                                continue
+                            
+                            # 延时摄影平均：累计满一组后才输出
+                            if averager is not None:
+                                frame = averager.add(frame)
+                                if frame is None:
+                                    continue
+                            
+                            # 画面未变化：VFR下不投递（上一帧自然延长显示），
+                            # CFR下投递重复标记，由写入线程复用上一帧，跳过转换。
+                            # 分段录制时编码器按送入的帧数计时切分段和插入关键帧，
+                            # VFR也投递重复标记，否则静止画面时分段迟迟不能结束
+                            if detector is not None and not detector.changed(frame):
+                                if vfr and not self.segmented:
+                                    continue
+                                frame = None
+                            
+                            # 投递到流水线
+                            if not pipeline.submit(frame, slots, pts):
+                                # 被队列丢弃的时间槽由下一帧补齐
+                                scheduler.discard(slots)
+                            # 被丢弃的完整帧没有写入，不能再作为去重的参照
+                            if detector is not None and pipeline.frame_dropped():
+                                detector.reset()
                         
-                        # 维持帧率
-                        elapsed_time = time.time() - start_time
-                        sleep_time = (frame_count / self.fps) - elapsed_time
-                        if sleep_time > 0:
-                            time.sleep(sleep_time)
+                        end_time = scheduler.elapsed_ns() / 1e9
+                        self.timing_stats = scheduler.get_stats()
+                        print(f"[调试] 帧调度统计: {self.timing_stats}")
+                finally:
+                    # 等待队列中的帧写完，再释放编码器
+                    try:
+                        pipeline.close()
+                    finally:
+                        self.pipeline_stats = pipeline.get_stats()
+                        if pool is not None:
+                            self.pipeline_stats["pool"] = pool.get_stats()
+                        print(f"[调试] 帧队列统计: {self.pipeline_stats}")
+                        stripes.close()
+                        out.release()
+                        if journal is not None:
+                            journal.close(end_time)
                 
-                # 释放资源
-                out.release()
+                if detector is not None:
+                    # 每个被跳过的帧节省一次转换；VFR（不分段）下连编码写入也一并省去
+                    stats = self.pipeline_stats
+                    per_frame = stats["convert_time"] / stats["converted"] if stats["converted"] else 0.0
+                    if vfr and not self.segmented and stats["written"]:
+                        per_frame += stats["write_time"] / stats["written"]
+                    self._update_dedup_stats(detector, per_frame)
+                
+                # 写入时间码旁路文件，封装时据此生成可变帧率视频
+                if vfr and pipeline.written_pts:
+                    write_timecodes(self.timecodes_path, pipeline.written_pts, end_time)
                 
         except Exception as e:
             self.error_messages["video"] = f"录制视频时出错: {str(e)}"
             print(self.error_messages["video"])
+        finally:
+            # 写入器或流水线创建失败时帧来源还没有进入with，这里保证总会关闭，
+            # 共享捕获的订阅者随之退订，捕获中心不会一直抓屏
+            if self.frame_source is not None:
+                self.frame_source.close()
+    
+    def _capture_gif_frames(self):
+        """捕获GIF帧（RGB565），供结束时的全局调色板量化使用
+        
+        帧保存在FrameStore中，超出内存预算的较旧帧溢出到输出目录下的临时文件。
+        """
+        width, height = self._output_size()
+        scaler = self._create_scaler()
+        self.frames = FrameStore(
+            (height, width), "uint16",
+            os.path.join(self.output_dir, f"gif_frames_{self.timestamp}.tmp"),
+            self.gif_ram_budget
+        )
+        
+        with self._create_frame_source() as source:
+            scheduler = self._create_scheduler()
+            scheduler.start()
+            detector = ChangeDetector() if self.dedup else None
+            averager = self._create_averager()
+            convert_time = 0.0
+            converted = 0
+            
+            while self.running:
+                scheduler.wait(self._stop_event)
+                slots = scheduler.tick()
+                
+                # 捕获屏幕
+                frame = source.grab()
+                if not slots:
+                    continue
+                
+                # 延时摄影平均：累计满一组后才输出
+                if averager is not None:
+                    frame = averager.add(frame)
+                    if frame is None:
+                        continue
+                
+                # 画面未变化时直接复用上一帧，跳过转换
+                if detector is not None and not detector.changed(frame) and len(self.frames):
+                    self.frames.repeat(slots)
+                    continue
+                
+                start = time.perf_counter()
+                if scaler is not None:
+                    frame = scaler(frame)
+                frame = to_rgb565(frame)
+                convert_time += time.perf_counter() - start
+                converted += 1
+                
+                # 重复帧只记录引用，编码时只延长显示时间
+                self.frames.append(frame, slots)
+        
+        if detector is not None:
+            self._update_dedup_stats(detector, convert_time / converted if converted else 0.0)
+        self.timing_stats = scheduler.get_stats()
+        print(f"[调试] 帧调度统计: {self.timing_stats}")
+        print(f"[调试] GIF录制结束，捕获了 {len(self.frames)} 帧，帧存储: {self.frames.get_stats()}")
+    
+    def _update_dedup_stats(self, detector, per_frame_cost):
+        """汇总静止画面去重统计
+        
+        Args:
+            detector (ChangeDetector): 本次录制使用的检测器
+            per_frame_cost (float): 每帧实际处理的平均耗时（秒），用于估算节省的CPU时间
+        """
+        self.dedup_stats = detector.get_stats()
+        self.dedup_stats["cpu_saved"] = detector.unchanged * per_frame_cost
+        print(f"[调试] 静止画面去重: 跳过 {detector.unchanged}/{detector.checked} 帧 "
+              f"({self.dedup_stats['dedup_ratio']:.0%})，约节省 {self.dedup_stats['cpu_saved']:.2f} 秒处理时间")
     
     def _create_gif(self):
-        """从捕获的帧创建GIF动画"""
+        """完成GIF输出
+        
+        流式模式下GIF在录制过程中已写入最终文件，这里只检查结果，
+        录制失败时删除不完整的文件；全局调色板模式下在此统一量化并编码。
+        """
+        if self.frames is not None and len(self.frames) and self.error_messages["video"] is None:
+            try:
+                print(f"[调试] 开始创建GIF: {self.output_path}")
+                print(f"[调试] 帧数: {len(self.frames)}, 帧率: {self.fps}, 调色板: {self.gif_palette}, "
+                      f"编码进程: {self.gif_workers}")
+                start = time.perf_counter()
+                self._report("正在编码GIF")
+                written = encode_gif_parallel(
+                    self.frames, self.output_path, self.fps, self.gif_palette, self.gif_dither,
+                    workers=self.gif_workers,
+                    progress=lambda fraction: self._report("正在编码GIF", fraction)
+                )
+                print(f"[调试] GIF编码完成，写入 {written} 帧，耗时 {time.perf_counter() - start:.2f} 秒")
+            except Exception as e:
+                self.error_messages["video"] = f"创建GIF动画时出错: {str(e)}"
+                import traceback
+                traceback.print_exc()
+        
+        return self._finish_output()
+    
+    def _finish_output(self):
+        """检查录制过程中直接写入的输出文件（GIF、WebP、APNG）
+        
+        录制失败时删除不完整的文件。
+        
+        Returns:
+            bool: 输出文件是否可用
+        """
+        name = self.output_format.upper()
+        if self.error_messages["video"] is None and os.path.exists(self.output_path):
+            print(f"[调试] {name}已保存到: {self.output_path}")
+            return True
+        
+        if os.path.exists(self.output_path):
+            try:
+                os.remove(self.output_path)
+            except OSError as e:
+                print(f"[警告] 删除不完整的{name}文件失败: {str(e)}")
+        if self.error_messages["video"] is None:
+            self.error_messages["video"] = f"{name}文件未生成"
+        print(f"[错误] {self.error_messages['video']}")
+        return False
+    
+    def _merge_audio_video(self):
+        """合并音频和视频文件
+        
+        临时视频已是H.264时只做容器级封装（视频流直接复制，仅编码音频），
+        耗时与录制时长基本无关；否则回退到moviepy解码后重新编码。
+        分段录制时先按分段日志流复制拼接出临时视频；存在时间码旁路文件时，
+        再按每帧捕获时间戳改写视频时间信息。
+        """
+        if self.segmented:
+            self._report("正在拼接视频分段")
+            try:
+                count = concat_segments(self.segment_dir, self.video_path)
+                print(f"[调试] 已拼接 {count} 个视频分段")
+            except Exception as e:
+                self.error_messages["video"] = f"拼接视频分段时出错: {str(e)}"
+                print(f"[错误] {self.error_messages['video']}")
+                return False
+        
+        if os.path.exists(self.timecodes_path):
+            self._report("正在写入帧时间戳")
+            try:
+                pts_seconds, end_seconds = read_timecodes(self.timecodes_path)
+                apply_timecodes(self.video_path, pts_seconds, end_seconds)
+                print(f"[调试] 已按 {len(pts_seconds)} 个帧时间戳生成可变帧率视频")
+            except Exception as e:
+                print(f"[警告] 应用帧时间戳失败，按恒定帧率输出: {str(e)}")
+        
         try:
-            print(f"[调试] 开始创建GIF: {self.output_path}")
-            print(f"[调试] 帧数: {len(self.frames)}, 帧率: {self.fps}")
+            codec = probe_video_codec(self.video_path)
+        except Exception as e:
+            print(f"[警告] 探测视频编码失败: {str(e)}")
+            codec = None
+        
+        if codec == "h264":
+            return self._mux_audio_video()
+        return self._reencode_audio_video()
+    
+    def _mux_audio_video(self):
+        """仅封装：复制H.264视频流并附加音频"""
+        try:
+            print(f"[调试] 开始封装音频和视频（视频流复制）...")
+            self._report("正在封装音频和视频")
             
-            # 使用imageio保存GIF
-            imageio.mimsave(
-                self.output_path,
-                self.frames,
-                fps=self.fps,
-                optimize=True,
-                subrectangles=True
-            )
+            if os.path.exists(self.system_audio_path):
+                try:
+                    mux_audio_video(self.video_path, self.system_audio_path, self.output_path)
+                    print(f"[调试] 视频已封装并保存到: {self.output_path}")
+                    return True
+                except Exception as e:
+                    self.error_messages["system_audio"] = f"处理音频时出错: {str(e)}"
+                    print(f"[错误] {self.error_messages['system_audio']}")
+            elif self.record_audio:
+                self.error_messages["system_audio"] = "未找到音频文件，输出视频将没有声音"
+                print(f"[警告] {self.error_messages['system_audio']}")
             
-            print(f"[调试] GIF已保存到: {self.output_path}")
+            # 无可用音频时，编码好的视频即为最终文件
+            os.replace(self.video_path, self.output_path)
+            print(f"[调试] 视频已保存到: {self.output_path}")
             return True
         except Exception as e:
-            self.error_messages["video"] = f"创建GIF动画时出错: {str(e)}"
+            self.error_messages["video"] = f"封装音频和视频时出错: {str(e)}"
             print(f"[错误] {self.error_messages['video']}")
             import traceback
             traceback.print_exc()
             return False
     
-    def _merge_audio_video(self):
-        """合并音频和视频文件"""
+    def _reencode_audio_video(self):
+        """解码临时视频并与音频一起重新编码（非H.264临时视频的回退路径）"""
         try:
             print(f"[调试] 开始合并音频和视频...")
+            self._report("正在重新编码音频和视频")
             
             # 加载视频和音频
             video = VideoFileClip(self.video_path)
@@ -189,7 +679,7 @@ class Recorder:
                 except Exception as e:
                     self.error_messages["system_audio"] = f"处理音频时出错: {str(e)}"
                     print(f"[错误] {self.error_messages['system_audio']}")
-            else:
+            elif self.record_audio:
                 self.error_messages["system_audio"] = "未找到音频文件，输出视频将没有声音"
                 print(f"[警告] {self.error_messages['system_audio']}")
             
@@ -225,6 +715,7 @@ class Recorder:
         if not self.region:
             self.error_messages["video"] = "未指定录制区域"
             print(f"[错误] {self.error_messages['video']}")
+            self.discard()
             return
             
         # 重置错误消息
@@ -235,17 +726,21 @@ class Recorder:
         
         # 标记为运行状态
         self.running = True
+        self._stop_event.clear()
         
         # 启动视频录制线程
         self.video_thread = threading.Thread(target=self._record_video)
         self.video_thread.daemon = True
         self.video_thread.start()
         
-        # 如果是MP4格式，启动音频录制（GIF不需要音频）
-        if self.output_format == "mp4":
+        # 如果是MP4格式，启动音频录制（GIF和延时摄影不需要音频）
+        if self.record_audio:
             self.audio_manager.start_recording()
         
         print(f"[调试] 录制已开始，区域: {self.region}, 格式: {self.output_format.upper()}")
+        if self.timelapse_interval:
+            print(f"[调试] 延时摄影: 每 {self.timelapse_interval} 秒输出一帧（平均 {self.timelapse_average} 帧），"
+                  f"按 {self.fps} FPS 播放")
     
     def stop(self):
         """停止录制并处理文件
@@ -253,40 +748,90 @@ class Recorder:
         Returns:
             tuple: (输出文件路径, 错误信息字典)
         """
+        if not self.stop_capture():
+            self.discard()
+            return None, self.error_messages
+        return self.finalize()
+    
+    def discard(self):
+        """放弃未开始的录制器（如仅用于检测音频或启动失败），释放预留的时间戳
+        
+        开始过的录制在 finalize() 结束时释放，这里不做处理。
+        """
+        if self.video_thread is None:
+            Recorder._reserved_timestamps.discard(self.timestamp)
+    
+    def stop_capture(self):
+        """停止捕获：结束视频与音频线程，临时文件全部写完后返回，不做后期处理
+        
+        Returns:
+            bool: 是否停止了正在进行的录制
+        """
         if not self.running:
             print("[警告] 录制未在进行中")
-            return None, self.error_messages
+            return False
             
         print("[调试] 正在停止录制...")
         
-        # 标记为停止状态
+        # 标记为停止状态，并唤醒正在等待下一帧的录制线程
         self.running = False
+        self._stop_event.set()
         
         # 等待视频线程完成
         if self.video_thread:
             self.video_thread.join()
             
         # 停止音频录制（如果有）
-        if self.output_format == "mp4":
+        if self.record_audio:
             audio_error = self.audio_manager.stop_recording()
             if audio_error:
                 self.error_messages["system_audio"] = audio_error
+        return True
+    
+    def finalize(self, progress=None):
+        """处理录制文件（封装MP4、编码GIF等）并清理临时文件，可在后台线程中调用
         
-        # 处理文件
-        success = False
-        if self.output_format == "gif":
-            success = self._create_gif()
-        else:  # mp4
-            success = self._merge_audio_video()
-            
-        # 清理临时文件
-        self._cleanup_temp_files()
+        Args:
+            progress (callable, optional): 进度回调，参数为 (阶段描述, 完成比例或None)，
+                在调用本方法的线程中执行
+        
+        Returns:
+            tuple: (输出文件路径, 错误信息字典)
+        """
+        self._progress = progress
+        try:
+            success = False
+            if self.output_format == "gif":
+                success = self._create_gif()
+            elif self.output_format in ANIMATION_FORMATS:
+                success = self._finish_output()
+            else:  # mp4
+                success = self._merge_audio_video()
+                
+            # 清理临时文件
+            self._cleanup_temp_files()
+        finally:
+            self._progress = None
+            Recorder._reserved_timestamps.discard(self.timestamp)
         
         if success:
             return self.output_path, self.error_messages
         else:
             return None, self.error_messages
     
+    def _report(self, stage, fraction=None):
+        """报告后期处理进度
+        
+        Args:
+            stage (str): 阶段描述
+            fraction (float, optional): 该阶段的完成比例
+        """
+        if self._progress is not None:
+            try:
+                self._progress(stage, fraction)
+            except Exception as e:
+                print(f"[警告] 进度回调出错: {str(e)}")
+    
     def _cleanup_temp_files(self):
         """清理临时文件"""
         try:
@@ -296,13 +841,23 @@ class Recorder:
                     os.remove(self.video_path)
                     print(f"[调试] 已删除临时视频文件: {self.video_path}")
                     
-                if os.path.exists(self.system_audio_path):
+                # 分段录制未能生成输出时保留分段和音频，下次启动时仍可恢复
+                keep_for_recovery = self.segmented and not os.path.exists(self.output_path)
+                if keep_for_recovery:
+                    print(f"[警告] 保留视频分段以便恢复: {self.segment_dir}")
+                else:
+                    remove_segments(self.segment_dir)
+                
+                if os.path.exists(self.system_audio_path) and not keep_for_recovery:
                     os.remove(self.system_audio_path)
                     print(f"[调试] 已删除临时音频文件: {self.system_audio_path}")
+                
+                if os.path.exists(self.timecodes_path):
+                    os.remove(self.timecodes_path)
                     
-            # 清空帧列表（如果是GIF）
-            if hasattr(self, 'frames'):
-                self.frames.clear()
+            # 释放GIF帧存储并删除溢出文件
+            if getattr(self, 'frames', None) is not None:
+                self.frames.close()
                 
         except Exception as e:
             print(f"[警告] 清理临时文件时出错: {str(e)}")
@@ -0,0 +1,242 @@
+"""
+文件名: core/recovery.py
+功能: 中断录制的恢复。录制进程意外退出时，输出目录中会残留临时视频
+     （video_*.mp4）、视频分段目录（video_*_segments）、系统音频
+     （system_audio_*.wav）和GIF帧溢出文件（gif_frames_*.tmp）。扫描器按
+     时间戳把这些残留文件归为一次会话，修复头部未写完整的WAV文件，按
+     时间码旁路文件还原可变帧率视频的帧时间，再把能保存的部分封装为
+     最终文件；只剩音频时保存为WAV，无法恢复的GIF帧溢出文件直接删除。
+"""
+
+import os
+import re
+import time
+import struct
+
+from .ffmpeg_writer import probe_video_codec, mux_audio_video
+from .segments import recover_session as recover_segments
+from .mp4_timing import read_timecodes, apply_timecodes, timecodes_path_for
+
+# 残留文件名：video_{时间戳}.mp4、video_{时间戳}_segments、system_audio_{时间戳}.wav、gif_frames_{时间戳}.tmp
+_ARTIFACT_PATTERN = re.compile(
+    r"^(video|system_audio|gif_frames)_(\d{8}_\d{6})(\.mp4|_segments|\.wav|\.tmp)$"
+)
+
+# 最近修改时间在此范围内的文件可能仍在写入，不作为残留处理（秒）
+MIN_IDLE_SECONDS = 30
+
+
+def repair_wav_header(path):
+    """修复中断录制留下的WAV头：按实际文件大小改写RIFF与data块长度
+
+    Args:
+        path (str): WAV文件路径
+
+    Returns:
+        bool: 是否改写了文件头
+
+    Raises:
+        ValueError: 不是可修复的PCM WAV文件时抛出
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"不是WAV文件: {path}")
+
+        # 依次查找fmt块（取块对齐）和data块
+        block_align = None
+        offset = 12
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+            if chunk_id == b"fmt ":
+                block_align = struct.unpack("<H", f.read(14)[12:14])[0]
+            elif chunk_id == b"data":
+                break
+            offset += 8 + chunk_size + (chunk_size & 1)
+        else:
+            raise ValueError(f"WAV文件中没有data块: {path}")
+        if not block_align:
+            raise ValueError(f"WAV文件中没有fmt块: {path}")
+
+        data_offset = offset + 8
+        data_size = (file_size - data_offset) // block_align * block_align
+        if chunk_size == data_size and struct.unpack("<I", header[4:8])[0] == data_offset + data_size - 8:
+            return False
+
+        # 丢弃末尾不完整的采样帧
+        f.truncate(data_offset + data_size)
+        f.seek(4)
+        f.write(struct.pack("<I", data_offset + data_size - 8))
+        f.seek(offset + 4)
+        f.write(struct.pack("<I", data_size))
+    return True
+
+
+class InterruptedSession:
+    """一次被中断的录制留下的残留文件"""
+
+    def __init__(self, output_dir, timestamp):
+        self.timestamp = timestamp
+        self.video_path = os.path.join(output_dir, f"video_{timestamp}.mp4")
+        self.segment_dir = os.path.join(output_dir, f"video_{timestamp}_segments")
+        self.audio_path = os.path.join(output_dir, f"system_audio_{timestamp}.wav")
+        self.frames_path = os.path.join(output_dir, f"gif_frames_{timestamp}.tmp")
+        self.output_path = os.path.join(output_dir, f"recording_{timestamp}_recovered.mp4")
+        self.audio_output_path = os.path.join(output_dir, f"recording_{timestamp}_recovered.wav")
+
+    def artifacts(self):
+        """获取仍存在的残留文件
+
+        Returns:
+            list: 文件或目录路径
+        """
+        return [path for path in (self.video_path, self.segment_dir, self.audio_path, self.frames_path)
+                if os.path.exists(path)]
+
+
+class RecoveryScanner:
+    """中断录制扫描器：按需逐条扫描输出目录，逐个会话恢复"""
+
+    def __init__(self, output_dir, is_active=None):
+        """初始化扫描器
+
+        Args:
+            output_dir (str): 要扫描的输出目录
+            is_active (callable, optional): 接收时间戳、返回该会话是否正在录制的函数，
+                正在录制的会话不会被当作残留处理
+        """
+        self.output_dir = output_dir
+        self.is_active = is_active
+        self.recovered = []  # 恢复出的文件路径
+        self.failed = []  # (时间戳, 错误信息)
+
+    def iter_sessions(self):
+        """惰性扫描输出目录，按时间戳归组残留文件
+
+        目录项逐条读取，不读取文件内容；同一时间戳的残留文件归为一次会话。
+
+        Yields:
+            InterruptedSession: 被中断的会话（按时间戳排序）
+        """
+        if not os.path.isdir(self.output_dir):
+            return
+        now = time.time()
+        timestamps = set()
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                match = _ARTIFACT_PATTERN.match(entry.name)
+                if match is None:
+                    continue
+                try:
+                    if now - entry.stat().st_mtime < MIN_IDLE_SECONDS:
+                        continue
+                except OSError:
+                    continue
+                timestamps.add(match.group(2))
+
+        for timestamp in sorted(timestamps):
+            if self.is_active is not None and self.is_active(timestamp):
+                continue
+            yield InterruptedSession(self.output_dir, timestamp)
+
+    def recover(self, session):
+        """恢复一次会话
+
+        Args:
+            session (InterruptedSession): 被中断的会话
+
+        Returns:
+            str: 恢复出的文件路径；只清理了无法恢复的GIF帧溢出文件时为None
+
+        Raises:
+            RuntimeError: 视频无法恢复时抛出（残留文件保留不动）
+        """
+        # GIF帧溢出文件只有原始帧数据，缺少帧顺序和内存中的帧，无法还原为GIF
+        if os.path.exists(session.frames_path):
+            self._remove(session.frames_path)
+            print(f"[调试] 已删除中断录制的GIF帧溢出文件: {session.frames_path}")
+            if not session.artifacts():
+                return None
+
+        # 先修复音频头，使后续封装能读到全部已录制的音频
+        has_audio = False
+        if os.path.exists(session.audio_path):
+            try:
+                if repair_wav_header(session.audio_path):
+                    print(f"[调试] 已修复WAV文件头: {session.audio_path}")
+                has_audio = True
+            except (ValueError, OSError, struct.error) as e:
+                print(f"[警告] 无法修复音频文件，恢复时不含声音: {str(e)}")
+
+        # 分段录制：按日志拼接分段（分段恢复会一并应用时间码、封装音频）
+        if os.path.isdir(session.segment_dir):
+            output_path = recover_segments(session.segment_dir)
+            self._remove(session.video_path, timecodes_path_for(session.video_path))
+            return output_path
+
+        # 只有音频（视频尚未写出就中断）：保存为WAV，不再作为残留反复处理
+        if not os.path.exists(session.video_path):
+            if not has_audio:
+                # 连WAV头都没有写完整，文件中没有音频数据
+                self._remove(session.audio_path)
+                raise RuntimeError(f"音频文件已损坏且没有视频，已删除: {session.audio_path}")
+            os.replace(session.audio_path, session.audio_output_path)
+            return session.audio_output_path
+
+        # 单文件录制：只有临时视频已完整写出（可识别视频流）时才能恢复
+        if probe_video_codec(session.video_path) is None:
+            raise RuntimeError(f"临时视频未完整写出，无法恢复，已保留: {session.video_path}")
+
+        # 可变帧率录制：先按时间码旁路文件改写帧时间，再封装音频，音视频时长才一致
+        timecodes_path = timecodes_path_for(session.video_path)
+        if os.path.exists(timecodes_path):
+            self._apply_timecodes(session.video_path, timecodes_path)
+
+        if has_audio:
+            mux_audio_video(session.video_path, session.audio_path, session.output_path)
+            self._remove(session.video_path, session.audio_path)
+        else:
+            os.replace(session.video_path, session.output_path)
+        self._remove(timecodes_path)
+        return session.output_path
+
+    def run(self, on_result=None):
+        """扫描并逐个恢复所有被中断的会话
+
+        Args:
+            on_result (callable, optional): 每处理完一个会话调用一次（只删除了GIF帧溢出文件的会话除外），
+                参数为 (时间戳, 恢复出的文件路径或None, 错误信息或None)
+        """
+        for session in self.iter_sessions():
+            try:
+                output_path = self.recover(session)
+                if output_path is None:
+                    continue
+                self.recovered.append(output_path)
+                print(f"[调试] 已恢复中断的录制: {output_path}")
+                result = (session.timestamp, output_path, None)
+            except Exception as e:
+                self.failed.append((session.timestamp, str(e)))
+                print(f"[警告] 恢复中断的录制失败: {str(e)}")
+                result = (session.timestamp, None, str(e))
+            if on_result is not None:
+                on_result(*result)
+
+    @staticmethod
+    def _apply_timecodes(video_path, timecodes_path):
+        """按时间码旁路文件改写临时视频的帧时间，失败时按恒定帧率恢复"""
+        try:
+            pts_seconds, end_seconds = read_timecodes(timecodes_path)
+            apply_timecodes(video_path, pts_seconds, end_seconds, truncate=True)
+            print(f"[调试] 已按 {len(pts_seconds)} 个帧时间戳恢复可变帧率视频")
+        except (ValueError, OSError) as e:
+            print(f"[警告] 应用帧时间戳失败，按恒定帧率恢复: {str(e)}")
+
+    @staticmethod
+    def _remove(*paths):
+        """删除已处理的残留文件"""
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
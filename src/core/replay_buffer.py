@@ -0,0 +1,412 @@
+"""
+文件名: core/replay_buffer.py
+功能: 即时回放缓冲区。视频以固定GOP编码为分片MP4（每个关键帧开始一个
+     moof+mdat分片），音频实时编码为AAC（ADTS帧），二者都保存在按时长
+     淘汰的环形缓冲中，淘汰时总是整段移除以关键帧开头的分片，内存占用
+     固定。保存时只需把初始化段与缓冲中的分片写出，再做一次流复制封装，
+     不需要重新编码。
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+from .ffmpeg_writer import get_ffmpeg_exe, run_ffmpeg, _CREATION_FLAGS
+from .mp4_timing import _iter_boxes, _parse, _find_video_track, _read_duration_field
+
+# AAC每帧的采样数
+AAC_FRAME_SAMPLES = 1024
+
+
+class Mp4FragmentParser:
+    """分片MP4字节流解析器：拆出初始化段（ftyp+moov）与各个 moof+mdat 分片"""
+
+    def __init__(self):
+        self.init_segment = None  # ftyp+moov
+        self.timescale = None  # 视频轨时间刻度
+        self._buffer = bytearray()
+        self._header = bytearray()  # 尚未凑齐的初始化段
+        self._moof = None  # 等待配对mdat的moof
+
+    def feed(self, data):
+        """输入一段字节流
+
+        Args:
+            data (bytes): ffmpeg标准输出读取到的数据
+
+        Returns:
+            list: 新完成的分片 (起始时间（秒）, 分片字节串)
+        """
+        self._buffer += data
+        fragments = []
+        while len(self._buffer) >= 8:
+            size, box_type = struct.unpack(">I4s", self._buffer[:8])
+            if size < 8:
+                raise ValueError(f"不支持的MP4 box大小: {box_type!r}")
+            if len(self._buffer) < size:
+                break
+            box = bytes(self._buffer[:size])
+            del self._buffer[:size]
+
+            if box_type in (b"ftyp", b"moov"):
+                self._header += box
+                if box_type == b"moov":
+                    self.init_segment = bytes(self._header)
+                    self.timescale = self._read_timescale(box)
+            elif box_type == b"moof":
+                self._moof = box
+            elif box_type == b"mdat" and self._moof is not None:
+                start = self._read_decode_time(self._moof) / self.timescale
+                fragments.append((start, self._moof + box))
+                self._moof = None
+        return fragments
+
+    @staticmethod
+    def _read_timescale(moov_box):
+        """从moov读取视频轨的时间刻度"""
+        moov = _parse(moov_box, 0, len(moov_box))[0]
+        trak = _find_video_track(moov)
+        mdhd = trak.find(b"mdia").find(b"mdhd")
+        timescale, _ = _read_duration_field(mdhd.payload, mdhd.payload[0])
+        return timescale
+
+    @staticmethod
+    def _find_decode_time(moof_box):
+        """查找moof中tfdt的版本与负载偏移"""
+        for box_type, start, end in _iter_boxes(moof_box, 8):
+            if box_type != b"traf":
+                continue
+            for child_type, body, _ in _iter_boxes(moof_box, start, end):
+                if child_type == b"tfdt":
+                    return moof_box[body], body + 4
+        raise ValueError("分片中缺少tfdt，无法确定时间")
+
+    @classmethod
+    def _read_decode_time(cls, moof_box):
+        """读取moof中tfdt记录的分片起始解码时间"""
+        version, offset = cls._find_decode_time(moof_box)
+        return struct.unpack_from(">Q" if version == 1 else ">I", moof_box, offset)[0]
+
+    @classmethod
+    def rebase_fragment(cls, fragment, base):
+        """把分片的起始解码时间减去base，使截取的分片序列从0开始
+
+        Args:
+            fragment (bytes): moof+mdat分片
+            base (int): 要减去的时间（时间刻度单位）
+
+        Returns:
+            bytes: 改写后的分片
+        """
+        version, offset = cls._find_decode_time(fragment)
+        fmt = ">Q" if version == 1 else ">I"
+        data = bytearray(fragment)
+        struct.pack_into(fmt, data, offset, struct.unpack_from(fmt, data, offset)[0] - base)
+        return bytes(data)
+
+
+class AdtsParser:
+    """ADTS字节流解析器：按帧头中的帧长拆出完整的AAC帧"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """输入一段字节流
+
+        Args:
+            data (bytes): 编码器输出的数据
+
+        Returns:
+            list: 新完成的ADTS帧（含帧头）
+        """
+        self._buffer += data
+        frames = []
+        while len(self._buffer) >= 7:
+            if self._buffer[0] != 0xFF or (self._buffer[1] & 0xF0) != 0xF0:
+                raise ValueError("ADTS同步字错误")
+            length = ((self._buffer[3] & 0x03) << 11) | (self._buffer[4] << 3) | (self._buffer[5] >> 5)
+            if len(self._buffer) < length:
+                break
+            frames.append(bytes(self._buffer[:length]))
+            del self._buffer[:length]
+        return frames
+
+
+class _StreamEncoder:
+    """ffmpeg编码进程基类：标准输入写入原始数据，后台线程读取标准输出"""
+
+    def __init__(self, cmd):
+        self.process = subprocess.Popen(
+            [get_ffmpeg_exe(), "-hide_banner", "-nostats", "-loglevel", "error"] + cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=_CREATION_FLAGS
+        )
+        self.error = None
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        try:
+            while True:
+                data = self.process.stdout.read1(65536)
+                if not data:
+                    break
+                self._consume(data)
+        except Exception as e:
+            self.error = f"解析ffmpeg输出出错: {str(e)}"
+            print(f"[错误] {self.error}")
+            # 不再读取标准输出后ffmpeg会阻塞，结束进程让正在等待的写入立即失败
+            self.process.kill()
+
+    def _consume(self, data):
+        raise NotImplementedError
+
+    def _write(self, data):
+        if self.error:
+            raise RuntimeError(self.error)
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            if self.error:
+                raise RuntimeError(self.error)
+            message = self.process.stderr.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"ffmpeg编码进程已退出: {message}")
+
+    def release(self):
+        """结束输入并等待编码进程退出"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        self._reader.join()
+        self.process = None
+
+
+class ReplayVideoEncoder(_StreamEncoder):
+    """固定GOP的H.264分片MP4编码器，完成的分片送入回放缓冲"""
+
+    def __init__(self, buffer, width, height, fps=30, pix_fmt="bgr24", preset="ultrafast", crf=23):
+        """初始化并启动编码进程
+
+        Args:
+            buffer (ReplayBuffer): 接收分片的回放缓冲
+            width (int): 帧宽度
+            height (int): 帧高度
+            fps (int): 帧率（恒定帧率输入）
+            pix_fmt (str): 输入原始帧的像素格式
+            preset (str): 编码预设
+            crf (int): 质量参数
+        """
+        self.buffer = buffer
+        self.parser = Mp4FragmentParser()
+        self.frame_count = 0
+        gop = max(1, int(round(fps * buffer.gop_seconds)))
+        super().__init__([
+            "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            "-an",
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-bf", "0",
+            # 固定GOP且禁用场景切换关键帧，每个分片时长一致
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-pix_fmt", "yuv420p",
+            # 每个关键帧开始一个分片；分片内偏移相对moof，单独截取的分片仍可解析
+            "-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-"
+        ])
+
+    def _consume(self, data):
+        fragments = self.parser.feed(data)
+        if self.parser.init_segment is not None:
+            self.buffer.set_init_segment(self.parser.init_segment, self.parser.timescale)
+        for start, fragment in fragments:
+            self.buffer.add_fragment(start, fragment)
+
+    def write(self, frame):
+        """写入一帧
+
+        Args:
+            frame (numpy.ndarray): 与pix_fmt匹配的原始帧
+
+        Raises:
+            RuntimeError: 编码进程已退出或解析其输出出错
+        """
+        self._write(memoryview(frame).cast("B") if frame.flags.c_contiguous else frame.tobytes())
+        self.frame_count += 1
+
+
+class ReplayAudioEncoder(_StreamEncoder):
+    """实时AAC编码器，完成的ADTS帧送入回放缓冲"""
+
+    def __init__(self, buffer, sample_rate=44100, channels=2, bitrate="128k"):
+        """初始化并启动编码进程
+
+        Args:
+            buffer (ReplayBuffer): 接收音频帧的回放缓冲
+            sample_rate (int): 采样率
+            channels (int): 声道数
+            bitrate (str): AAC码率
+        """
+        self.buffer = buffer
+        self.parser = AdtsParser()
+        self.sample_rate = sample_rate
+        self._frames = 0  # 已输出的AAC帧数
+        super().__init__([
+            "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "-",
+            "-c:a", "aac", "-b:a", bitrate, "-f", "adts", "-"
+        ])
+
+    def _consume(self, data):
+        for frame in self.parser.feed(data):
+            start = self._frames * AAC_FRAME_SAMPLES / self.sample_rate
+            self._frames += 1
+            self.buffer.add_audio_frame(start, self._frames * AAC_FRAME_SAMPLES / self.sample_rate, frame)
+
+    def write(self, pcm):
+        """写入一块16位PCM数据
+
+        Args:
+            pcm (numpy.ndarray): int16交错采样
+
+        Raises:
+            RuntimeError: 编码进程已退出或解析其输出出错
+        """
+        self._write(pcm.tobytes())
+
+
+class ReplayBuffer:
+    """按时长淘汰的音视频环形缓冲"""
+
+    def __init__(self, duration=60, gop_seconds=1.0):
+        """初始化回放缓冲
+
+        Args:
+            duration (float): 保留的时长（秒）
+            gop_seconds (float): 视频分片（GOP）时长，保存的内容最多比当前时刻滞后一个分片
+        """
+        self.duration = duration
+        self.gop_seconds = gop_seconds
+        self.init_segment = None
+        self.timescale = None
+        self._fragments = deque()  # (起始时间, 分片字节串)
+        self._audio = deque()  # (起始时间, 结束时间, ADTS帧)
+        self._lock = threading.Lock()
+        self.bytes = 0  # 缓冲中的数据量
+        self.evicted = 0  # 已淘汰的分片数
+
+    def set_init_segment(self, data, timescale):
+        with self._lock:
+            self.init_segment = data
+            self.timescale = timescale
+
+    def add_fragment(self, start, data):
+        """加入一个视频分片，并整段淘汰超出时长的最旧分片"""
+        with self._lock:
+            self._fragments.append((start, data))
+            self.bytes += len(data)
+            # 去掉最旧分片后仍覆盖所需时长时才淘汰它
+            while len(self._fragments) > 1 and start - self._fragments[1][0] >= self.duration - self.gop_seconds:
+                _, old = self._fragments.popleft()
+                self.bytes -= len(old)
+                self.evicted += 1
+            self._trim_audio()
+
+    def add_audio_frame(self, start, end, frame):
+        """加入一个AAC帧"""
+        with self._lock:
+            self._audio.append((start, end, frame))
+            self.bytes += len(frame)
+            self._trim_audio()
+
+    def _trim_audio(self):
+        """淘汰早于最旧视频分片的音频帧（无视频时按时长淘汰）"""
+        if self._fragments:
+            limit = self._fragments[0][0]
+        elif self._audio:
+            limit = self._audio[-1][1] - self.duration
+        else:
+            return
+        while self._audio and self._audio[0][1] <= limit:
+            _, _, old = self._audio.popleft()
+            self.bytes -= len(old)
+
+    def buffered_seconds(self):
+        """获取缓冲中视频的大致时长
+
+        Returns:
+            float: 秒
+        """
+        with self._lock:
+            if not self._fragments:
+                return 0.0
+            return self._fragments[-1][0] - self._fragments[0][0] + self.gop_seconds
+
+    def save(self, output_path):
+        """把缓冲内容保存为MP4（流复制，不重新编码）
+
+        Args:
+            output_path (str): 输出文件路径
+
+        Raises:
+            RuntimeError: 缓冲为空或封装失败时抛出
+        """
+        with self._lock:
+            init_segment, timescale = self.init_segment, self.timescale
+            fragments = list(self._fragments)
+            audio = list(self._audio)
+        if init_segment is None or not fragments:
+            raise RuntimeError("回放缓冲区中还没有可保存的视频")
+
+        start = fragments[0][0]
+        # 音频截取到与视频分片相同的时间范围（起点之前开始的帧会被封装器丢弃）
+        end = fragments[-1][0] + self.gop_seconds
+        audio = [(t, frame) for t, _, frame in audio if start <= t < end]
+
+        workdir = tempfile.mkdtemp(prefix="replay_", dir=os.path.dirname(os.path.abspath(output_path)))
+        video_path = os.path.join(workdir, "video.mp4")
+        audio_path = os.path.join(workdir, "audio.aac")
+        try:
+            with open(video_path, "wb") as f:
+                f.write(init_segment)
+                # 时间轴以第一个分片为0点（负的输入偏移会使封装器丢弃视频帧，直接改写分片时间）
+                base = round(start * timescale)
+                for _, data in fragments:
+                    f.write(Mp4FragmentParser.rebase_fragment(data, base))
+
+            args = ["-i", video_path]
+            if audio:
+                with open(audio_path, "wb") as f:
+                    for _, frame in audio:
+                        f.write(frame)
+                args += ["-itsoffset", f"{audio[0][0] - start:.6f}", "-i", audio_path,
+                         "-map", "0:v:0", "-map", "1:a:0", "-bsf:a", "aac_adtstoasc"]
+            run_ffmpeg(args + ["-c", "copy", output_path])
+        finally:
+            for path in (video_path, audio_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(workdir)
+
+    def get_stats(self):
+        """获取缓冲统计
+
+        Returns:
+            dict: 分片数、音频帧数、时长、字节数、已淘汰分片数
+        """
+        with self._lock:
+            fragments, audio_frames = len(self._fragments), len(self._audio)
+        return {
+            "fragments": fragments,
+            "audio_frames": audio_frames,
+            "seconds": self.buffered_seconds(),
+            "bytes": self.bytes,
+            "evicted": self.evicted
+        }
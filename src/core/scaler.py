@@ -0,0 +1,175 @@
+"""
+文件名: core/scaler.py
+功能: 输出分辨率缩放。录制高分屏或4K区域时，按缩放系数或最长边上限缩小
+     输出尺寸，缩放在颜色转换之前完成，后续的转换、编码和写入都只处理
+     缩小后的像素。区域插值缩小到1/2、1/4等2的幂次时使用整数倍均值
+     池化快速路径，其他比例和插值方式使用OpenCV缩放。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+# 可选的插值方式
+INTERPOLATIONS = {
+    "area": cv2.INTER_AREA,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4,
+    "nearest": cv2.INTER_NEAREST,
+}
+DEFAULT_INTERPOLATION = "area"
+
+
+def scaled_size(width, height, scale=None, max_dimension=None):
+    """计算输出尺寸
+
+    同时指定时取两者中较小的结果；缩放后的宽高向下取偶数，满足YUV 4:2:0的要求。
+
+    Args:
+        width (int): 捕获宽度
+        height (int): 捕获高度
+        scale (float, optional): 缩放系数，取值 (0, 1]
+        max_dimension (int, optional): 输出最长边的上限（像素）
+
+    Returns:
+        tuple: (输出宽度, 输出高度)，不需要缩放时为原尺寸
+
+    Raises:
+        ValueError: 缩放系数不在 (0, 1] 范围内
+    """
+    factor = 1.0
+    if scale is not None:
+        if not 0 < scale <= 1:
+            raise ValueError(f"缩放系数必须在 (0, 1] 范围内: {scale}")
+        factor = float(scale)
+    if max_dimension and max(width, height) * factor > max_dimension:
+        factor = max_dimension / max(width, height)
+    if factor >= 1.0:
+        return width, height
+    # 加一个极小量，避免 0.1 * 1920 之类的浮点误差少算一个像素
+    return (max(2, int(width * factor + 1e-6) // 2 * 2),
+            max(2, int(height * factor + 1e-6) // 2 * 2))
+
+
+def _pooling_factor(src_size, dst_size):
+    """判断能否使用整数倍均值池化
+
+    输出尺寸取偶数时可能比精确的整数倍少一两个像素，此时裁去源帧右侧和
+    底部不足一个输出像素的边缘。
+
+    Returns:
+        int: 2的幂次缩小倍数，不适用时为None
+    """
+    (src_w, src_h), (dst_w, dst_h) = src_size, dst_size
+    factor = src_w // dst_w
+    if factor < 2 or factor & (factor - 1) or src_h // dst_h != factor:
+        return None
+    if src_w - dst_w * factor >= 2 * factor or src_h - dst_h * factor >= 2 * factor:
+        return None
+    return factor
+
+
+def _prescale_factor(src_size, dst_size):
+    """非整数倍缩小时，先用均值池化缩小的最大2的幂次倍数
+
+    Returns:
+        int: 预缩小倍数，缩小不到一半时为None
+    """
+    (src_w, src_h), (dst_w, dst_h) = src_size, dst_size
+    ratio = min(src_w / dst_w, src_h / dst_h)
+    factor = 1
+    while factor * 2 <= ratio:
+        factor *= 2
+    return factor if factor > 1 else None
+
+
+class FrameScaler:
+    """BGRA帧缩放器，可被多个线程同时调用"""
+
+    def __init__(self, src_size, dst_size, interpolation=DEFAULT_INTERPOLATION, stripes=None):
+        """初始化缩放器
+
+        Args:
+            src_size (tuple): 捕获尺寸 (width, height)
+            dst_size (tuple): 输出尺寸 (width, height)
+            interpolation (str): 插值方式：area、linear、cubic、lanczos 或 nearest
+            stripes (StripePool, optional): 条带线程池，均值池化路径按水平条带并行
+        """
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"不支持的插值方式: {interpolation}")
+        self.src_size = tuple(src_size)
+        self.dst_size = tuple(dst_size)
+        self.interpolation = interpolation
+        self.stripes = stripes
+        self.factor = None
+        self._flag = INTERPOLATIONS[interpolation]
+        self._prescaler = None
+        if interpolation == "area":
+            # 区域插值在整数倍缩小时就是均值池化；其他插值方式的结果与之不同，不走快速路径
+            self.factor = _pooling_factor(self.src_size, self.dst_size)
+            if self.factor is None:
+                # OpenCV的非整数倍区域插值比双线性慢数倍（1440p到1080p约50毫秒），跟不上帧率。
+                # 先均值池化到不小于目标的尺寸，剩余不足一半的缩小用双线性完成，
+                # 每个输出像素仍覆盖其对应的全部源像素，效果接近区域插值
+                step = _prescale_factor(self.src_size, self.dst_size)
+                if step is not None:
+                    middle = (self.src_size[0] // step, self.src_size[1] // step)
+                    if _pooling_factor(self.src_size, middle) == step:
+                        self._prescaler = FrameScaler(self.src_size, middle, "area", stripes)
+                self._flag = cv2.INTER_LINEAR
+        self._local = threading.local()
+
+    def _scratch(self, name, shape):
+        """获取当前线程复用的缓冲"""
+        buffers = self._local.__dict__.setdefault("buffers", {})
+        buffer = buffers.get((name, shape))
+        if buffer is None:
+            buffer = np.empty(shape, np.uint8)
+            buffers[(name, shape)] = buffer
+        return buffer
+
+    def __call__(self, frame, out=None):
+        """缩放一帧
+
+        Args:
+            frame (numpy.ndarray): BGRA帧，形状 (src_height, src_width, 4)
+            out (numpy.ndarray, optional): 输出缓冲，形状 (dst_height, dst_width, 4)；
+                为空时写入当前线程复用的缓冲，只在下一次调用前有效
+
+        Returns:
+            numpy.ndarray: 缩放后的帧
+        """
+        width, height = self.dst_size
+        if out is None:
+            out = self._scratch("out", (height, width, frame.shape[2]))
+        if self.factor is None:
+            if self._prescaler is not None:
+                frame = self._prescaler(frame)
+            # 一般比例的插值核跨越条带边界，交给OpenCV内部的并行实现
+            cv2.resize(frame, self.dst_size, dst=out, interpolation=self._flag)
+        elif self.stripes is None:
+            self._pool_rows(frame, out, 0, height)
+        else:
+            # 按输出行切分，源帧上的条带边界自然对齐到缩小倍数，结果与整帧处理逐位一致
+            self.stripes.run(lambda start, end: self._pool_rows(frame, out, start, end), height)
+        return out
+
+    def _pool_rows(self, frame, out, start, end):
+        """均值池化输出帧的 [start, end) 行
+
+        每次缩小一半（OpenCV对整数倍区域插值有专门的向量化实现），
+        1/4、1/8依次减半，比一次按4x4、8x8块取平均快得多。
+        """
+        width = self.dst_size[0]
+        factor = self.factor
+        src = frame[start * factor:end * factor, :width * factor]
+        level = 0
+        while factor > 2:
+            factor //= 2
+            level += 1
+            rows, cols = (end - start) * factor, width * factor
+            src = cv2.resize(src, (cols, rows), dst=self._scratch(f"level{level}", (rows, cols, src.shape[2])),
+                             interpolation=cv2.INTER_AREA)
+        cv2.resize(src, (width, end - start), dst=out[start:end], interpolation=cv2.INTER_AREA)
@@ -0,0 +1,145 @@
+"""
+文件名: core/scheduler.py
+功能: 基于单调时钟（time.perf_counter_ns）的无漂移帧调度器。
+     每一帧都记录捕获时间戳，并按输出时间槽决定重复或丢弃，
+     使恒定帧率输出的时长与实际经过的时间一致，同时统计抖动、
+     延迟节拍以及丢帧/重复帧数量。
+"""
+
+import time
+
+# 调度策略
+POLICY_DUPLICATE = "duplicate"  # 节拍延迟时重复当前帧补齐错过的时间槽，输出时长与实际时间一致
+POLICY_DROP = "drop"            # 节拍延迟时直接跳过错过的时间槽（旧行为，输出会变短）
+
+
+class FrameScheduler:
+    """帧调度器：第k个输出帧对应时间槽 [k*T, (k+1)*T)，T为帧间隔"""
+
+    def __init__(self, fps, policy=POLICY_DUPLICATE, max_duplicates=None):
+        """初始化帧调度器
+
+        Args:
+            fps (float): 输出帧率
+            policy (str): 调度策略：duplicate 或 drop
+            max_duplicates (int, optional): 单帧最多占用的时间槽数，为空时不限制
+        """
+        if policy not in (POLICY_DUPLICATE, POLICY_DROP):
+            raise ValueError(f"不支持的调度策略: {policy}")
+
+        self.fps = fps
+        self.policy = policy
+        self.max_duplicates = max_duplicates
+        self.interval_ns = int(round(1e9 / fps))
+        self.start_ns = None
+        self.emitted = 0  # 已输出（占用）的时间槽数
+
+        # 统计
+        self.ticks = 0
+        self.late_ticks = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.last_tick_ns = 0  # 最近一次取帧相对开始时间的时间戳（纳秒）
+        self._lateness_sum = 0
+        self._lateness_sq_sum = 0
+        self._lateness_max = 0
+
+    def start(self):
+        """开始计时"""
+        self.start_ns = time.perf_counter_ns()
+        self.emitted = 0
+
+    def elapsed_ns(self):
+        """获取自开始以来经过的时间
+
+        Returns:
+            int: 纳秒
+        """
+        return time.perf_counter_ns() - self.start_ns
+
+    def wait(self, stop_event=None):
+        """等待到下一个时间槽的开始时刻（已落后时立即返回）
+
+        Args:
+            stop_event (threading.Event, optional): 停止事件，被设置时立即结束等待，
+                避免长间隔（如延时摄影）下停止录制要等满一个间隔
+        """
+        deadline = self.emitted * self.interval_ns
+        remaining = deadline - self.elapsed_ns()
+        if remaining > 0:
+            if stop_event is not None:
+                stop_event.wait(remaining / 1e9)
+            else:
+                time.sleep(remaining / 1e9)
+
+    def tick(self):
+        """在取帧前调用，记录时间戳并决定该帧占用的输出时间槽数
+
+        Returns:
+            int: 该帧应写入的次数；0表示丢弃该帧（同一时间槽内已有帧）
+        """
+        now = self.elapsed_ns()
+        self.ticks += 1
+        self.last_tick_ns = now
+
+        # 相对于本应开始的时刻的延迟
+        lateness = max(0, now - self.emitted * self.interval_ns)
+        self._lateness_sum += lateness
+        self._lateness_sq_sum += lateness * lateness
+        self._lateness_max = max(self._lateness_max, lateness)
+        if lateness >= self.interval_ns:
+            self.late_ticks += 1
+
+        # 截至当前时刻应已输出的时间槽数
+        target = now // self.interval_ns + 1
+        slots = target - self.emitted
+        if slots <= 0:
+            self.dropped += 1
+            return 0
+
+        if self.policy == POLICY_DROP and slots > 1:
+            # 跳过错过的时间槽，只输出当前帧
+            self.dropped += slots - 1
+            self.emitted += slots - 1
+            slots = 1
+        elif self.max_duplicates is not None and slots > self.max_duplicates:
+            self.dropped += slots - self.max_duplicates
+            self.emitted += slots - self.max_duplicates
+            slots = self.max_duplicates
+
+        self.duplicated += slots - 1
+        self.emitted += slots
+        return slots
+
+    def discard(self, slots):
+        """撤销tick()分配的时间槽（帧未能送入编码器时调用），下一帧会补齐这些时间槽
+
+        Args:
+            slots (int): tick()返回的时间槽数
+        """
+        self.emitted -= slots
+        self.duplicated -= slots - 1
+        self.dropped += 1
+
+    def get_stats(self):
+        """获取调度统计信息
+
+        Returns:
+            dict: 节拍数、输出帧数、延迟节拍、丢帧/重复帧数、抖动（毫秒）等
+        """
+        ticks = max(1, self.ticks)
+        mean = self._lateness_sum / ticks
+        variance = max(0.0, self._lateness_sq_sum / ticks - mean * mean)
+        elapsed = self.elapsed_ns() if self.start_ns is not None else 0
+        return {
+            "ticks": self.ticks,
+            "output_frames": self.emitted,
+            "late_ticks": self.late_ticks,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "jitter_ms": variance ** 0.5 / 1e6,
+            "mean_lateness_ms": mean / 1e6,
+            "max_lateness_ms": self._lateness_max / 1e6,
+            "wall_time": elapsed / 1e9,
+            "output_duration": self.emitted * self.interval_ns / 1e9
+        }
@@ -0,0 +1,225 @@
+"""
+文件名: core/segments.py
+功能: 分段录制支持。编码进程通过ffmpeg segment封装器把视频写成固定
+     时长、各自可独立播放的分片MP4分段（每个关键帧写出一个分片，文件
+     被截断时已写出的分片仍可读取），每完成一段就更新一次ffconcat
+     格式的分段日志。正常结束时只需按日志流复制拼接；程序崩溃或断电时
+     最多丢失正在写入的一段，已完成的分段可在下次启动时恢复。可变帧率
+     录制时，每帧的捕获时间戳随写入追加到分段目录中的时间码日志，恢复
+     时据此还原各帧的显示时长。
+"""
+
+import os
+import glob
+
+from .ffmpeg_writer import run_ffmpeg
+from .mp4_timing import read_timecodes, apply_timecodes, timecodes_path_for
+
+# 默认分段时长（秒）
+DEFAULT_SEGMENT_SECONDS = 10
+
+# 分段日志文件名（位于分段目录中）
+JOURNAL_NAME = "segments.ffconcat"
+
+# 时间码日志文件名（位于分段目录中，可变帧率录制时逐帧追加）
+TIMECODES_NAME = "segments.timecodes.txt"
+
+SEGMENT_PATTERN = "%05d.mp4"
+
+
+def segment_dir_for(video_path):
+    """获取临时视频对应的分段目录
+
+    Args:
+        video_path (str): 临时视频文件路径
+
+    Returns:
+        str: 分段目录路径
+    """
+    return os.path.splitext(video_path)[0] + "_segments"
+
+
+def segment_muxer_args(segment_dir, seconds=DEFAULT_SEGMENT_SECONDS):
+    """生成分段输出的ffmpeg参数
+
+    Args:
+        segment_dir (str): 分段目录
+        seconds (float): 分段时长（秒）
+
+    Returns:
+        tuple: (输出参数列表, 输出文件名模式)
+    """
+    args = [
+        # 在每个分段边界强制关键帧，保证每段都从关键帧开始、可以单独解码
+        "-force_key_frames", f"expr:gte(t,n_forced*{seconds})",
+        "-f", "segment",
+        "-segment_time", str(seconds),
+        "-segment_format", "mp4",
+        "-segment_format_options", "movflags=frag_keyframe+empty_moov+default_base_moof",
+        # 每段时间戳从0开始，拼接时由concat按各段时长依次衔接
+        "-reset_timestamps", "1",
+        # 每完成一段就重写分段列表，列表即为恢复时使用的日志
+        "-segment_list", os.path.join(segment_dir, JOURNAL_NAME),
+        "-segment_list_type", "ffconcat",
+    ]
+    return args, os.path.join(segment_dir, SEGMENT_PATTERN)
+
+
+def read_journal(segment_dir):
+    """读取分段日志，并补上日志之后仍在磁盘上的分段（中断时正在写入的一段）
+
+    Args:
+        segment_dir (str): 分段目录
+
+    Returns:
+        list: 按顺序排列的非空分段文件路径
+    """
+    segments = []
+    journal = os.path.join(segment_dir, JOURNAL_NAME)
+    if os.path.exists(journal):
+        try:
+            with open(journal, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("file "):
+                        segments.append(os.path.join(segment_dir, line[5:].strip("'")))
+        except OSError as e:
+            print(f"[警告] 读取分段日志失败: {str(e)}")
+
+    # 日志每段结束后才更新，末尾未登记的分段按文件名顺序补上
+    listed = set(segments)
+    for path in sorted(glob.glob(os.path.join(segment_dir, "[0-9]*.mp4"))):
+        if path not in listed and (not segments or path > segments[-1]):
+            segments.append(path)
+    return [path for path in segments if os.path.exists(path) and os.path.getsize(path) > 0]
+
+
+def concat_segments(segment_dir, output_path):
+    """按日志把各分段流复制拼接为一个MP4文件
+
+    Args:
+        segment_dir (str): 分段目录
+        output_path (str): 输出文件路径
+
+    Returns:
+        int: 拼接的分段数
+
+    Raises:
+        RuntimeError: 没有可用分段或拼接失败时抛出
+    """
+    segments = read_journal(segment_dir)
+    if not segments:
+        raise RuntimeError("没有可用的视频分段")
+
+    # 写出只包含有效分段的拼接列表（使用绝对路径，不依赖工作目录）
+    list_path = os.path.join(segment_dir, "concat.ffconcat")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for path in segments:
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+    finally:
+        os.remove(list_path)
+    return len(segments)
+
+
+def remove_segments(segment_dir):
+    """删除分段目录及其中的分段与日志
+
+    Args:
+        segment_dir (str): 分段目录
+    """
+    if not os.path.isdir(segment_dir):
+        return
+    for name in os.listdir(segment_dir):
+        os.remove(os.path.join(segment_dir, name))
+    os.rmdir(segment_dir)
+
+
+def find_interrupted_sessions(output_dir):
+    """查找输出目录中被中断的分段录制
+
+    Args:
+        output_dir (str): 输出目录
+
+    Returns:
+        list: 分段目录路径列表
+    """
+    return sorted(path for path in glob.glob(os.path.join(output_dir, "video_*_segments")) if os.path.isdir(path))
+
+
+def retime_segments(segment_dir, video_path):
+    """按时间码改写拼接出的视频的帧时间（可变帧率录制）
+
+    录制结束后才中断（如封装时退出）的会话已写出完整的时间码旁路文件，
+    优先使用；否则使用分段目录中的时间码日志。中断时最后几帧可能已记录
+    时间戳但还没写入分段，多出的时间戳被忽略。改写失败时保留恒定帧率的视频。
+
+    Args:
+        segment_dir (str): 分段目录
+        video_path (str): 拼接出的视频文件路径
+
+    Returns:
+        bool: 是否改写了帧时间
+    """
+    timecodes_path = timecodes_path_for(video_path)
+    if not os.path.exists(timecodes_path):
+        timecodes_path = os.path.join(segment_dir, TIMECODES_NAME)
+        if not os.path.exists(timecodes_path):
+            return False
+    try:
+        pts_seconds, end_seconds = read_timecodes(timecodes_path)
+        apply_timecodes(video_path, pts_seconds, end_seconds, truncate=True)
+    except (ValueError, OSError) as e:
+        print(f"[警告] 应用分段时间码失败，按恒定帧率恢复: {str(e)}")
+        return False
+    print(f"[调试] 已按 {timecodes_path} 恢复帧时间: {video_path}")
+    return True
+
+
+def recover_session(segment_dir):
+    """恢复一次被中断的分段录制：拼接已写入的分段并还原帧时间，有系统音频时一并封装
+
+    Args:
+        segment_dir (str): 分段目录
+
+    Returns:
+        str: 恢复出的文件路径
+
+    Raises:
+        RuntimeError: 没有可恢复的分段或封装失败时抛出
+    """
+    # video_{时间戳}_segments -> 时间戳
+    name = os.path.basename(segment_dir)
+    timestamp = name[len("video_"):-len("_segments")]
+    output_dir = os.path.dirname(segment_dir)
+    video_path = os.path.join(output_dir, f"video_{timestamp}.mp4")
+    audio_path = os.path.join(output_dir, f"system_audio_{timestamp}.wav")
+    output_path = os.path.join(output_dir, f"recording_{timestamp}_recovered.mp4")
+
+    count = concat_segments(segment_dir, video_path)
+    print(f"[调试] 已拼接 {count} 个分段: {video_path}")
+    try:
+        retime_segments(segment_dir, video_path)
+        if os.path.exists(audio_path) and os.path.getsize(audio_path) > 44:
+            try:
+                run_ffmpeg([
+                    "-i", video_path, "-i", audio_path,
+                    "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac", "-shortest",
+                    output_path
+                ])
+            except RuntimeError as e:
+                # 中断时WAV头未写完整可能无法读取，保留视频
+                print(f"[警告] 恢复音频失败，仅保存视频: {str(e)}")
+                os.replace(video_path, output_path)
+            else:
+                os.remove(audio_path)
+        else:
+            os.replace(video_path, output_path)
+    finally:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+    remove_segments(segment_dir)
+    return output_path
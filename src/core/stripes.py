@@ -0,0 +1,92 @@
+"""
+文件名: core/stripes.py
+功能: 条带并行。把一帧按水平条带切分，由一个小线程池同时处理各条带；
+     OpenCV和NumPy在处理数组时会释放GIL，多个条带可以真正并行，使
+     4K等大区域的颜色转换和缩放在多核机器上跟上帧率。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 每个条带的最少行数，过细的条带调度开销大于收益
+MIN_STRIPE_ROWS = 64
+
+# 自动选择线程数的上限
+MAX_STRIPE_WORKERS = 8
+
+
+def default_stripe_workers(width, height):
+    """按区域大小选择条带线程数：1080p以下不切分，更大的区域使用多核
+
+    Args:
+        width (int): 帧宽度
+        height (int): 帧高度
+
+    Returns:
+        int: 线程数
+    """
+    if width * height < 1920 * 1080:
+        return 1
+    return max(1, min(os.cpu_count() or 1, MAX_STRIPE_WORKERS))
+
+
+def split_rows(height, count, align=1):
+    """把 [0, height) 切分为最多count个行范围，边界按align对齐
+
+    Args:
+        height (int): 总行数
+        count (int): 条带数
+        align (int): 边界对齐行数（如YUV 4:2:0要求2，缩放要求缩放倍数）
+
+    Returns:
+        list: (起始行, 结束行) 列表
+    """
+    count = max(1, min(count, height // max(align, MIN_STRIPE_ROWS)))
+    units = height // align
+    bounds = [units * i // count * align for i in range(count)] + [height]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+
+class StripePool:
+    """条带线程池：调用线程处理一个条带，其余条带交给工作线程"""
+
+    def __init__(self, workers):
+        """初始化条带线程池
+
+        Args:
+            workers (int): 同时处理的条带数（含调用线程）
+        """
+        self.workers = max(1, int(workers))
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers - 1, thread_name_prefix="stripe")
+
+    def run(self, func, height, align=1):
+        """并行处理一帧的各个条带，全部完成后返回
+
+        Args:
+            func (callable): 处理函数，参数为 (起始行, 结束行)
+            height (int): 总行数
+            align (int): 条带边界对齐行数
+
+        Raises:
+            Exception: 任一条带出错时重新抛出
+        """
+        stripes = split_rows(height, self.workers, align)
+        if self._executor is None or len(stripes) == 1:
+            for start, end in stripes:
+                func(start, end)
+            return
+
+        futures = [self._executor.submit(func, start, end) for start, end in stripes[1:]]
+        try:
+            func(*stripes[0])
+        finally:
+            for future in futures:
+                future.result()
+
+    def close(self):
+        """关闭工作线程"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,56 @@
+"""
+文件名: core/timelapse.py
+功能: 延时摄影支持。捕获间隔与输出帧率相互独立，每个捕获间隔输出
+     一帧；可选在一个间隔内均匀抓取多帧求平均，平滑画面变化并抑制
+     偶发的闪烁。
+"""
+
+import numpy as np
+
+# uint16累加缓冲最多可累加的帧数：四舍五入时还要加上 count // 2，
+# 255 * 256 + 128 = 65408 不超过65535（257帧时为65663，会溢出）
+MAX_AVERAGE_FRAMES = 256
+
+
+class FrameAverager:
+    """帧平均器：累计指定数量的帧后输出它们的平均值"""
+
+    def __init__(self, count):
+        """初始化帧平均器
+
+        Args:
+            count (int): 每个输出帧平均的帧数
+        """
+        if not 1 <= count <= MAX_AVERAGE_FRAMES:
+            raise ValueError(f"平均帧数须在1到{MAX_AVERAGE_FRAMES}之间: {count}")
+        self.count = count
+        self._sum = None  # 预分配的累加缓冲
+        self._added = 0
+
+    def add(self, frame):
+        """加入一帧
+
+        Args:
+            frame (numpy.ndarray): uint8帧
+
+        Returns:
+            numpy.ndarray: 累计满 count 帧时返回平均后的新帧，否则返回None
+        """
+        if self.count == 1:
+            return frame
+        if self._sum is None or self._sum.shape != frame.shape:
+            self._sum = np.zeros(frame.shape, np.uint16)
+            self._added = 0
+
+        if self._added == 0:
+            np.copyto(self._sum, frame)
+        else:
+            np.add(self._sum, frame, out=self._sum)
+        self._added += 1
+        if self._added < self.count:
+            return None
+
+        self._added = 0
+        # 四舍五入到最近的整数
+        average = (self._sum + self.count // 2) // self.count
+        return average.astype(np.uint8)
@@ -6,23 +6,32 @@
 功能: 即时录屏软件的主程序入口，初始化应用并启动主循环。
      该软件提供现代化图形用户界面，允许用户选择录制区域，
      控制录制开始和结束，支持系统声音录制，并通过全局快捷键控制。
-     支持MP4和GIF格式输出，界面采用现代化天空蓝主题设计。
+     支持MP4、GIF、WebP和APNG格式输出，界面采用现代化天空蓝主题设计。
 """
 
 import os
 import sys
 import time
 import threading
+import multiprocessing
 import tkinter as tk
 from tkinter import messagebox
 
 from ui.main_window import MainWindow
 from core.recorder import Recorder
+from core.instant_replay import InstantReplay
+from core.recovery import RecoveryScanner
+from core.finalizer import FinalizeQueue
+from core.capture_hub import CaptureHub
+from core.frame_source import MssFrameSource
 from core.region_selector import RegionSelector
 from utils.hotkey_manager import HotkeyManager
 from utils.tray_manager import TrayManager
 from utils.config_manager import ConfigManager
 
+# 退出时轮询后台处理队列的间隔（毫秒）
+FINALIZE_POLL_MS = 200
+
 class ScreenRecorderApp:
     """屏幕录制应用程序类"""
     
@@ -32,6 +41,11 @@ class ScreenRecorderApp:
         self.config = ConfigManager()
         self.recorder = None
         self.recording = False
+        self.replay = None
+        self.finalizer = FinalizeQueue()
+        self.closing = False  # 正在等待后台处理完成后退出
+        self.capture_hub = None  # 录制与即时回放共用的屏幕捕获
+        self.capture_hub_lock = threading.Lock()
         self.current_region = self.config.get("region")
         self.region_selected = self.current_region is not None
         
@@ -65,6 +79,9 @@ class ScreenRecorderApp:
         # 检测系统音频
         self._check_system_audio()
         
+        # 主窗口显示后再扫描上次中断录制的残留文件，不拖慢启动
+        self.root.after(2000, self._recover_interrupted_sessions)
+        
         # 如果有保存的区域，显示它
         if self.current_region:
             self.control_panel.update_region_info(self.current_region, True)
@@ -77,7 +94,11 @@ class ScreenRecorderApp:
         # 在后台线程中运行，避免阻塞UI
         def check_audio():
             temp_recorder = Recorder()
-            success, message = temp_recorder.test_system_audio()
+            try:
+                success, message = temp_recorder.test_system_audio()
+            finally:
+                # 仅用于检测，不会产生输出文件
+                temp_recorder.discard()
             
             # 更新UI（回到主线程）
             self.root.after(0, lambda: self.settings_panel.update_system_audio_status(success, message))
@@ -87,6 +108,44 @@ class ScreenRecorderApp:
         audio_thread.daemon = True
         audio_thread.start()
     
+    def _recover_interrupted_sessions(self):
+        """在后台扫描输出目录，恢复上次被中断的录制"""
+        scanner = RecoveryScanner(
+            self.settings_panel.get_settings()["output_dir"],
+            is_active=self._is_session_active
+        )
+        
+        def on_result(timestamp, output_path, error):
+            if output_path:
+                message = f"已恢复上次中断的录制: {output_path}"
+            else:
+                message = f"恢复中断的录制失败: {error}"
+            self.root.after(0, lambda: self.main_window.update_status(message))
+        
+        def recover():
+            scanner.run(on_result)
+            if scanner.recovered or scanner.failed:
+                message = f"中断录制恢复完成：成功 {len(scanner.recovered)} 个，失败 {len(scanner.failed)} 个"
+                self.root.after(0, lambda: self.main_window.update_status(message))
+        
+        recover_thread = threading.Thread(target=recover)
+        recover_thread.daemon = True
+        recover_thread.start()
+    
+    def _is_session_active(self, timestamp):
+        """检查时间戳对应的录制是否正在进行或等待后期处理
+        
+        Args:
+            timestamp (str): 录制时间戳
+        
+        Returns:
+            bool: 是否仍在使用
+        """
+        recorders = self.finalizer.pending()
+        if self.recorder is not None:
+            recorders.append(self.recorder)
+        return any(recorder.timestamp == timestamp for recorder in recorders)
+    
     def select_region(self):
         """选择录制区域"""
         # 保存当前窗口状态
@@ -126,7 +185,7 @@ class ScreenRecorderApp:
     
     def _start_recording(self):
         """开始录制"""
-        if self.recording:
+        if self.recording or self.closing:
             return
             
         if not self.region_selected or not self.current_region:
@@ -137,13 +196,23 @@ class ScreenRecorderApp:
             # 获取当前设置
             settings = self.settings_panel.get_settings()
             
-            # 创建录制器
-            self.recorder = Recorder(
-                region=self.current_region,
-                output_dir=settings["output_dir"],
-                fps=settings["fps"],
-                output_format=settings["output_format"]
-            )
+            # 创建录制器（创建失败时退订，否则共享捕获会一直抓屏）
+            subscription = self._subscribe_capture("recording", settings["fps"])
+            try:
+                self.recorder = Recorder(
+                    region=self.current_region,
+                    output_dir=settings["output_dir"],
+                    fps=settings["fps"],
+                    output_format=settings["output_format"],
+                    frame_source=subscription,
+                    output_scale=settings["output_scale"],
+                    output_max_dimension=settings["output_max_dimension"],
+                    scale_interpolation=settings["scale_interpolation"],
+                    gif_palette=settings["gif_palette"]
+                )
+            except Exception:
+                subscription.close()
+                raise
             
             # 开始录制
             self.recorder.start()
@@ -157,67 +226,213 @@ class ScreenRecorderApp:
             self.main_window.hide()
             
         except Exception as e:
+            if self.recorder is not None:
+                self.recorder.discard()
+                self.recorder = None
             self.main_window.update_status(f"开始录制出错: {str(e)}")
             messagebox.showerror("错误", f"开始录制时出错:\n{str(e)}")
     
+    def _subscribe_capture(self, name, fps):
+        """订阅当前区域的共享屏幕捕获
+        
+        录制与即时回放同时进行时共用一个捕获线程，每个节拍只抓屏一次。
+        区域不同或帧率不能整除时另建捕获中心；最后一个订阅者退订后捕获中心自动停止。
+        
+        Args:
+            name (str): 订阅者名称
+            fps (int): 需要的帧率
+            
+        Returns:
+            Subscription: 可作为帧来源交给Recorder或InstantReplay
+        """
+        region = tuple(self.current_region)
+        with self.capture_hub_lock:
+            hub = self.capture_hub
+            if hub is not None and hub.running and hub.region == region and hub.fps % fps == 0:
+                try:
+                    return hub.subscribe(name, divider=hub.fps // fps)
+                except RuntimeError:
+                    pass  # 最后一个订阅者刚刚退订，捕获中心已停止
+            hub = CaptureHub(MssFrameSource(region), fps, auto_stop=True)
+            subscription = hub.subscribe(name)
+            hub.start()
+            self.capture_hub = hub
+            return subscription
+    
     def _stop_recording(self):
-        """停止录制"""
+        """停止录制：只结束捕获，后期处理交给后台队列"""
         if not self.recording or not self.recorder:
             return
             
         try:
-            # 停止录制
-            output_path, errors = self.recorder.stop()
+            # 停止捕获（临时文件写完即返回）
+            recorder = self.recorder
+            recorder.stop_capture()
             self.recording = False
             
             # 恢复窗口
             self.main_window.show()
             
-            # 更新UI状态
+            # 更新UI状态，此时即可开始新的录制
             self.control_panel.update_record_button_state(False)
+            self.main_window.update_status("录制已停止，正在后台处理...")
             
-            # 显示结果
-            if output_path and os.path.exists(output_path):
-                self.main_window.update_status(f"录制已完成，保存到: {output_path}")
-                
-                # 显示成功消息和警告
-                message = f"录制已完成，保存到:\n{output_path}"
-                
-                # 添加警告信息（如果有）
-                if errors and any(errors.values()):
-                    message += "\n\n警告:"
-                    for key, error in errors.items():
-                        if error:
-                            message += f"\n- {error}"
-                
-                messagebox.showinfo("录制完成", message)
-            else:
-                error_msg = "录制失败"
-                if errors and any(errors.values()):
-                    for key, error in errors.items():
-                        if error:
-                            error_msg += f"\n- {error}"
-                
-                self.main_window.update_status(f"录制失败: {error_msg}")
-                messagebox.showerror("录制失败", error_msg)
+            # 进度和结果回调在后台线程中执行，通过root.after回到主线程更新界面
+            self.finalizer.submit(
+                recorder,
+                on_progress=lambda recorder, stage, fraction: self.root.after(
+                    0, lambda: self._show_finalize_progress(stage, fraction)),
+                on_done=lambda recorder, output_path, errors: self.root.after(
+                    0, lambda: self._show_recording_result(output_path, errors))
+            )
         except Exception as e:
             self.main_window.update_status(f"停止录制出错: {str(e)}")
             messagebox.showerror("错误", f"停止录制时出错:\n{str(e)}")
         finally:
             self.recorder = None
     
+    def _show_finalize_progress(self, stage, fraction):
+        """在状态栏显示后期处理进度
+        
+        Args:
+            stage (str): 阶段描述
+            fraction (float): 完成比例，可能为None
+        """
+        # 正在录制时状态栏显示录制状态，不被后台处理覆盖
+        if self.recording:
+            return
+        if fraction is None:
+            self.main_window.update_status(f"{stage}...")
+        else:
+            self.main_window.update_status(f"{stage}... {fraction:.0%}")
+    
+    def _show_recording_result(self, output_path, errors):
+        """显示一次录制的处理结果
+        
+        Args:
+            output_path (str): 输出文件路径，失败时为None
+            errors (dict): 错误信息字典
+        """
+        if output_path and os.path.exists(output_path):
+            if not self.recording:
+                self.main_window.update_status(f"录制已完成，保存到: {output_path}")
+            
+            # 显示成功消息和警告
+            message = f"录制已完成，保存到:\n{output_path}"
+            
+            # 添加警告信息（如果有）
+            if errors and any(errors.values()):
+                message += "\n\n警告:"
+                for key, error in errors.items():
+                    if error:
+                        message += f"\n- {error}"
+            
+            # 正在进行新的录制或正在退出时不弹出对话框打扰
+            if not self.recording and not self.closing:
+                messagebox.showinfo("录制完成", message)
+            else:
+                print(f"[调试] {message}")
+        else:
+            error_msg = "录制失败"
+            if errors and any(errors.values()):
+                for key, error in errors.items():
+                    if error:
+                        error_msg += f"\n- {error}"
+            
+            self.main_window.update_status(f"录制失败: {error_msg}")
+            messagebox.showerror("录制失败", error_msg)
+    
+    def toggle_replay_buffer(self):
+        """切换即时回放缓冲（开始/停止）"""
+        if self.replay is not None:
+            self.replay.stop()
+            self.replay = None
+            self.root.after(0, lambda: self.main_window.update_status("即时回放已关闭"))
+            return
+            
+        if not self.region_selected or not self.current_region:
+            self.root.after(0, lambda: self.main_window.update_status("请先选择录制区域再开启即时回放"))
+            return
+            
+        settings = self.settings_panel.get_settings()
+        seconds = self.config.get("replay_seconds")
+        subscription = self._subscribe_capture("replay", settings["fps"])
+        try:
+            self.replay = InstantReplay(
+                region=self.current_region,
+                output_dir=settings["output_dir"],
+                fps=settings["fps"],
+                duration=seconds,
+                frame_source=subscription
+            )
+        except Exception:
+            # 创建失败时退订，否则共享捕获会一直抓屏
+            subscription.close()
+            raise
+        self.replay.start()
+        self.root.after(0, lambda: self.main_window.update_status(
+            f"即时回放已开启，按Ctrl+Alt+V保存最近 {seconds} 秒"))
+    
+    def save_replay(self):
+        """保存即时回放缓冲中的最近一段录屏"""
+        replay = self.replay
+        if replay is None:
+            self.root.after(0, lambda: self.main_window.update_status("即时回放未开启（按Ctrl+Alt+B开启）"))
+            return
+        
+        # 封装在后台线程中进行，不阻塞热键回调和界面
+        def save():
+            output_path, error = replay.save()
+            if output_path:
+                message = f"回放已保存到: {output_path}"
+            else:
+                message = error
+            self.root.after(0, lambda: self.main_window.update_status(message))
+        
+        save_thread = threading.Thread(target=save)
+        save_thread.daemon = True
+        save_thread.start()
+    
     def toggle_window_visibility(self):
         """切换窗口显示/隐藏状态"""
         self.main_window.toggle_visibility()
     
     def on_close(self):
         """窗口关闭处理"""
+        if self.closing:
+            return
         if self.recording:
             if messagebox.askyesno("警告", "录制正在进行中，确定要退出吗？"):
                 self._stop_recording()
             else:
                 return  # 取消关闭
         
+        # 等待后台处理完成，避免留下未完成的文件。后台处理的回调要通过
+        # root.after回到主线程，主线程不能阻塞等待，改为在主循环中轮询
+        if self.finalizer.pending():
+            self.closing = True
+            self.main_window.update_status("正在等待录制处理完成...")
+            self.root.after(FINALIZE_POLL_MS, self._wait_for_finalizer)
+            return
+        self._shutdown()
+    
+    def _wait_for_finalizer(self):
+        """轮询后台处理队列，全部完成后退出"""
+        if self.finalizer.pending():
+            self.root.after(FINALIZE_POLL_MS, self._wait_for_finalizer)
+        else:
+            self._shutdown()
+    
+    def _shutdown(self):
+        """释放资源并退出应用"""
+        # 停止即时回放缓冲
+        if self.replay is not None:
+            self.replay.stop()
+            self.replay = None
+        
+        # 保存录制设置
+        self.settings_panel.save_settings()
+        
         # 保存窗口位置
         self.main_window.hide()
         
@@ -260,4 +475,6 @@ def main():
             print(error_message)
 
 if __name__ == "__main__":
+    # 打包为exe后，GIF并行编码的进程池子进程会重新执行入口，必须最先调用
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -8,6 +8,31 @@ import tkinter as tk
 from tkinter import ttk
 from ui.styles import get_styles
 
+# 输出尺寸选项：显示文本 -> (缩放系数, 最长边上限，0表示不限制)
+OUTPUT_SIZES = {
+    "原始大小": (1.0, 0),
+    "75%": (0.75, 0),
+    "1/2": (0.5, 0),
+    "1/4": (0.25, 0),
+    "最长边1920": (1.0, 1920),
+    "最长边1280": (1.0, 1280),
+}
+
+# 缩放插值方式：显示文本 -> 插值名称
+SCALE_INTERPOLATIONS = {
+    "区域平均": "area",
+    "双线性": "linear",
+    "双三次": "cubic",
+    "Lanczos": "lanczos",
+}
+
+# GIF调色板模式：显示文本 -> 模式名称
+GIF_PALETTES = {
+    "逐帧调色板": "local",
+    "全局调色板": "global",
+    "按场景切换": "scene",
+}
+
 class SettingsPanel(ttk.Frame):
     """设置面板组件，负责管理录制设置"""
     
@@ -29,6 +54,18 @@ class SettingsPanel(ttk.Frame):
         self.output_format_var = tk.StringVar(value=config_manager.get("output_format", "mp4"))
         self.output_dir_var = tk.StringVar(value=config_manager.get("output_dir", os.path.join(os.path.expanduser("~"), "Desktop")))
         self.system_audio_var = tk.BooleanVar(value=True)
+        output_size = (config_manager.get("output_scale", 1.0), config_manager.get("output_max_dimension", 0))
+        self.output_size_var = tk.StringVar(value=next(
+            (label for label, value in OUTPUT_SIZES.items() if value == output_size), "原始大小"
+        ))
+        interpolation = config_manager.get("scale_interpolation", "area")
+        self.interpolation_var = tk.StringVar(value=next(
+            (label for label, value in SCALE_INTERPOLATIONS.items() if value == interpolation), "区域平均"
+        ))
+        gif_palette = config_manager.get("gif_palette", "local")
+        self.gif_palette_var = tk.StringVar(value=next(
+            (label for label, value in GIF_PALETTES.items() if value == gif_palette), "逐帧调色板"
+        ))
         
         # 设置布局
         self.setup_ui()
@@ -80,6 +117,32 @@ class SettingsPanel(ttk.Frame):
             style="Small.TLabel"
         ).pack(side="left", padx=5)
         
+        # === 输出尺寸设置 ===
+        size_frame = ttk.Frame(settings_container)
+        size_frame.pack(fill="x", pady=5)
+        
+        ttk.Label(size_frame, text="输出尺寸:").pack(side="left")
+        
+        self.output_size_combo = ttk.Combobox(
+            size_frame,
+            textvariable=self.output_size_var,
+            values=list(OUTPUT_SIZES),
+            width=10,
+            state="readonly"
+        )
+        self.output_size_combo.pack(side="left", padx=5)
+        
+        ttk.Label(size_frame, text="缩放:").pack(side="left")
+        
+        self.interpolation_combo = ttk.Combobox(
+            size_frame,
+            textvariable=self.interpolation_var,
+            values=list(SCALE_INTERPOLATIONS),
+            width=8,
+            state="readonly"
+        )
+        self.interpolation_combo.pack(side="left", padx=5)
+        
         # === 输出格式设置 ===
         format_frame = ttk.Frame(settings_container)
         format_frame.pack(fill="x", pady=5)
@@ -103,6 +166,52 @@ class SettingsPanel(ttk.Frame):
         )
         gif_radio.pack(side="left", padx=5)
         
+        webp_radio = ttk.Radiobutton(
+            format_frame, 
+            text="WebP", 
+            variable=self.output_format_var, 
+            value="webp"
+        )
+        webp_radio.pack(side="left", padx=5)
+        
+        webp_lossless_radio = ttk.Radiobutton(
+            format_frame, 
+            text="WebP无损", 
+            variable=self.output_format_var, 
+            value="webp_lossless"
+        )
+        webp_lossless_radio.pack(side="left", padx=5)
+        
+        apng_radio = ttk.Radiobutton(
+            format_frame, 
+            text="APNG", 
+            variable=self.output_format_var, 
+            value="apng"
+        )
+        apng_radio.pack(side="left", padx=5)
+        
+        # === GIF调色板设置 ===
+        palette_frame = ttk.Frame(settings_container)
+        palette_frame.pack(fill="x", pady=5)
+        
+        ttk.Label(palette_frame, text="GIF调色板:").pack(side="left")
+        
+        self.gif_palette_combo = ttk.Combobox(
+            palette_frame,
+            textvariable=self.gif_palette_var,
+            values=list(GIF_PALETTES),
+            width=10,
+            state="readonly"
+        )
+        self.gif_palette_combo.pack(side="left", padx=5)
+        
+        # 提示文本
+        ttk.Label(
+            palette_frame,
+            text="(全局/按场景体积更小，停止后处理更久)",
+            style="Small.TLabel"
+        ).pack(side="left", padx=5)
+        
         # === 系统音频设置 ===
         audio_frame = ttk.Frame(settings_container)
         audio_frame.pack(fill="x", pady=5)
@@ -151,7 +260,11 @@ class SettingsPanel(ttk.Frame):
             "output_dir": self.output_dir_var.get(),
             "fps": int(self.fps_var.get()),
             "output_format": self.output_format_var.get(),
-            "record_system_audio": self.system_audio_var.get()
+            "record_system_audio": self.system_audio_var.get(),
+            "output_scale": OUTPUT_SIZES[self.output_size_var.get()][0],
+            "output_max_dimension": OUTPUT_SIZES[self.output_size_var.get()][1],
+            "scale_interpolation": SCALE_INTERPOLATIONS[self.interpolation_var.get()],
+            "gif_palette": GIF_PALETTES[self.gif_palette_var.get()]
         }
     
     def save_settings(self):
@@ -15,6 +15,11 @@ DEFAULT_CONFIG = {
     "fps": 30,
     "output_format": "mp4",
     "region": None,
+    "replay_seconds": 60,
+    "output_scale": 1.0,
+    "output_max_dimension": 0,
+    "scale_interpolation": "area",
+    "gif_palette": "local",
     "ui": {
         "theme": "arc",
         "window_geometry": "450x550",
@@ -29,7 +29,9 @@ class HotkeyManager:
         self.hotkeys = {}
         self.hotkey_info = {
             "开始/停止录制": "Ctrl+Alt+R",
-            "显示/隐藏窗口": "Ctrl+Alt+S"
+            "显示/隐藏窗口": "Ctrl+Alt+S",
+            "开启/关闭即时回放": "Ctrl+Alt+B",
+            "保存即时回放": "Ctrl+Alt+V"
         }
     
     def register_hotkeys(self):
@@ -55,6 +57,22 @@ class HotkeyManager:
             )
             self.hotkeys["toggle_window"] = "ctrl+alt+s"
             
+            # 开启/关闭即时回放缓冲
+            keyboard.add_hotkey(
+                "ctrl+alt+b", 
+                self.app.toggle_replay_buffer, 
+                suppress=True
+            )
+            self.hotkeys["toggle_replay"] = "ctrl+alt+b"
+            
+            # 保存最近N秒
+            keyboard.add_hotkey(
+                "ctrl+alt+v", 
+                self.app.save_replay, 
+                suppress=True
+            )
+            self.hotkeys["save_replay"] = "ctrl+alt+v"
+            
             print("成功注册热键")
         except Exception as e:
             print(f"注册热键失败: {str(e)}")
@@ -48,6 +48,8 @@ class TrayManager:
             pystray.MenuItem("选择区域", self.app.select_region),
             pystray.MenuItem("开始录制", self._start_recording),
             pystray.MenuItem("停止录制", self._stop_recording),
+            pystray.MenuItem("开启/关闭即时回放", self._toggle_replay),
+            pystray.MenuItem("保存即时回放", self._save_replay),
             pystray.MenuItem("退出", self.app.quit_app)
         ]
         
@@ -120,6 +122,24 @@ class TrayManager:
         if self.app.recording:
             self.app.toggle_recording()
     
+    def _toggle_replay(self, icon, item):
+        """开启/关闭即时回放缓冲
+        
+        Args:
+            icon: 图标实例
+            item: 菜单项实例
+        """
+        self.app.toggle_replay_buffer()
+    
+    def _save_replay(self, icon, item):
+        """保存即时回放
+        
+        Args:
+            icon: 图标实例
+            item: 菜单项实例
+        """
+        self.app.save_replay()
+    
     def stop(self):
         """停止系统托盘图标"""
         if self.icon: